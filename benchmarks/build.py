@@ -0,0 +1,186 @@
+"""Full and incremental build times of cli.py over synthetic corpora.
+
+For each corpus size a tree is generated with benchmarks/corpus.py and built
+through cli.main, each build in a fresh process so no in-memory state (the
+content store, memoized lexers, imported templates) carries over:
+
+  full cold          empty output, empty caches
+  full warm          again, with the render cache from the first build
+  incremental first  --incremental into an empty output (warm render cache)
+  incremental noop   --incremental with nothing changed
+  incremental edit   --incremental after appending a paragraph to one post
+
+Every run appends a record (sizes, timings, commit, machine) to
+benchmarks/results/build.jsonl and prints each timing next to the previous
+record for the same size and --jobs, so changes show up as a delta.
+
+Run: python benchmarks/build.py [--sizes 100 1000 10000] [--jobs N] [--repeat N]
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import pathlib
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import corpus
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+RESULTS = ROOT / "benchmarks" / "results" / "build.jsonl"
+
+SCENARIOS = (
+    "full cold",
+    "full warm",
+    "incremental first",
+    "incremental noop",
+    "incremental edit",
+)
+
+
+def _run_cli(argv, cache_dir, workdir):
+    """Child process: time one cli.main(argv) build."""
+    os.environ["BUILD_CACHE_DIR"] = str(cache_dir)
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT / "src"))
+    import cli
+
+    # Pelican prints a "Done: ..." summary per site even with -q.
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        cli.main(argv)
+        return time.perf_counter() - start
+
+
+def timed_build(argv, cache_dir, workdir):
+    ctx = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=ctx) as pool:
+        return pool.submit(_run_cli, argv, cache_dir, workdir).result()
+
+
+def _edit_one_post(content):
+    post = sorted((content / "blog").glob("*.md"))[0]
+    with open(post, "a", encoding="utf-8") as f:
+        f.write("\nOne more paragraph, appended by benchmarks/build.py.\n")
+
+
+def bench_size(workdir, posts, jobs, seed):
+    """Seconds per scenario for one corpus of posts posts."""
+    content = workdir / f"content-{posts}"
+    output = workdir / f"output-{posts}"
+    cache = workdir / f"cache-{posts}"
+    corpus.generate_corpus(content, posts, seed)
+    for path in (output, cache):
+        shutil.rmtree(path, ignore_errors=True)
+
+    base = ["-q", "-o", str(output), "-e", f"PATH={json.dumps(str(content))}"]
+    base += ["--jobs", str(jobs)]
+    full = base + ["--delete-output-directory"]
+    incremental = base + ["--incremental"]
+
+    timings = {}
+    timings["full cold"] = timed_build(full, cache, workdir)
+    timings["full warm"] = timed_build(full, cache, workdir)
+    shutil.rmtree(output)
+    timings["incremental first"] = timed_build(incremental, cache, workdir)
+    timings["incremental noop"] = timed_build(incremental, cache, workdir)
+    _edit_one_post(content)
+    timings["incremental edit"] = timed_build(incremental, cache, workdir)
+    return timings
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(path):
+    """{(posts, jobs): latest record} from an earlier results file."""
+    previous = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                record = json.loads(line)
+                previous[(record["posts"], record["jobs"])] = record
+    return previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Run every scenario this many times and record the median.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", type=pathlib.Path, default=RESULTS)
+    parser.add_argument(
+        "--workdir",
+        type=pathlib.Path,
+        help="Where corpora, outputs and caches go (default: a temp dir).",
+    )
+    args = parser.parse_args(argv)
+
+    previous = load_previous(args.results)
+    workdir = args.workdir or pathlib.Path(tempfile.mkdtemp(prefix="bench-build-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"{'posts':>7}  {'scenario':<20}{'seconds':>10}{'previous':>10}{'delta':>9}")
+    try:
+        for posts in args.sizes:
+            runs = [
+                bench_size(workdir, posts, args.jobs, args.seed)
+                for _ in range(args.repeat)
+            ]
+            timings = {
+                name: statistics.median(run[name] for run in runs) for name in SCENARIOS
+            }
+            before = previous.get((posts, args.jobs), {}).get("timings", {})
+            for name in SCENARIOS:
+                seconds, old = timings[name], before.get(name)
+                delta = f"{100 * (seconds - old) / old:>+8.1f}%" if old else f"{'':>9}"
+                old = f"{old:>10.2f}" if old else f"{'-':>10}"
+                print(f"{posts:>7}  {name:<20}{seconds:>10.2f}{old}{delta}")
+
+            record = {
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "commit": _commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "posts": posts,
+                "jobs": args.jobs,
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "timings": timings,
+            }
+            with open(args.results, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
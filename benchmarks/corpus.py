@@ -0,0 +1,198 @@
+"""Synthetic content trees shaped like src/content, at any size.
+
+Posts rotate through the formats the real content uses:
+
+  toml      Markdown with a +++ front-matter block (Key: value lines, like the
+            real +++ posts)
+  gfm       Markdown with a --- front-matter block
+  rst       reStructuredText with a ``.. gist::`` directive
+  code      Markdown that is mostly fenced code in several languages
+  blogmark  a short link post with Link: and Via: metadata
+
+About one post in seven goes to til/, the rest to blog/. The landing's pages
+(www/), .well-known/ and the static files are copied from src/content so
+every site has what it expects. Generation is seeded, so a given size always
+produces the same tree.
+
+Run: python benchmarks/corpus.py DEST --posts N [--seed N]
+"""
+
+import argparse
+import datetime
+import pathlib
+import random
+import shutil
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+CONTENT = ROOT / "src" / "content"
+
+FORMATS = ("toml", "gfm", "rst", "code", "blogmark")
+
+# Copied verbatim from the real content.
+_COPIED = ("www", ".well-known", "extra", "media")
+
+_WORDS = (
+    "cache compiler kernel python cython pointer buffer parser lexer thread "
+    "process stack frame symbol binary assembly register memory page table "
+    "render template signal module build deploy latency throughput vector "
+    "iterator generator decorator closure allocator syscall mmap socket"
+).split()
+
+_TAGS = (
+    "python",
+    "cpp",
+    "reverse engineering",
+    "performance",
+    "tooling",
+    "linux",
+    "macos",
+    "security",
+    "writing",
+    "cython",
+    "assembly",
+    "debugging",
+)
+
+_CODE = {
+    "python": "def {name}(items):\n    total = 0\n    for item in items:\n"
+    "        total += item * {n}\n    return total\n",
+    "cpp": "template <typename T>\nconstexpr T {name}(T value) {{\n"
+    "    return value * {n} + sizeof(T);\n}}\n",
+    "bash": 'for f in *.md; do\n  echo "{name}: $f" | tr a-z A-Z\ndone\nexit {n}\n',
+    "rust": "fn {name}(v: &[u64]) -> u64 {{\n    v.iter().map(|x| x * {n}).sum()\n}}\n",
+    "nasm": "section .text\nglobal {name}\n{name}:\n    mov rax, {n}\n"
+    "    add rax, rdi\n    ret\n",
+    "c": "static int {name}(const char *s) {{\n    int n = {n};\n"
+    "    while (*s++) n++;\n    return n;\n}}\n",
+}
+
+
+class _Writer:
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def words(self, n):
+        return " ".join(self.random.choice(_WORDS) for _ in range(n))
+
+    def sentence(self):
+        return self.words(self.random.randint(8, 20)).capitalize() + "."
+
+    def paragraph(self):
+        return " ".join(self.sentence() for _ in range(self.random.randint(3, 6)))
+
+    def markdown_body(self, paragraphs, code_blocks):
+        parts = []
+        for i in range(paragraphs):
+            parts.append(self.paragraph())
+            if i % 3 == 1:
+                parts.append(f"## {self.words(4).title()}")
+            if i < code_blocks:
+                parts.append(self.fence())
+        for _ in range(max(0, code_blocks - paragraphs)):
+            parts.append(self.fence())
+        return "\n\n".join(parts) + "\n"
+
+    def fence(self):
+        lang = self.random.choice(sorted(_CODE))
+        code = _CODE[lang].format(
+            name=self.random.choice(_WORDS) + "_" + str(self.random.randint(0, 99)),
+            n=self.random.randint(2, 64),
+        )
+        return f"```{lang}\n{code}```"
+
+    def tags(self):
+        return ", ".join(self.random.sample(_TAGS, self.random.randint(1, 4)))
+
+    def date(self, index):
+        start = datetime.datetime(2010, 1, 1, 9, 0)
+        return start + datetime.timedelta(
+            days=index, minutes=self.random.randint(0, 600)
+        )
+
+
+def _front_matter(fence, fields):
+    lines = [fence] + [f"{name}: {value}" for name, value in fields] + [fence]
+    return "\n".join(lines) + "\n\n"
+
+
+def render_post(writer, index, fmt, classification):
+    """(file name, text) of synthetic post number index in format fmt."""
+    title = writer.words(5).title()
+    slug = f"post-{index:05d}-{fmt}"
+    date = writer.date(index)
+    fields = [
+        ("Title", title),
+        ("Date", date.strftime("%Y-%m-%d %H:%M")),
+        ("Author", "Mahmoud"),
+        ("Tags", writer.tags()),
+        ("Classification", classification),
+        ("Slug", slug),
+    ]
+
+    if fmt == "rst":
+        heading = "#" * len(title)
+        meta = "\n".join(
+            f":{name.lower()}: {value}" for name, value in fields if name != "Title"
+        )
+        gist = writer.random.randint(100000, 999999)
+        body = "\n\n".join(writer.paragraph() for _ in range(4))
+        text = (
+            f"{title}\n{heading}\n{meta}\n:excerpt: {writer.sentence()}\n\n"
+            f"{body}\n\n.. gist:: {gist} {slug}.py\n\n{writer.paragraph()}\n"
+        )
+        return f"{slug}.rst", text
+
+    if fmt == "blogmark":
+        fields.append(
+            ("Link", f"https://{writer.random.choice(_WORDS)}.example.com/{slug}")
+        )
+        fields.append(("Via", f"https://news.example.org/item?id={index}"))
+        return f"{slug}.md", _front_matter("+++", fields) + writer.paragraph() + "\n"
+
+    fields.append(("Excerpt", writer.sentence()))
+    if fmt == "code":
+        body = writer.markdown_body(paragraphs=3, code_blocks=12)
+    else:
+        body = writer.markdown_body(paragraphs=8, code_blocks=2)
+    fence = "---" if fmt == "gfm" else "+++"
+    return f"{slug}.md", _front_matter(fence, fields) + body
+
+
+def generate_corpus(dest, posts, seed=0):
+    """Write a content tree with posts synthetic posts under dest.
+
+    Returns:
+        dict: format -> number of posts written in it.
+    """
+    dest = pathlib.Path(dest)
+    if dest.exists():
+        shutil.rmtree(dest)
+    for name in _COPIED:
+        shutil.copytree(CONTENT / name, dest / name)
+    (dest / "blog").mkdir(parents=True)
+    (dest / "til").mkdir(parents=True)
+
+    writer = _Writer(seed)
+    counts = dict.fromkeys(FORMATS, 0)
+    for index in range(posts):
+        fmt = FORMATS[index % len(FORMATS)]
+        section = "til" if index % 7 == 6 else "blog"
+        name, text = render_post(writer, index, fmt, section)
+        (dest / section / name).write_text(text, encoding="utf-8")
+        counts[fmt] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dest", type=pathlib.Path)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = generate_corpus(args.dest, args.posts, args.seed)
+    print(", ".join(f"{n} {fmt}" for fmt, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Per-language Pygments cost on the real posts.
+
+Renders every Markdown file under src/content with cmark, pulls out the fenced
+code blocks exactly as plugins.highlight sees them, and reports how long each
+language takes to highlight, plus what the memoized lexer lookup saves over
+calling pygments.lexers.get_lexer_by_name for every block.
+
+Run: python benchmarks/highlight.py [--repeat N] [--workers N]
+"""
+
+import argparse
+import collections
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import cmarkgfm  # noqa: E402
+import pygments.lexers  # noqa: E402
+import pygments.util  # noqa: E402
+from cmarkgfm.cmark import Options as cmarkgfm_options  # noqa: E402
+
+from plugins import highlight  # noqa: E402
+
+
+def collect_blocks(content_dir):
+    """(source path, rendered html, [(lang, code), ...]) for every .md post."""
+    docs = []
+    for path in sorted(content_dir.rglob("*.md")):
+        rendered = cmarkgfm.github_flavored_markdown_to_html(
+            path.read_text(encoding="utf-8"),
+            options=cmarkgfm_options.CMARK_OPT_UNSAFE,
+        )
+        blocks = [p for p in highlight.split_blocks(rendered) if isinstance(p, tuple)]
+        docs.append((path, rendered, blocks))
+    return docs
+
+
+def bench_languages(docs, repeat):
+    # Build every lexer up front so the first block of each language isn't
+    # charged for lexer construction.
+    for _, _, blocks in docs:
+        for lang, _ in blocks:
+            highlight.get_lexer(lang)
+
+    stats = collections.defaultdict(lambda: [0, 0, 0.0])  # blocks, bytes, seconds
+    for _, _, blocks in docs:
+        for lang, code in blocks:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                highlight.highlight_block(lang, code)
+            elapsed = (time.perf_counter() - start) / repeat
+            entry = stats[highlight.normalize_lang(lang)]
+            entry[0] += 1
+            entry[1] += len(code)
+            entry[2] += elapsed
+    return stats
+
+
+def bench_lookup(docs, repeat):
+    langs = [lang for _, _, blocks in docs for lang, _ in blocks]
+
+    def uncached(lang):
+        try:
+            return pygments.lexers.get_lexer_by_name(highlight.normalize_lang(lang))
+        except pygments.util.ClassNotFound:
+            return pygments.lexers.TextLexer()
+
+    timings = {}
+    for label, lookup in (
+        ("get_lexer_by_name", uncached),
+        ("get_lexer", highlight.get_lexer),
+    ):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for lang in langs:
+                lookup(lang)
+        timings[label] = (time.perf_counter() - start) / max(1, repeat * len(langs))
+    return len(langs), timings
+
+
+def bench_documents(docs, workers, min_blocks):
+    rows = []
+    for path, rendered, blocks in docs:
+        if not blocks:
+            continue
+        start = time.perf_counter()
+        highlight.highlight_html(rendered)
+        serial = time.perf_counter() - start
+        parallel = None
+        if workers:
+            start = time.perf_counter()
+            highlight.highlight_html(rendered, workers=workers, min_blocks=min_blocks)
+            parallel = time.perf_counter() - start
+        rows.append((path.name, len(blocks), serial, parallel))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--content", type=pathlib.Path, default=ROOT / "src" / "content"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Also time each document on a process pool of this size.",
+    )
+    parser.add_argument("--min-blocks", type=int, default=highlight.PARALLEL_MIN_BLOCKS)
+    args = parser.parse_args(argv)
+
+    docs = collect_blocks(args.content)
+
+    print(f"{'language':<16}{'blocks':>8}{'KiB':>10}{'ms':>10}{'us/KiB':>10}")
+    stats = bench_languages(docs, args.repeat)
+    for lang, (blocks, size, seconds) in sorted(
+        stats.items(), key=lambda kv: kv[1][2], reverse=True
+    ):
+        kib = size / 1024
+        print(
+            f"{lang:<16}{blocks:>8}{kib:>10.1f}{seconds * 1e3:>10.2f}"
+            f"{seconds * 1e6 / max(kib, 1e-9):>10.0f}"
+        )
+
+    count, timings = bench_lookup(docs, args.repeat)
+    print(f"\nlexer lookup over {count} blocks:")
+    for label, seconds in timings.items():
+        print(f"  {label:<20}{seconds * 1e6:>10.2f} us/block")
+
+    print(f"\n{'document':<56}{'blocks':>8}{'serial ms':>12}{'pool ms':>10}")
+    for name, blocks, serial, parallel in bench_documents(
+        docs, args.workers, args.min_blocks
+    ):
+        pool = f"{parallel * 1e3:>10.2f}" if parallel is not None else f"{'-':>10}"
+        print(f"{name[:55]:<56}{blocks:>8}{serial * 1e3:>12.2f}{pool}")
+
+
+if __name__ == "__main__":
+    main()
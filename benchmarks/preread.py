@@ -0,0 +1,70 @@
+"""Cold build times of cli.py with the sources read ahead on N processes.
+
+For each corpus size a tree is generated with benchmarks/corpus.py and built
+cold (empty output, empty caches) through cli.main in a fresh process, once
+per --workers value, with -e PREREAD_WORKERS=N (plugins/preread.py); 0 is
+the serial reading the generators do by themselves. Outputs are compared
+with the serial build's, so a worker count that changes the site fails the
+run. Reading only scales with the cores the machine has; os.cpu_count() is
+printed with the results.
+
+Run: python benchmarks/preread.py [--sizes 200 1000] [--workers 0 2 4]
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+
+import corpus
+from build import timed_build
+
+
+def _same_tree(a, b):
+    cmp = filecmp.dircmp(a, b)
+    if cmp.left_only or cmp.right_only or cmp.diff_files or cmp.funny_files:
+        return False
+    return all(_same_tree(a / d, b / d) for d in cmp.common_dirs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({0, 2, os.cpu_count() or 1})
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'posts':>7}{'workers':>9}{'seconds':>10}{'speedup':>9}")
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="bench-preread-"))
+    try:
+        for posts in args.sizes:
+            content = workdir / f"content-{posts}"
+            corpus.generate_corpus(content, posts, args.seed)
+            serial = reference = None
+            for workers in args.workers:
+                output = workdir / f"output-{posts}-{workers}"
+                cache = workdir / f"cache-{posts}-{workers}"
+                argv = ["-q", "-o", str(output)]
+                argv += ["-e", f"PATH={json.dumps(str(content))}"]
+                argv += ["-e", f"PREREAD_WORKERS={workers}"]
+                seconds = timed_build(argv, cache, workdir)
+                if reference is None:
+                    serial, reference = seconds, output
+                elif not _same_tree(reference, output):
+                    sys.exit(f"{output} differs from {reference}")
+                print(
+                    f"{posts:>7}{workers:>9}{seconds:>10.2f}{serial / seconds:>8.2f}x"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
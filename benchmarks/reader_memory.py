@@ -0,0 +1,123 @@
+"""Peak memory of the GFM reader on multi-megabyte posts.
+
+Writes one generated Markdown post per --sizes entry (MiB of body text, with
+the fenced code of benchmarks/corpus.py mixed in) and reads each in a fresh
+process, twice: through plugins/gfm.py as it is, which memory-maps sources
+of MMAP_MIN_BYTES or more and feeds the body to cmark from the mapping, and
+through the previous path, which read the file, decoded it to a str, cut the
+body out with a regex and handed cmark an encoded copy of that. Each child
+reports how far its peak RSS rose above the RSS it had after importing
+everything, so interpreter and library start-up is left out.
+
+Run: python benchmarks/reader_memory.py [--sizes MiB ...]
+"""
+
+import argparse
+import copy
+import pathlib
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import corpus
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pelican.settings import DEFAULT_CONFIG  # noqa: E402
+
+from plugins import gfm, highlight  # noqa: E402
+
+# The str pattern the reader matched before it worked on bytes.
+PREVIOUS_FRONTMATTER_RE = re.compile(
+    r"^(?:\s*\n)*"
+    r"(?P<delimiter>\+\+\+|---)\s*\n"
+    r"(?P<metadata>.*?)"
+    r"^(?:\+\+\+|---|\.\.\.)\s*\n"
+    r"(?P<content>.*)",
+    re.DOTALL | re.MULTILINE,
+)
+
+
+def write_post(path, mib):
+    writer = corpus._Writer(seed=mib)
+    chunks = ["+++\nTitle: A long transcript\nDate: 2025-01-01\n+++\n"]
+    size = 0
+    while size < mib << 20:
+        chunks.append(writer.markdown_body(20, 2))
+        size += len(chunks[-1])
+    path.write_text("\n".join(chunks), encoding="utf-8")
+
+
+def previous_read(reader, source_path):
+    """GFMReader.read() before sources were memory-mapped (cache off)."""
+    with open(source_path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8")
+    match = PREVIOUS_FRONTMATTER_RE.match(text)
+    meta = reader._split_metadata(match.group("metadata"))
+    content = highlight.highlight_html(reader._convert(match.group("content")))
+    return content, reader._process_metadata(meta)
+
+
+def peak_rss_kib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(mode, source_path):
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings["RENDER_CACHE_PATH"] = ""
+    reader = gfm.GFMReader(settings)
+    read = reader.read if mode == "mapped" else lambda p: previous_read(reader, p)
+    # Warm up on a small post so lazily built state (lexers, cmark
+    # extensions) isn't counted against the big one.
+    with tempfile.TemporaryDirectory() as tmp:
+        small = pathlib.Path(tmp) / "small.md"
+        small.write_text(
+            "+++\nTitle: small\n+++\n" + corpus._Writer(0).markdown_body(3, 3)
+        )
+        read(str(small))
+    baseline = peak_rss_kib()
+    start = time.perf_counter()
+    content, _ = read(source_path)
+    elapsed = time.perf_counter() - start
+    print(peak_rss_kib() - baseline, len(content), f"{elapsed:.3f}")
+
+
+def measure(mode, source_path):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(source_path)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return int(out[0]), int(out[1]), float(out[2])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 32])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(*args.child)
+
+    print(f"{'MiB':>5}{'previous MiB':>14}{'mapped MiB':>12}{'prev s':>8}{'new s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mib in args.sizes:
+            path = pathlib.Path(tmp) / f"post-{mib}.md"
+            write_post(path, mib)
+            old_kib, old_len, old_s = measure("previous", path)
+            new_kib, new_len, new_s = measure("mapped", path)
+            assert old_len == new_len, (old_len, new_len)
+            print(
+                f"{path.stat().st_size / 2**20:>5.0f}{old_kib / 1024:>14.1f}"
+                f"{new_kib / 1024:>12.1f}{old_s:>8.2f}{new_s:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Markdown reading through plugins/gfm.py: one read and one render per file.
+
+Generates a corpus with benchmarks/corpus.py (+++ "Key: value" and --- posts),
+adds --toml posts whose +++ header is real TOML, and reads every Markdown file
+through Pelican's Readers with the GFM reader registered, as a site build
+does (render cache off). Every open() of a source, every body render and
+every front-matter parse is counted per file; the run fails if any file was
+opened, rendered or parsed more than once.
+
+Run: python benchmarks/readers.py [--posts N] [--toml N]
+"""
+
+import argparse
+import builtins
+import collections
+import copy
+import pathlib
+import sys
+import tempfile
+import time
+
+import corpus
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pelican.contents import Page  # noqa: E402
+from pelican.readers import Readers  # noqa: E402
+from pelican.settings import DEFAULT_CONFIG  # noqa: E402
+
+from plugins import gfm, highlight, toml_metadata  # noqa: E402
+
+TOML_POST = """+++
+title = "TOML post {n}"
+date = 2025-01-{day:02d}
+tags = ["python", "toml"]
+summary = "A post whose front matter is *real* TOML."
++++
+{body}
+"""
+
+
+def write_toml_posts(content, count):
+    directory = content / "blog" / "toml"
+    directory.mkdir(parents=True, exist_ok=True)
+    writer = corpus._Writer(seed=1)
+    for n in range(count):
+        body = writer.markdown_body(3, 1)
+        text = TOML_POST.format(n=n, day=n % 28 + 1, body=body)
+        (directory / f"toml-{n}.md").write_text(text, encoding="utf-8")
+
+
+class Counters:
+    """Per source path: opens, renders and front-matter parses."""
+
+    def __init__(self, paths):
+        self.paths = {str(p) for p in paths}
+        self.counts = collections.defaultdict(collections.Counter)
+        self.current = None
+
+    def install(self):
+        real_open = builtins.open
+        real_render = gfm.GFMReader._render
+        real_highlight = highlight.highlight_html
+        real_toml = toml_metadata.raw_toml_metadata
+        real_split = gfm.GFMReader._split_metadata
+        counters = self
+
+        def counting_open(file, *args, **kwargs):
+            if str(file) in counters.paths:
+                counters.current = str(file)
+                counters.counts[str(file)]["open"] += 1
+            return real_open(file, *args, **kwargs)
+
+        def counting_render(reader, text):
+            counters.counts[counters.current]["render"] += 1
+            return real_render(reader, text)
+
+        def counting_highlight(*args, **kwargs):
+            counters.counts[counters.current]["highlight"] += 1
+            return real_highlight(*args, **kwargs)
+
+        def counting_toml(text):
+            result = real_toml(text)  # raises for "Key: value" headers
+            counters.counts[counters.current]["front matter"] += 1
+            return result
+
+        def counting_split(reader, metadata):
+            counters.counts[counters.current]["front matter"] += 1
+            return real_split(reader, metadata)
+
+        builtins.open = counting_open
+        gfm.GFMReader._render = counting_render
+        highlight.highlight_html = counting_highlight
+        toml_metadata.raw_toml_metadata = counting_toml
+        gfm.GFMReader._split_metadata = counting_split
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--toml", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        content = pathlib.Path(tmp) / "content"
+        corpus.generate_corpus(content, args.posts)
+        write_toml_posts(content, args.toml)
+        paths = sorted(content.rglob("*.md"))
+
+        settings = copy.deepcopy(DEFAULT_CONFIG)
+        settings.update(PATH=str(content), RENDER_CACHE_PATH="", CACHE_CONTENT=False)
+        gfm.register()
+        readers = Readers(settings)
+
+        kinds = collections.Counter()
+        for path in paths:
+            first = path.read_text(encoding="utf-8")[:3]
+            kinds[first if first in ("+++", "---") else "no front matter"] += 1
+
+        counters = Counters(paths)
+        counters.install()
+        start = time.perf_counter()
+        for path in paths:
+            page = readers.read_file(
+                str(content), str(path.relative_to(content)), content_class=Page
+            )
+            if path.parent.name == "toml":
+                assert [t.name for t in page.metadata["tags"]] == ["python", "toml"]
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(paths)} Markdown files: "
+        + ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items()))
+    )
+    print(f"read in {elapsed * 1e3:.0f} ms, {elapsed * 1e6 / len(paths):.0f} us/file")
+    worst = collections.Counter()
+    for counts in counters.counts.values():
+        for name, count in counts.items():
+            worst[name] = max(worst[name], count)
+    print("most per file: " + ", ".join(f"{k} {v}" for k, v in sorted(worst.items())))
+    if any(count > 1 for count in worst.values()):
+        sys.exit("a file was read, rendered or parsed more than once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""striptags_nl on the longest posts, against the loop it replaced.
+
+Renders the longest Markdown files under src/content with cmark and times
+jinja_filters.striptags_nl on each, next to the previous implementation that
+rebuilt the whole string for every comment and tag it cut. --scale repeats
+each document that many times, to show how both grow with length.
+
+Run: python benchmarks/striptags.py [--posts N] [--repeat N] [--scale N]
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import cmarkgfm  # noqa: E402
+from cmarkgfm.cmark import Options as cmarkgfm_options  # noqa: E402
+from markupsafe import Markup  # noqa: E402
+
+import jinja_filters  # noqa: E402
+
+
+def previous_striptags_nl(value, preserve_linebreaks=False):
+    """The implementation before the single-pass one, minus its print()."""
+    while (start := value.find("<!--")) != -1:
+        if (end := value.find("-->", start)) == -1:
+            break
+        value = f"{value[:start]}{value[end + 3 :]}"
+    while (start := value.find("<")) != -1:
+        if (end := value.find(">", start)) == -1:
+            break
+        value = f"{value[:start]}{value[end + 1 :]}"
+    if preserve_linebreaks:
+        value = jinja_filters._COLLAPSE_SPACES_RE.sub(" ", value)
+    else:
+        value = " ".join(value.split())
+    return Markup(value).unescape()
+
+
+def longest_posts(content_dir, count):
+    """(name, rendered html) of the count longest .md posts."""
+    paths = sorted(content_dir.rglob("*.md"), key=lambda p: p.stat().st_size)
+    docs = []
+    for path in reversed(paths[-count:]):
+        rendered = cmarkgfm.github_flavored_markdown_to_html(
+            path.read_text(encoding="utf-8"),
+            options=cmarkgfm_options.CMARK_OPT_UNSAFE,
+        )
+        docs.append((path.name, rendered))
+    return docs
+
+
+def best_of(func, value, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--content", type=pathlib.Path, default=ROOT / "src" / "content"
+    )
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'document':<48}{'KiB':>8}{'tags':>7}{'old ms':>10}{'new ms':>10}")
+    for name, rendered in longest_posts(args.content, args.posts):
+        rendered *= args.scale
+        assert jinja_filters.striptags_nl(rendered) == previous_striptags_nl(rendered)
+        old = best_of(previous_striptags_nl, rendered, args.repeat)
+        new = best_of(jinja_filters.striptags_nl, rendered, args.repeat)
+        print(
+            f"{name[:47]:<48}{len(rendered) / 1024:>8.1f}{rendered.count('<'):>7}"
+            f"{old * 1e3:>10.2f}{new * 1e3:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""untagify one fragment at a time against untagify_many on a whole batch.
+
+Splits the rendered Markdown posts under src/content into paragraph-sized
+fragments, the size of a listing's summaries, and reports the cost per
+fragment of calling untagify on each versus untagify_many on batches of
+--batch fragments.
+
+Run: python benchmarks/untagify.py [--batch N ...] [--repeat N]
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import cmarkgfm  # noqa: E402
+from cmarkgfm.cmark import Options as cmarkgfm_options  # noqa: E402
+
+import jinja_filters  # noqa: E402
+
+
+def fragments(content_dir):
+    """Every non-blank line of every rendered .md post (a paragraph, mostly)."""
+    out = []
+    for path in sorted(content_dir.rglob("*.md")):
+        rendered = cmarkgfm.github_flavored_markdown_to_html(
+            path.read_text(encoding="utf-8"),
+            options=cmarkgfm_options.CMARK_OPT_UNSAFE,
+        )
+        out.extend(line for line in rendered.splitlines() if line.strip())
+    return out
+
+
+def per_fragment(batches, preserve_linebreaks):
+    for batch in batches:
+        for fragment in batch:
+            jinja_filters.untagify(fragment, preserve_linebreaks)
+
+
+def batched(batches, preserve_linebreaks):
+    for batch in batches:
+        jinja_filters.untagify_many(batch, preserve_linebreaks)
+
+
+def best_of(func, repeat, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--content", type=pathlib.Path, default=ROOT / "src" / "content"
+    )
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 30, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    frags = fragments(args.content)
+    print(f"{len(frags)} fragments, {sum(map(len, frags)) / 1024:.0f} KiB")
+    print(f"{'batch':>6}{'linebreaks':>12}{'untagify us':>14}{'many us':>10}")
+    for size in args.batch:
+        batches = [frags[i : i + size] for i in range(0, len(frags), size)]
+        for preserve in (False, True):
+            one = best_of(per_fragment, args.repeat, batches, preserve)
+            many = best_of(batched, args.repeat, batches, preserve)
+            print(
+                f"{size:>6}{str(preserve):>12}"
+                f"{one * 1e6 / len(frags):>14.2f}{many * 1e6 / len(frags):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
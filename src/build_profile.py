@@ -0,0 +1,326 @@
+#
+# build_profile.py -- where a cli.py build spends its time (cli.py --profile)
+#
+# The profiler wraps a handful of Pelican and plugin entry points for the
+# duration of a build and charges the time spent in each to a phase:
+#
+#   settings                      get_instance (settings, plugin loading)
+#   read_file                     Pelican's per-source bookkeeping
+#   read:<Reader>                 a reader parsing a source (docutils, ...)
+#   convert:<Reader>              Markdown to HTML (cmark)
+#   highlight                     Pygments, via plugins.highlight
+#   generate_context:<Generator>  a generator's pass over what was read
+#   generate_output:<Generator>   the same generator's output pass
+#   load templates                finding and compiling Jinja templates
+#   render                        Jinja template rendering
+#   write                         writing files and feeds
+#   static copy                   copying static files and theme assets
+#   plugin:<module>               the module's signal receivers (assets, ...)
+#   other                         whatever is left
+#
+# Phases nest (a reader runs inside a generator pass, a template renders
+# inside a write), so each phase reports its exclusive time: the sum over all
+# phases is the site's wall time. Source files and templates are also timed
+# individually (inclusive) for the top-N lists.
+#
+# Peak RSS comes from getrusage, which is a high-water mark for the whole
+# process: for sites built one after another in one process, each site's
+# figure is the peak reached by the end of its build.
+#
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+import blinker
+import jinja2
+import pelican.generators
+import pelican.readers
+import pelican.writers
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_kib():
+    """The process's peak resident set size in KiB, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _subclasses(sub)
+
+
+class _Span:
+    __slots__ = ("start", "children", "elapsed")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.children = 0.0
+        self.elapsed = 0.0
+
+
+class Profiler:
+    """Collects per-site, per-phase timings while installed."""
+
+    def __init__(self):
+        self._stack = []
+        self._patches = []
+        self.current_site = None
+        self.sites = collections.defaultdict(
+            lambda: {"elapsed": 0.0, "peak_rss_kib": None}
+        )
+        # (site, phase) -> [calls, exclusive seconds]
+        self.phases = collections.defaultdict(lambda: [0, 0.0])
+        # (site, source path) -> inclusive seconds
+        self.sources = collections.defaultdict(float)
+        # (site, template name) -> [renders, inclusive seconds]
+        self.templates = collections.defaultdict(lambda: [0, 0.0])
+
+    @contextlib.contextmanager
+    def site(self, name, phase=None):
+        """Charge everything in the block to site name (and to phase, if given)."""
+        previous, self.current_site = self.current_site, name
+        start = time.perf_counter()
+        try:
+            if phase is None:
+                yield
+            else:
+                with self.span(phase):
+                    yield
+        finally:
+            entry = self.sites[name]
+            entry["elapsed"] += time.perf_counter() - start
+            entry["peak_rss_kib"] = peak_rss_kib()
+            self.current_site = previous
+
+    @contextlib.contextmanager
+    def span(self, phase):
+        span = _Span()
+        self._stack.append(span)
+        try:
+            yield span
+        finally:
+            self._stack.pop()
+            span.elapsed = time.perf_counter() - span.start
+            if self._stack:
+                self._stack[-1].children += span.elapsed
+            entry = self.phases[(self.current_site, phase)]
+            entry[0] += 1
+            entry[1] += span.elapsed - span.children
+
+    # -- instrumentation ----------------------------------------------------
+
+    def _patch(self, owner, attr, make_wrapper):
+        original = owner.__dict__.get(attr)
+        if original is None or getattr(original, "__profiled__", False):
+            return
+        wrapper = functools.wraps(original)(make_wrapper(original))
+        wrapper.__profiled__ = True
+        setattr(owner, attr, wrapper)
+        self._patches.append((owner, attr, original))
+
+    def _timed(self, owner, attr, phase):
+        """Wrap owner.attr so each call is charged to phase(self_arg)."""
+
+        def make_wrapper(original):
+            def wrapper(obj, *args, **kwargs):
+                with self.span(phase(obj)):
+                    return original(obj, *args, **kwargs)
+
+            return wrapper
+
+        self._patch(owner, attr, make_wrapper)
+
+    def install(self):
+        """Wrap the entry points. Call again after plugins load to pick up
+        the reader classes they define; already wrapped ones are skipped."""
+        profiler = self
+
+        for cls in _subclasses(pelican.readers.BaseReader):
+            self._timed(cls, "read", lambda r: f"read:{type(r).__name__}")
+            self._timed(cls, "_convert", lambda r: f"convert:{type(r).__name__}")
+
+        def read_file(original):
+            def wrapper(readers, base_path, path, *args, **kwargs):
+                with profiler.span("read_file") as span:
+                    result = original(readers, base_path, path, *args, **kwargs)
+                profiler.sources[(profiler.current_site, path)] += span.elapsed
+                return result
+
+            return wrapper
+
+        self._patch(pelican.readers.Readers, "read_file", read_file)
+
+        for cls in _subclasses(pelican.generators.Generator):
+            for attr in ("generate_context", "generate_output"):
+                self._timed(
+                    cls, attr, lambda g, attr=attr: f"{attr}:{type(g).__name__}"
+                )
+        self._timed(
+            pelican.generators.Generator, "get_template", lambda g: "load templates"
+        )
+        for attr in ("_link_or_copy_staticfile", "_copy_paths"):
+            self._timed(
+                pelican.generators.StaticGenerator, attr, lambda g: "static copy"
+            )
+
+        for attr in ("write_file", "write_feed"):
+            self._timed(pelican.writers.Writer, attr, lambda w: "write")
+
+        def render(original):
+            def wrapper(template, *args, **kwargs):
+                with profiler.span("render") as span:
+                    result = original(template, *args, **kwargs)
+                entry = profiler.templates[(profiler.current_site, template.name)]
+                entry[0] += 1
+                entry[1] += span.elapsed
+                return result
+
+            return wrapper
+
+        self._patch(jinja2.Template, "render", render)
+
+        highlight = sys.modules.get("plugins.highlight")
+        if highlight is not None:
+
+            def highlight_html(original):
+                def wrapper(*args, **kwargs):
+                    with profiler.span("highlight"):
+                        return original(*args, **kwargs)
+
+                return wrapper
+
+            self._patch(highlight, "highlight_html", highlight_html)
+
+        # Plugins do their work in signal receivers; charge each receiver to
+        # the module that connected it.
+        def receivers_for(original):
+            def wrapper(signal, sender):
+                for receiver in original(signal, sender):
+                    yield profiler._receiver(receiver)
+
+            return wrapper
+
+        self._patch(blinker.Signal, "receivers_for", receivers_for)
+
+    def _receiver(self, receiver):
+        phase = "plugin:" + (getattr(receiver, "__module__", None) or "?")
+
+        @functools.wraps(receiver)
+        def wrapper(*args, **kwargs):
+            with self.span(phase):
+                return receiver(*args, **kwargs)
+
+        return wrapper
+
+    def uninstall(self):
+        while self._patches:
+            owner, attr, original = self._patches.pop()
+            setattr(owner, attr, original)
+
+    # -- reporting ----------------------------------------------------------
+
+    def report(self, top=10):
+        """The collected timings as a JSON-serializable dict."""
+        sites = {}
+        for name, totals in self.sites.items():
+            phases = {
+                phase: {"calls": calls, "seconds": seconds}
+                for (site, phase), (calls, seconds) in self.phases.items()
+                if site == name
+            }
+            accounted = sum(p["seconds"] for p in phases.values())
+            phases["other"] = {
+                "calls": 1,
+                "seconds": max(0.0, totals["elapsed"] - accounted),
+            }
+            sites[name] = dict(totals, phases=phases)
+
+        return {
+            "sites": sites,
+            "slowest_sources": _top(
+                (
+                    {"site": site, "path": path, "seconds": seconds}
+                    for (site, path), seconds in self.sources.items()
+                ),
+                top,
+            ),
+            "slowest_templates": _top(
+                (
+                    {"site": site, "template": name, "renders": n, "seconds": seconds}
+                    for (site, name), (n, seconds) in self.templates.items()
+                ),
+                top,
+            ),
+        }
+
+
+def _top(rows, n):
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)[:n]
+
+
+def merge_reports(reports, top=10):
+    """Combine the reports of sites profiled in separate worker processes."""
+    merged = {"sites": {}, "slowest_sources": [], "slowest_templates": []}
+    for report in reports:
+        merged["sites"].update(report["sites"])
+        merged["slowest_sources"].extend(report["slowest_sources"])
+        merged["slowest_templates"].extend(report["slowest_templates"])
+    merged["slowest_sources"] = _top(merged["slowest_sources"], top)
+    merged["slowest_templates"] = _top(merged["slowest_templates"], top)
+    return merged
+
+
+def write_report(report, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def format_report(report):
+    """The report as plain-text tables."""
+    lines = []
+    for name, site in report["sites"].items():
+        rss = site["peak_rss_kib"]
+        lines.append(
+            "{}: {:.3f}s, peak RSS {}".format(
+                name,
+                site["elapsed"],
+                f"{rss / 1024:.1f} MiB" if rss is not None else "n/a",
+            )
+        )
+        lines.append(f"  {'phase':<40}{'calls':>8}{'seconds':>10}{'%':>7}")
+        for phase, entry in sorted(
+            site["phases"].items(), key=lambda kv: kv[1]["seconds"], reverse=True
+        ):
+            share = 100 * entry["seconds"] / site["elapsed"] if site["elapsed"] else 0
+            lines.append(
+                f"  {phase[:39]:<40}{entry['calls']:>8}"
+                f"{entry['seconds']:>10.3f}{share:>6.1f}%"
+            )
+        lines.append("")
+
+    lines.append(f"{'slowest sources':<56}{'site':>14}{'seconds':>10}")
+    for row in report["slowest_sources"]:
+        lines.append(f"{row['path'][-55:]:<56}{row['site']:>14}{row['seconds']:>10.3f}")
+    lines.append("")
+    lines.append(f"{'slowest templates':<48}{'site':>14}{'renders':>8}{'seconds':>10}")
+    for row in report["slowest_templates"]:
+        lines.append(
+            f"{row['template'][-47:]:<48}{row['site']:>14}"
+            f"{row['renders']:>8}{row['seconds']:>10.3f}"
+        )
+    return "\n".join(lines)
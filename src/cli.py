@@ -1,4 +1,6 @@
 import argparse
+import concurrent.futures
+import contextlib
 import datetime
 import hashlib
 import logging
@@ -6,35 +8,27 @@ import multiprocessing
 import os
 import pathlib
 import sys
+import time
 import traceback
 import typing
 from dataclasses import asdict, dataclass, field
 
 import pelican
 import pelican.settings
+import pelican.utils
+import watchfiles
 
+import build_profile
+import deploy
 import jinja_filters
+import precompress
+from plugins import gists
 
 logger = pelican.logger
 cwd = pathlib.Path(__file__).parent
-
-
-def _asset_version() -> str:
-    """Short, per-deploy token appended to CSS/JS URLs (?v=...) so a new build
-    busts Cloudflare's edge cache immediately — it caches static assets for 24h
-    but not HTML, so without this a deploy ships new markup against stale CSS.
-    Uses the git commit (stable per release); falls back to a build timestamp."""
-    import subprocess
-
-    try:
-        return subprocess.check_output(
-            ["git", "rev-parse", "--short", "HEAD"],
-            cwd=str(cwd),
-            text=True,
-            stderr=subprocess.DEVNULL,
-        ).strip()
-    except Exception:
-        return str(int(datetime.datetime.now().timestamp()))
+# Root of the build caches (render cache, --incremental reader caches); kept
+# outside src so they survive output cleans and can be restored in CI.
+CACHE_DIR = pathlib.Path(os.environ.get("BUILD_CACHE_DIR", cwd.parent / ".cache"))
 
 
 @dataclass
@@ -97,8 +91,11 @@ class PelicanSettings:
         default_factory=lambda: {
             "striptags_nl": jinja_filters.striptags_nl,
             "untagify": jinja_filters.untagify,
+            "untagify_many": jinja_filters.untagify_many,
+            "excerpt": jinja_filters.excerpt,
             "domain": jinja_filters.domain,
             "seedint": jinja_filters.seedint,
+            "asset": jinja_filters.asset,
         }
     )
 
@@ -108,12 +105,85 @@ class PelicanSettings:
         default_factory=lambda: str(cwd / "themes" / os.environ.get("BLOG_THEME", "zed"))
     )
     PLUGIN_PATHS: list = field(default_factory=lambda: [str(cwd / "plugins")])
-    PLUGINS: list = field(default_factory=lambda: ["rst_gist", "gfm"])
+    PLUGINS: list = field(
+        default_factory=lambda: [
+            "rst_gist",
+            "rst_cache",
+            "gfm",
+            "content_store",
+            "derived_fields",
+            "assets",
+            "critical_css",
+            "responsive_images",
+            "incremental",
+        ]
+    )
 
     # Other settings
-    # Cache-busting token for CSS/JS links (see _asset_version).
-    ASSET_VERSION: str = field(default_factory=_asset_version)
+    # Theme static file -> fingerprinted name, filled in by plugins/assets.py
+    # and read by the `asset` filter.
+    ASSET_MANIFEST: dict[str, str] = field(default_factory=dict)
+    # Theme static files concatenated into one fingerprinted file each, in
+    # order; a bundle whose parts a theme lacks is skipped. ASSET_MINIFY
+    # minifies the fingerprinted CSS and JS.
+    ASSET_BUNDLES: dict[str, list[str]] = field(
+        default_factory=lambda: {
+            "css/site.css": [
+                "css/tokens.css",
+                "css/theme.css",
+                "css/pygments.css",
+                "css/palette.css",
+            ],
+            "js/site.js": ["js/theme-toggle.js", "js/drawer.js"],
+        }
+    )
+    ASSET_MINIFY: bool = True
+    # Bundle whose above-the-fold rules are inlined into pages with a fold
+    # marker, the rest loading asynchronously (plugins/critical_css.py); ""
+    # disables it.
+    CRITICAL_CSS: str = "css/site.css"
+    # Publish the theme's fonts subset to the characters the site uses
+    # (plugins/fonts.py), cached in FONT_SUBSET_CACHE. Needs fontTools.
+    FONT_SUBSET: bool = True
+    FONT_SUBSET_CACHE: str = str(CACHE_DIR / "fonts")
     PDF_GENERATOR: bool = False
+    # Content-hash cache of rendered Markdown (plugins/render_cache.py), shared
+    # by every site and kept across CI runs; "" disables it. Least-recently-used
+    # entries are evicted once it grows past RENDER_CACHE_MAX_BYTES.
+    RENDER_CACHE_PATH: str = str(CACHE_DIR / "render")
+    RENDER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Resized AVIF/WebP variants of content images, offered to the browser via
+    # <picture> srcsets (plugins/responsive_images.py); an empty width list
+    # disables it. Variants are encoded once per source digest into
+    # RESPONSIVE_IMAGE_CACHE, on RESPONSIVE_IMAGE_WORKERS processes, and
+    # published under each site's RESPONSIVE_IMAGE_DIR.
+    RESPONSIVE_IMAGE_WIDTHS: list[int] = field(default_factory=lambda: [480, 960, 1600])
+    RESPONSIVE_IMAGE_FORMATS: list[str] = field(
+        default_factory=lambda: ["avif", "webp"]
+    )
+    # Matches --content-width in the zed theme's tokens.css.
+    RESPONSIVE_IMAGE_SIZES: str = "(max-width: 740px) 100vw, 740px"
+    RESPONSIVE_IMAGE_DIR: str = "images/responsive"
+    RESPONSIVE_IMAGE_CACHE: str = str(CACHE_DIR / "images")
+    RESPONSIVE_IMAGE_WORKERS: int = field(default_factory=lambda: os.cpu_count() or 1)
+    # Process pool for Pygments in code-heavy posts (plugins/highlight.py);
+    # 0 highlights inline. Only posts with at least
+    # HIGHLIGHT_PARALLEL_MIN_BLOCKS fenced blocks are farmed out.
+    HIGHLIGHT_WORKERS: int = 0
+    HIGHLIGHT_PARALLEL_MIN_BLOCKS: int = 8
+    # Only rewrite outputs whose inputs changed (plugins/incremental.py); set by
+    # --incremental. The dependency manifest lives in each site's OUTPUT_PATH.
+    INCREMENTAL: bool = False
+    INCREMENTAL_MANIFEST: str = ".incremental.json"
+    # Share article/page parses between the sites built in one process
+    # (plugins/content_store.py): the landing and the blog read the same posts.
+    CONTENT_STORE: bool = True
+    # Processes that read each generator's sources ahead of it, into the
+    # content store (plugins/preread.py); 0 reads them one by one.
+    PREREAD_WORKERS: int = 0
+    # Committed copies of the gists the .rst posts embed, inlined highlighted
+    # instead of GitHub's script (plugins/gists.py); filled by --fetch-gists.
+    GIST_CACHE: str = str(cwd / "gists")
     PAGE_PATHS: list[str] = field(default_factory=lambda: ["pages"])
     PAGE_EXCLUDES: list[str] = field(default_factory=lambda: [])
     ARTICLE_PATHS: list[str] = field(default_factory=lambda: [])
@@ -259,6 +329,28 @@ WellKnownSettings = PelicanSettings(
 )
 
 
+def _base_output_path(args, settings: PelicanSettings) -> str:
+    """The shared output root every site's OUTPUT_SUBDIR lives under (CLI takes
+    precedence over the dataclass default)."""
+    base_output = pelican.get_config(args).get("OUTPUT_PATH", settings.OUTPUT_PATH)
+    return os.path.abspath(os.path.expanduser(base_output))
+
+
+def _incremental_overrides(settings: PelicanSettings) -> dict:
+    """Pelican settings for --incremental: the writer skips unchanged outputs,
+    and Pelican's reader cache (hash-checked, one per site so the sites don't
+    clobber each other's) skips re-reading unchanged sources."""
+    return {
+        "INCREMENTAL": True,
+        "CACHE_CONTENT": True,
+        "LOAD_CONTENT_CACHE": True,
+        "CONTENT_CACHING_LAYER": "reader",
+        "CHECK_MODIFIED_METHOD": "sha1",
+        "CACHE_PATH": str(CACHE_DIR / "pelican" / (settings.OUTPUT_SUBDIR or "root")),
+        "STATIC_CHECK_IF_MODIFIED": True,
+    }
+
+
 def get_instance(args, settings: PelicanSettings):
     if args.settings is None and os.path.isfile(pelican.DEFAULT_CONFIG_NAME):
         args.settings = pelican.DEFAULT_CONFIG_NAME
@@ -267,12 +359,8 @@ def get_instance(args, settings: PelicanSettings):
     site_settings = settings.to_dict()
     cli_overrides = pelican.get_config(args)
 
-    # Determine the base output path (CLI takes precedence if set)
-    base_output = cli_overrides.get(
-        "OUTPUT_PATH", site_settings.get("OUTPUT_PATH", "output")
-    )
-    base_output = os.path.abspath(os.path.expanduser(base_output))
     # Compute per-site output path under base output
+    base_output = _base_output_path(args, settings)
     output_subdir = site_settings.get("OUTPUT_SUBDIR", "")
     computed_output = (
         os.path.join(base_output, output_subdir) if output_subdir else base_output
@@ -280,6 +368,8 @@ def get_instance(args, settings: PelicanSettings):
 
     overrides = site_settings.copy()
     overrides.update(overrides.pop("EXTRA_OVERRIDES", None) or {})
+    if getattr(args, "incremental", False):
+        overrides.update(_incremental_overrides(settings))
     overrides.update(cli_overrides)
     overrides["OUTPUT_PATH"] = computed_output
 
@@ -293,6 +383,123 @@ def get_instance(args, settings: PelicanSettings):
     return cls(settings), settings
 
 
+# Quiet period, in milliseconds, after the last filesystem event before a
+# rebuild starts, so an editor's save burst (temp file, rename, chmod) triggers
+# one build. Kept short: the edit-to-refresh loop should stay under a second.
+AUTORELOAD_DEBOUNCE_MS = 100
+
+# Generators of each site's last full build, keyed by OUTPUT_PATH, so a
+# theme-only edit can re-render without reading the content again.
+_last_generators: dict[str, list] = {}
+
+
+def _remember_generators(generators):
+    if generators:
+        _last_generators[generators[0].output_path] = generators
+
+
+def _is_under(path: str, roots) -> bool:
+    return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+
+def _site_sources(settings) -> list[tuple[list[str], list[str]]]:
+    """(roots, excludes) of real paths per kind of source a site reads:
+    articles, pages and static files. Excludes are per kind because Pelican
+    excludes each kind's paths from the others (PAGE_EXCLUDES holds the
+    ARTICLE_PATHS and vice versa)."""
+    base = os.path.realpath(settings["PATH"])
+    sources = []
+    for paths, excludes in (
+        ("ARTICLE_PATHS", "ARTICLE_EXCLUDES"),
+        ("PAGE_PATHS", "PAGE_EXCLUDES"),
+        ("STATIC_PATHS", "STATIC_EXCLUDES"),
+    ):
+        sources.append(
+            (
+                [os.path.join(base, p) if p else base for p in settings[paths]],
+                [os.path.join(base, p) for p in settings.get(excludes, [])],
+            )
+        )
+    return sources
+
+
+def _affected_sites(
+    changed_files: set[str], sites: list["PelicanInstance"]
+) -> dict[int, bool]:
+    """Map changed paths to the sites that need rebuilding.
+
+    Returns:
+        dict: site index -> True if only its templates changed (re-render
+            from the content already read), False if it has to run again.
+    """
+    affected = {}
+    for index, site in enumerate(sites):
+        theme = os.path.realpath(site.instance.theme)
+        templates = os.path.join(theme, "templates")
+        sources = _site_sources(site.settings)
+        for path in map(os.path.realpath, changed_files):
+            if any(
+                _is_under(path, roots) and not _is_under(path, excludes)
+                for roots, excludes in sources
+            ):
+                affected[index] = False
+                break
+            if _is_under(path, [templates]):
+                affected[index] = True
+            elif _is_under(path, [theme]):
+                # Static files feed the asset manifest; build it again.
+                affected[index] = False
+                break
+    return affected
+
+
+def _wait_for_changes(settings_file: str, sites: list["PelicanInstance"]) -> set[str]:
+    """Block until something a site is built from changes; return the paths.
+
+    Unlike pelican.wait_for_changes this watches every site's sources and
+    theme at once, and yields after AUTORELOAD_DEBOUNCE_MS without events
+    rather than watchfiles' default grouping.
+    """
+    candidates = {settings_file}
+    for site in sites:
+        candidates.add(site.instance.theme)
+        for roots, _ in _site_sources(site.settings):
+            candidates.update(roots)
+
+    # Watching a directory already covers everything beneath it.
+    paths = sorted(os.path.realpath(p) for p in candidates if os.path.exists(p))
+    paths = [p for i, p in enumerate(paths) if not _is_under(p, paths[:i])]
+
+    ignore = set()
+    for site in sites:
+        ignore.update(site.settings.get("IGNORE_FILES", []))
+    changes = next(
+        watchfiles.watch(
+            *paths,
+            watch_filter=pelican.utils.FileChangeFilter(ignore_file_patterns=ignore),
+            step=AUTORELOAD_DEBOUNCE_MS,
+            rust_timeout=0,
+        )
+    )
+    return {path for _, path in changes}
+
+
+def _rerender(instance: pelican.Pelican, generators: list):
+    """The output half of Pelican.run: write a site again from the content its
+    last build read. Enough for theme edits, which don't change what the
+    readers produce."""
+    for generator in generators:
+        # Generator.get_template memoizes Template objects; drop them so the
+        # edited templates are loaded (Jinja's own cache checks mtimes).
+        getattr(generator, "_templates", {}).clear()
+
+    writer = instance._get_writer()
+    for generator in generators:
+        if hasattr(generator, "generate_output"):
+            generator.generate_output(writer)
+    pelican.signals.finalized.send(instance)
+
+
 def autoreload(
     cli_args: argparse.Namespace,
     settings_classes: list[PelicanSettings],
@@ -309,25 +516,56 @@ def autoreload(
         debug = debug or getattr(_settings, "DEBUG", False)
         pelican_instance = PelicanInstance(*get_instance(args, _settings))
         pelican_instances.append(pelican_instance)
+    pelican.signals.all_generators_finalized.connect(_remember_generators)
 
     settings_file = str(pathlib.Path(__file__))
+    # site index -> theme-only; everything is built once on startup.
+    pending = dict.fromkeys(range(len(pelican_instances)), False)
     while True:
         try:
-            for pelican_instance in pelican_instances:
-                pelican_instance.instance.run()
+            # Take the work before running it, so a failing build waits for the
+            # next edit instead of being retried in a loop.
+            todo, pending = pending, {}
+            for index, theme_only in sorted(todo.items()):
+                pelican_instance = pelican_instances[index]
+                output_path = pelican_instance.settings["OUTPUT_PATH"]
+                generators = _last_generators.get(output_path) if theme_only else None
+                if generators is None:
+                    pelican_instance.instance.run()
+                else:
+                    start = time.perf_counter()
+                    _rerender(pelican_instance.instance, generators)
+                    pelican.console.print(
+                        "Re-rendered {} in {:.2f} seconds.".format(
+                            _site_name(settings_classes[index]),
+                            time.perf_counter() - start,
+                        )
+                    )
 
-            changed_files = pelican.wait_for_changes(settings_file, pelican.settings)
-            changed_files = {c[1] for c in changed_files}
-            print("changed_files:", changed_files)
+            changed_files = _wait_for_changes(settings_file, pelican_instances)
             if settings_file in changed_files:
-                for pelican_instance in pelican_instances:
-                    pelican_instance.instance, pelican_instance.settings = get_instance(
-                        args, pelican_instance.settings
+                for index, _settings in enumerate(settings_classes):
+                    pelican_instances[index] = PelicanInstance(
+                        *get_instance(args, _settings)
                     )
-
-            pelican.console.print(
-                "\n-> Modified: {}. re-generating...".format(", ".join(changed_files))
-            )
+                _last_generators.clear()
+                pending = dict.fromkeys(range(len(pelican_instances)), False)
+            else:
+                pending = _affected_sites(changed_files, pelican_instances)
+
+            if pending:
+                pelican.console.print(
+                    "\n-> Modified: {}. re-generating {}...".format(
+                        ", ".join(sorted(changed_files)),
+                        ", ".join(_site_name(settings_classes[i]) for i in pending),
+                    )
+                )
+            else:
+                pelican.console.print(
+                    "\n-> Modified: {}. no site affected.".format(
+                        ", ".join(sorted(changed_files))
+                    )
+                )
 
         except KeyboardInterrupt:
             if excqueue is not None:
@@ -354,8 +592,310 @@ class PelicanInstance:
     settings: PelicanSettings
 
 
+@dataclass
+class SiteBuildResult:
+    """Outcome of building one site in a worker process (see build_parallel)."""
+
+    site: str
+    exitcode: int
+    elapsed: float
+    # (levelno, formatted message) pairs, replayed by the parent in site order.
+    records: list[tuple[int, str]] = field(default_factory=list)
+    # build_profile report when run with --profile.
+    profile: dict | None = None
+
+
+class _RecordBuffer(logging.Handler):
+    """Holds a worker's log output so it reaches the terminal grouped per site
+    instead of interleaved with the other builds."""
+
+    def __init__(self):
+        super().__init__()
+        self.records: list[tuple[int, str]] = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, self.format(record)))
+
+
+_WORKER_LOG = _RecordBuffer()
+
+
+def _site_name(settings: PelicanSettings) -> str:
+    return settings.OUTPUT_SUBDIR or "/"
+
+
+def _init_build_worker(verbosity, fatal, logs_dedup_min_level):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    pelican.init_logging(
+        level=verbosity,
+        fatal=fatal,
+        name=__name__,
+        handler=_WORKER_LOG,
+        logs_dedup_min_level=logs_dedup_min_level,
+    )
+
+
+def _profiled(profiler, site: str, phase: str | None = None):
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.site(site, phase)
+
+
+def _build_site(cli_args, settings: PelicanSettings) -> SiteBuildResult:
+    """Worker entry point: build a single site from scratch in this process."""
+    _WORKER_LOG.records = []
+    start = time.perf_counter()
+    exitcode = 0
+    site = _site_name(settings)
+    profiler = build_profile.Profiler() if cli_args.profile else None
+    try:
+        if profiler:
+            profiler.install()
+        with _profiled(profiler, site, "settings"):
+            instance, _ = get_instance(cli_args, settings)
+        if profiler:
+            profiler.install()
+        with _profiled(profiler, site):
+            instance.run()
+    except Exception as e:
+        logger.critical("%s: %s", e.__class__.__name__, e, exc_info=True)
+        exitcode = getattr(e, "exitcode", 1)
+    return SiteBuildResult(
+        site=site,
+        exitcode=exitcode,
+        elapsed=time.perf_counter() - start,
+        records=_WORKER_LOG.records,
+        profile=profiler.report(cli_args.profile_top) if profiler else None,
+    )
+
+
+def build_parallel(
+    cli_args: argparse.Namespace, settings_classes: list[PelicanSettings], jobs: int
+) -> list[SiteBuildResult]:
+    """Build every site in its own worker process.
+
+    The sites never write into each other's OUTPUT_SUBDIR, so they can run
+    concurrently; the one shared step is --delete-output-directory, which the
+    landing would otherwise apply to the common root while the other sites are
+    writing into it. That clean is done once here, up front, instead.
+    """
+    if cli_args.delete_outputdir:
+        base_output = _base_output_path(cli_args, settings_classes[0])
+        if os.path.isdir(base_output):
+            pelican.utils.clean_output_dir(
+                base_output, pelican.settings.DEFAULT_CONFIG["OUTPUT_RETENTION"]
+            )
+        cli_args = argparse.Namespace(**vars(cli_args))
+        cli_args.delete_outputdir = False
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_build_worker,
+        initargs=(
+            cli_args.verbosity,
+            cli_args.fatal,
+            getattr(logging, cli_args.logs_dedup_min_level),
+        ),
+    ) as pool:
+        futures = [
+            pool.submit(_build_site, cli_args, settings)
+            for settings in settings_classes
+        ]
+        results = []
+        for settings, future in zip(settings_classes, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker itself died (e.g. BrokenProcessPool), so there
+                # are no records to replay; report the failure in their place.
+                results.append(
+                    SiteBuildResult(
+                        site=_site_name(settings),
+                        exitcode=1,
+                        elapsed=0.0,
+                        records=[(logging.CRITICAL, f"{e.__class__.__name__}: {e}")],
+                    )
+                )
+
+    for result in results:
+        for levelno, message in result.records:
+            logger.log(levelno, "[%s] %s", result.site, message)
+        status = "ok" if result.exitcode == 0 else f"failed ({result.exitcode})"
+        pelican.console.print(f"{result.site}: {status} in {result.elapsed:.2f}s")
+    return results
+
+
+def parse_arguments(argv=None) -> argparse.Namespace:
+    """Pelican's own arguments plus the multi-site options this script adds."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Build the sites in parallel on this many worker processes "
+        "(0 = one per CPU). Defaults to 1, building them one after another.",
+    )
+    parser.add_argument(
+        "--incremental",
+        dest="incremental",
+        action="store_true",
+        help="Only re-read changed sources and only rewrite the pages that "
+        "depend on them, using the manifest left in the output directory by "
+        "the previous --incremental build.",
+    )
+    parser.add_argument(
+        "--fetch-gists",
+        dest="fetch_gists",
+        action="store_true",
+        help="Before building, download the gists the .rst sources embed "
+        "that GIST_CACHE doesn't have yet. Builds never fetch them.",
+    )
+    parser.add_argument(
+        "--precompress",
+        dest="precompress",
+        action="store_true",
+        help="After building, write Brotli and gzip variants of every "
+        "compressible output file (skipping files unchanged since the last "
+        "run) and a manifest of them for the deploy step.",
+    )
+    parser.add_argument(
+        "--deploy",
+        dest="deploy",
+        metavar="TARGET",
+        help="After building, upload what changed since the last deploy to "
+        "TARGET (s3://bucket[/prefix], or a directory) and delete what the "
+        "build no longer produces.",
+    )
+    parser.add_argument(
+        "--deploy-jobs",
+        dest="deploy_jobs",
+        type=int,
+        default=16,
+        metavar="N",
+        help="Concurrent uploads for --deploy (default: 16).",
+    )
+    parser.add_argument(
+        "--deploy-dry-run",
+        dest="deploy_dry_run",
+        action="store_true",
+        help="Report what --deploy would upload and delete, without doing it.",
+    )
+    parser.add_argument(
+        "--deploy-prune",
+        dest="deploy_prune",
+        action="store_true",
+        help="When TARGET has no deploy manifest yet, delete every object in "
+        "it that the build doesn't produce. Without it, such a deploy only "
+        "uploads.",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        nargs="?",
+        const="build-profile.json",
+        default=None,
+        metavar="FILE",
+        help="Time each site's build by phase (settings, each reader, generator "
+        "passes, template rendering, writing, static copying), print the "
+        "breakdown and write it as JSON to FILE (default: build-profile.json).",
+    )
+    parser.add_argument(
+        "--profile-top",
+        dest="profile_top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="How many of the slowest source files and templates --profile "
+        "lists (default: 10).",
+    )
+    if argv is None:
+        argv = sys.argv[1:]
+    if "-h" in argv or "--help" in argv:
+        parser.print_help()
+        print()
+    own_args, remaining = parser.parse_known_args(argv)
+
+    cli_args = pelican.parse_arguments(remaining)
+    for name, value in vars(own_args).items():
+        setattr(cli_args, name, value)
+    if cli_args.jobs == 0:
+        cli_args.jobs = os.cpu_count() or 1
+    return cli_args
+
+
+def _fetch_gists(cli_args: argparse.Namespace, settings: PelicanSettings):
+    config = pelican.get_config(cli_args)
+    content = config.get("PATH", settings.PATH)
+    cache = config.get("GIST_CACHE", settings.GIST_CACHE)
+    fetched, cached = gists.fetch_missing(content, cache)
+    logger.info("Fetched %d gists into %s (%d already there)", fetched, cache, cached)
+
+
+def _precompress(cli_args: argparse.Namespace, settings: PelicanSettings):
+    root = _base_output_path(cli_args, settings)
+    start = time.perf_counter()
+    compressed, unchanged = precompress.precompress(root, cli_args.jobs)
+    logger.info(
+        "Precompressed %d files (%d unchanged) in %.2fs",
+        compressed,
+        unchanged,
+        time.perf_counter() - start,
+    )
+
+
+def _deploy(cli_args: argparse.Namespace, settings: PelicanSettings):
+    root = _base_output_path(cli_args, settings)
+    backend = deploy.backend_for(cli_args.deploy)
+    start = time.perf_counter()
+    plan = deploy.deploy(
+        root,
+        backend,
+        cli_args.deploy_jobs,
+        dry_run=cli_args.deploy_dry_run,
+        prune=cli_args.deploy_prune,
+    )
+    logger.info(
+        "%s %s: %d uploaded (%d new), %d deleted, %d unchanged; %d requests "
+        "in %.2fs",
+        "Would deploy to" if cli_args.deploy_dry_run else "Deployed to",
+        cli_args.deploy,
+        len(plan.upload),
+        len(plan.added),
+        len(plan.delete),
+        plan.unchanged,
+        backend.requests,
+        time.perf_counter() - start,
+    )
+    if cli_args.deploy_dry_run:
+        for upload in plan.upload:
+            logger.info("  upload %s", upload.key)
+        for key in plan.delete:
+            logger.info("  delete %s", key)
+
+
+def _after_build(
+    cli_args: argparse.Namespace, settings: PelicanSettings, profiler=None
+):
+    """--precompress, then --deploy, once every site is built."""
+    if cli_args.precompress:
+        with _profiled(profiler, "precompress", "precompress"):
+            _precompress(cli_args, settings)
+    if cli_args.deploy:
+        _deploy(cli_args, settings)
+
+
+def _write_profile(cli_args: argparse.Namespace, report: dict):
+    print(build_profile.format_report(report))
+    build_profile.write_report(report, cli_args.profile)
+    logger.info("Wrote build profile to %s", cli_args.profile)
+
+
 def main(argv=None):
-    cli_args = pelican.parse_arguments(argv)
+    cli_args = parse_arguments(argv)
     logs_dedup_min_level = getattr(logging, cli_args.logs_dedup_min_level)
     pelican.init_logging(
         level=cli_args.verbosity,
@@ -369,9 +909,38 @@ def main(argv=None):
     logger.debug("Python version: %s", sys.version.split()[0])
     _SETTINGS = [LandingPageSettings, WeblogSettings, TILSettings, WellKnownSettings]
     try:
+        if cli_args.fetch_gists:
+            _fetch_gists(cli_args, _SETTINGS[0])
+        if cli_args.jobs > 1 and not (cli_args.autoreload or cli_args.listen):
+            results = build_parallel(cli_args, _SETTINGS, cli_args.jobs)
+            if cli_args.profile:
+                _write_profile(
+                    cli_args,
+                    build_profile.merge_reports(
+                        [r.profile for r in results if r.profile],
+                        cli_args.profile_top,
+                    ),
+                )
+            failed = [r.site for r in results if r.exitcode != 0]
+            if failed:
+                logger.critical("Build failed for: %s", ", ".join(failed))
+                sys.exit(max(r.exitcode for r in results))
+            _after_build(cli_args, _SETTINGS[0])
+            return
+
+        # Only one-shot builds are profiled.
+        profiler = None
+        if cli_args.profile and not (cli_args.autoreload or cli_args.listen):
+            profiler = build_profile.Profiler()
+            profiler.install()
+
         instances = []
         for settings in _SETTINGS:
-            instances.append(PelicanInstance(*get_instance(cli_args, settings)))
+            with _profiled(profiler, _site_name(settings), "settings"):
+                instances.append(PelicanInstance(*get_instance(cli_args, settings)))
+        if profiler:
+            # Again, now that the plugins have defined their readers.
+            profiler.install()
 
         if cli_args.autoreload and cli_args.listen:
             excqueue = multiprocessing.Queue()
@@ -411,8 +980,13 @@ def main(argv=None):
             )
         else:
             with pelican.console.status("Generating..."):
-                for instance in instances:
-                    instance.instance.run()
+                for settings, instance in zip(_SETTINGS, instances):
+                    with _profiled(profiler, _site_name(settings)):
+                        instance.instance.run()
+            _after_build(cli_args, _SETTINGS[0], profiler)
+            if profiler:
+                profiler.uninstall()
+                _write_profile(cli_args, profiler.report(cli_args.profile_top))
     except KeyboardInterrupt:
         logger.warning("Keyboard interrupt received. Exiting.")
     except Exception as e:
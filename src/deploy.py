@@ -0,0 +1,382 @@
+#
+# deploy.py -- differential upload of the built site (cli.py --deploy TARGET)
+#
+# The target keeps a manifest of what the last deploy published: for every
+# object its content digest and the headers it was uploaded with. A deploy
+# hashes the output directory, diffs that against the manifest and sends only
+# the difference: new and changed objects are uploaded concurrently, objects
+# the build no longer produces are deleted, and the manifest is replaced last.
+# Requests scale with the size of the change, not the size of the site.
+#
+# Without a manifest (the first deploy to a target) there is no record of
+# what a previous deploy left behind, and the bucket may hold objects nothing
+# here ever published; such a deploy uploads but deletes nothing, unless
+# asked to prune (cli.py --deploy-prune), which lists the bucket and deletes
+# every key the build doesn't produce.
+#
+# Uploads go in two waves, everything else before HTML, so a page never
+# points at an asset that isn't there yet; deletes come after both.
+#
+# Cache-Control is chosen per object (CACHE_CONTROL): fingerprinted theme
+# assets are immutable, HTML revalidates, the rest is cached for a day. When
+# the build was precompressed (cli.py --precompress), text objects are
+# uploaded as their gzip variant with Content-Encoding: gzip.
+#
+# Targets:
+#   s3://bucket[/prefix]    S3, through boto3
+#   file:///path, or a path a directory laid out like the bucket, with each
+#                           object's headers beside it; for tests and dry runs
+#
+import concurrent.futures
+import fnmatch
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+
+import precompress
+
+try:
+    import boto3
+except ImportError:
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+MANIFEST_KEY = ".deploy-manifest.json"
+
+# S3's delete_objects takes at most this many keys per request.
+DELETE_BATCH = 1000
+
+# First match wins; patterns are fnmatch'ed against the object key.
+CACHE_CONTROL = (
+    ("*.html", "no-cache"),
+    # plugins/assets.py names: theme/css/theme.3f2a1c9e.css
+    ("re:.*\\.[0-9a-f]{8}\\.[A-Za-z0-9]+$", "public, max-age=31536000, immutable"),
+    ("*", "public, max-age=86400"),
+)
+
+# Content types served with an explicit charset.
+_TEXT_TYPES = ("text/", "application/javascript", "application/json")
+_TEXT_TYPES += ("application/xml", "application/rss+xml", "application/atom+xml")
+
+
+def cache_control(key):
+    for pattern, value in CACHE_CONTROL:
+        if pattern.startswith("re:"):
+            if re.match(pattern[3:], key):
+                return value
+        elif fnmatch.fnmatch(key, pattern):
+            return value
+    return None
+
+
+def content_type(key):
+    guessed, _ = mimetypes.guess_type(key)
+    if guessed is None:
+        return "application/octet-stream"
+    if guessed.startswith(_TEXT_TYPES):
+        guessed += "; charset=utf-8"
+    return guessed
+
+
+def _excluded(key, variants):
+    """Build bookkeeping (dotfiles, except the .well-known site) and the
+    precompressed variants, which are uploaded in place of their originals."""
+    if key == precompress.PRECOMPRESS_MANIFEST:
+        return True
+    if any(p.startswith(".") and p != ".well-known" for p in key.split("/")):
+        return True
+    root, suffix = os.path.splitext(key)
+    return suffix in precompress.ENCODINGS.values() and root in variants
+
+
+@dataclass
+class Upload:
+    key: str
+    path: str
+    entry: dict
+    new: bool
+
+
+@dataclass
+class Plan:
+    """What a deploy has to do to make the target match the output."""
+
+    upload: list = field(default_factory=list)
+    delete: list = field(default_factory=list)
+    unchanged: int = 0
+    manifest: dict = field(default_factory=dict)
+
+    @property
+    def added(self):
+        return [u for u in self.upload if u.new]
+
+
+def local_objects(root, encoding="gzip"):
+    """{key: (path to upload, manifest entry)} for the output under root.
+
+    With encoding set and a precompress manifest present, files that have an
+    up-to-date variant in that encoding are uploaded as the variant.
+    """
+    variants = {}
+    manifest_path = os.path.join(root, precompress.PRECOMPRESS_MANIFEST)
+    if encoding and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            variants = json.load(f).get("files", {})
+
+    objects = {}
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            key = os.path.relpath(path, root).replace(os.sep, "/")
+            if _excluded(key, variants):
+                continue
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            entry = {
+                "sha256": digest,
+                "content_type": content_type(key),
+                "cache_control": cache_control(key),
+            }
+            variant = variants.get(key)
+            if (
+                variant is not None
+                and variant["sha256"] == digest
+                and encoding in variant["encodings"]
+            ):
+                entry["content_encoding"] = encoding
+                path += precompress.ENCODINGS[encoding]
+            objects[key] = (path, entry)
+    return objects
+
+
+def plan(objects, published, remote_keys=None):
+    """Diff the local objects against the published manifest.
+
+    Args:
+        objects: local_objects() of the output.
+        published: The target's manifest entries, {} on a first deploy.
+        remote_keys: Every key in the target, when there is no manifest to
+            tell which objects a previous deploy left behind.
+    """
+    result = Plan()
+    for key, (path, entry) in sorted(objects.items()):
+        result.manifest[key] = entry
+        if published.get(key) == entry:
+            result.unchanged += 1
+        else:
+            result.upload.append(Upload(key, path, entry, key not in published))
+    stale = set(published) if remote_keys is None else set(remote_keys)
+    stale.discard(MANIFEST_KEY)
+    result.delete = sorted(stale - objects.keys())
+    return result
+
+
+class DirectoryBackend:
+    """A target directory standing in for a bucket.
+
+    Objects are files under root; each one's headers are in
+    root/.deploy-headers/<key>.json.
+    """
+
+    HEADERS_DIR = ".deploy-headers"
+
+    def __init__(self, root):
+        self.root = root
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _count(self, n=1):
+        with self._lock:
+            self.requests += n
+
+    def _path(self, key, headers=False):
+        parts = key.split("/")
+        if headers:
+            return os.path.join(self.root, self.HEADERS_DIR, *parts) + ".json"
+        return os.path.join(self.root, *parts)
+
+    def get(self, key):
+        self._count()
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def headers(self, key):
+        with open(self._path(key, headers=True), encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, key, body, headers, public=True):
+        self._count()
+        headers = {k: v for k, v in headers.items() if k != "sha256"}
+        for path, data in (
+            (self._path(key), body),
+            (self._path(key, headers=True), json.dumps(headers).encode()),
+        ):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+    def delete(self, keys):
+        self._count(-(-len(keys) // DELETE_BATCH))
+        for key in keys:
+            for path in (self._path(key), self._path(key, headers=True)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def list_keys(self):
+        self._count()
+        keys = []
+        for directory, dirs, files in os.walk(self.root):
+            if directory == self.root and self.HEADERS_DIR in dirs:
+                dirs.remove(self.HEADERS_DIR)
+            for filename in files:
+                path = os.path.join(directory, filename)
+                keys.append(os.path.relpath(path, self.root).replace(os.sep, "/"))
+        return keys
+
+
+class S3Backend:
+    """An S3 bucket (and key prefix), through boto3."""
+
+    def __init__(self, bucket, prefix="", client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("Deploying to S3 needs boto3 (pip install boto3)")
+            client = boto3.client("s3")
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _count(self, n=1):
+        with self._lock:
+            self.requests += n
+
+    def get(self, key):
+        self._count()
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def put(self, key, body, headers, public=True):
+        self._count()
+        kwargs = {
+            "Bucket": self.bucket,
+            "Key": self.prefix + key,
+            "Body": body,
+            "ContentType": headers["content_type"],
+        }
+        if headers.get("cache_control"):
+            kwargs["CacheControl"] = headers["cache_control"]
+        if headers.get("content_encoding"):
+            kwargs["ContentEncoding"] = headers["content_encoding"]
+        if public:
+            kwargs["ACL"] = "public-read"
+        self.client.put_object(**kwargs)
+
+    def delete(self, keys):
+        for i in range(0, len(keys), DELETE_BATCH):
+            self._count()
+            batch = keys[i : i + DELETE_BATCH]
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": self.prefix + key} for key in batch],
+                    "Quiet": True,
+                },
+            )
+
+    def list_keys(self):
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            self._count()
+            keys.extend(o["Key"][len(self.prefix) :] for o in page.get("Contents", ()))
+        return keys
+
+
+def backend_for(target):
+    """The backend for an s3://, file:// or plain directory target."""
+    if target.startswith("s3://"):
+        bucket, _, prefix = target[len("s3://") :].partition("/")
+        return S3Backend(bucket, prefix)
+    if target.startswith("file://"):
+        target = target[len("file://") :]
+    return DirectoryBackend(os.path.abspath(os.path.expanduser(target)))
+
+
+def _read_manifest(backend):
+    data = backend.get(MANIFEST_KEY)
+    if data is None:
+        return None
+    try:
+        manifest = json.loads(data)
+    except ValueError:
+        return None
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    return manifest["objects"]
+
+
+def _upload(backend, upload):
+    with open(upload.path, "rb") as f:
+        body = f.read()
+    backend.put(upload.key, body, upload.entry)
+
+
+def deploy(root, backend, jobs=16, encoding="gzip", dry_run=False, prune=False):
+    """Make the target behind backend match the output under root.
+
+    Args:
+        prune: When the target has no manifest, list it and delete every key
+            the output doesn't have. Without it such a deploy deletes nothing.
+
+    Returns:
+        Plan: what was (or, with dry_run, would be) uploaded and deleted.
+    """
+    published = _read_manifest(backend)
+    remote_keys = None
+    if published is None and prune:
+        remote_keys = backend.list_keys()
+    elif published is None:
+        logger.info(
+            "No deploy manifest in the target; not deleting anything "
+            "(--deploy-prune deletes what the build doesn't produce)"
+        )
+    result = plan(local_objects(root, encoding), published or {}, remote_keys)
+    if dry_run:
+        return result
+
+    html = [u for u in result.upload if u.key.endswith(".html")]
+    rest = [u for u in result.upload if not u.key.endswith(".html")]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for wave in (rest, html):
+            # list() so the first failure propagates before the next wave.
+            list(pool.map(lambda u: _upload(backend, u), wave))
+    if result.delete:
+        backend.delete(result.delete)
+    if published is not None and not (result.upload or result.delete):
+        return result
+
+    manifest = {"format": MANIFEST_FORMAT, "objects": result.manifest}
+    backend.put(
+        MANIFEST_KEY,
+        json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"),
+        {"content_type": "application/json", "cache_control": "no-cache"},
+        public=False,
+    )
+    return result
@@ -1,7 +1,11 @@
+import functools
 import re
 import typing
+import weakref
+from urllib.parse import urlparse
 
-from jinja2 import pass_eval_context
+from jinja2 import pass_context, pass_environment, pass_eval_context
+from jinja2.filters import do_truncate
 from markupsafe import Markup, escape
 
 if typing.TYPE_CHECKING:
@@ -12,8 +16,23 @@ _TAGS_RE = re.compile(r"</?([a-z][a-z0-9]*)\b[^>]*>|<!--[\s\S]*?-->", re.IGNOREC
 _LEADING_TRAILING_SPACES_RE = re.compile(r"^ +| +$", flags=re.MULTILINE)
 _ADJACENT_SPACES_RE = re.compile(r" +")
 _ABNORMAL_LINEBREAKS_RE = re.compile(r"\n\n\n+")
-_ALL_WHITESPACE_RE = re.compile(r"\s+")
 _COLLAPSE_SPACES_RE = re.compile(r"[ \t]+")
+# untagify_many() separates fragments with a character HTML can't contain,
+# which the patterns for joined fragments never match across.
+_FRAGMENT_SEP = "\x00"
+_FRAGMENT_TAGS_RE = re.compile(
+    r"</?([a-z][a-z0-9]*)\b[^>\x00]*>|<!--[^\x00]*?-->", re.IGNORECASE
+)
+# striptags_nl: a "<" up to the first ">" after it.
+_TAG_RE = re.compile(r"<[^>]*>")
+_WWW_RE = re.compile(r"^www\.")
+
+# Bound on the domain()/seedint() memos; a site has a few hundred posts.
+_FILTER_CACHE_SIZE = 4096
+
+# excerpt(): {content object: {truncate arguments: text}}. Weak, so the cache
+# lives as long as the build's content objects do.
+_EXCERPTS: "weakref.WeakKeyDictionary[object, dict]" = weakref.WeakKeyDictionary()
 
 
 @pass_eval_context
@@ -31,6 +50,64 @@ def nl2br(eval_ctx, value):
     return Markup(result) if eval_ctx.autoescape else result
 
 
+def _kept_tail(pieces, n=3):
+    """The last n characters of "".join(pieces)."""
+    tail = ""
+    for piece in reversed(pieces):
+        tail = piece[-(n - len(tail)) :] + tail
+        if len(tail) >= n:
+            break
+    return tail
+
+
+def _drop_tail(pieces, n):
+    """Remove the last n characters of "".join(pieces), in place."""
+    while n:
+        piece = pieces.pop()
+        if len(piece) > n:
+            pieces.append(piece[:-n])
+            break
+        n -= len(piece)
+
+
+def _strip_comments(value):
+    """Remove <!-- ... --> comments in one pass.
+
+    Same result as repeatedly cutting the first "<!--" through the first
+    "-->" at or after it (so "<!-->" is a whole comment) until a "<!--" has
+    no end, including a "<!--" that only appears once the text around a
+    removed comment joins up ("<!<!-- x -->--").
+    """
+    pieces = []
+    pos = 0
+    while True:
+        # A "<!--" spanning the kept text and the rest starts before pos, so
+        # it comes first. Only possible right after a removal.
+        tail = _kept_tail(pieces) if pos else ""
+        k = (tail + value[pos : pos + 3]).find("<!--")
+        if tail and 0 <= k < len(tail):
+            opened = tail[k:]
+            j = (opened + value[pos : pos + 2]).find("-->")
+            if j != -1:
+                end = pos + j - len(opened) + 3
+            elif (end := value.find("-->", pos)) != -1:
+                end += 3
+            else:
+                break
+            _drop_tail(pieces, len(opened))
+            pos = end
+            continue
+
+        start = value.find("<!--", pos)
+        if start == -1 or (end := value.find("-->", start)) == -1:
+            break
+        if start > pos:
+            pieces.append(value[pos:start])
+        pos = end + 3
+    pieces.append(value[pos:])
+    return "".join(pieces)
+
+
 def striptags_nl(value: "str | HasHTML", preserve_linebreaks: bool = False) -> str:
     """
     Strip SGML/XML tags and replace adjacent whitespace by one space.
@@ -45,48 +122,37 @@ def striptags_nl(value: "str | HasHTML", preserve_linebreaks: bool = False) -> s
     elif not isinstance(value, str):
         value = str(value)
 
-    # Look for comments then tags separately. Otherwise, a comment that
-    # contains a tag would end early, leaving some of the comment behind.
-
-    # keep finding comment start marks
-    while (start := value.find("<!--")) != -1:
-        # find a comment end mark beyond the start, otherwise stop
-        if (end := value.find("-->", start)) == -1:
-            break
-
-        value = f"{value[:start]}{value[end + 3 :]}"
-
-    # remove tags using the same method
-    while (start := value.find("<")) != -1:
-        if (end := value.find(">", start)) == -1:
-            break
-
-        value = f"{value[:start]}{value[end + 1 :]}"
+    # Comments first, then tags. Otherwise, a comment that contains a tag
+    # would end early, leaving some of the comment behind.
+    value = _TAG_RE.sub("", _strip_comments(value))
 
     if preserve_linebreaks:
         # Collapse spaces but preserve newlines
         value = _COLLAPSE_SPACES_RE.sub(" ", value)
     else:
         value = " ".join(value.split())
-        print("after: ", value)
 
     return Markup(value).unescape()
 
 
-def untagify(value: "str | HasHTML", preserve_linebreaks: bool = False) -> str:
+def _as_text(value: "str | HasHTML") -> str:
     if hasattr(value, "__html__"):
         value = typing.cast("HasHTML", value).__html__()
-
-    # Convert to string and remove tags
     if isinstance(value, bytes):
-        value = value.decode("utf-8")
-    elif not isinstance(value, str):
-        value = str(value)
+        return value.decode("utf-8")
+    return value if isinstance(value, str) else str(value)
+
 
-    no_tags = _TAGS_RE.sub("", value)
+def _untagify_text(text: str, preserve_linebreaks: bool, tags_re=_TAGS_RE) -> str:
+    """untagify() of text, or of several fragments joined by _FRAGMENT_SEP
+    given _FRAGMENT_TAGS_RE, which stops at the separators."""
+    no_tags = tags_re.sub("", text)
 
-    # Trim leading/trailing whitespace
-    trimmed = no_tags.strip()
+    # Trim leading/trailing whitespace (of every fragment)
+    if tags_re is _TAGS_RE:
+        trimmed = no_tags.strip()
+    else:
+        trimmed = _FRAGMENT_SEP.join(f.strip() for f in no_tags.split(_FRAGMENT_SEP))
 
     if preserve_linebreaks:
         # Remove leading/trailing spaces on each line
@@ -99,24 +165,78 @@ def untagify(value: "str | HasHTML", preserve_linebreaks: bool = False) -> str:
         trimmed = _ABNORMAL_LINEBREAKS_RE.sub("\n\n", trimmed)
     else:
         # Replace all whitespace (including newlines) with a single space
-        trimmed = _ALL_WHITESPACE_RE.sub(" ", trimmed)
-    return Markup(value).unescape()
+        trimmed = " ".join(trimmed.split())
+    return Markup(trimmed).unescape()
+
+
+def untagify(value: "str | HasHTML", preserve_linebreaks: bool = False) -> str:
+    """
+    Remove tags and comments, trim, and collapse whitespace to one space (or,
+    with preserve_linebreaks, to single spaces within lines and at most one
+    blank line between them); entities are decoded.
+    """
+    return _untagify_text(_as_text(value), preserve_linebreaks)
+
+
+def untagify_many(
+    values: "typing.Iterable[str | HasHTML]", preserve_linebreaks: bool = False
+) -> "list[str]":
+    """
+    untagify() every fragment of values, e.g. a listing page's summaries:
+    {{ articles | map(attribute="summary") | untagify_many }}. The fragments
+    are joined and each pattern runs once over the batch instead of once per
+    fragment.
+    """
+    texts = [_as_text(value) for value in values]
+    if any(_FRAGMENT_SEP in text for text in texts):
+        return [untagify(text, preserve_linebreaks) for text in texts]
+    joined = _untagify_text(
+        _FRAGMENT_SEP.join(texts), preserve_linebreaks, _FRAGMENT_TAGS_RE
+    )
+    return joined.split(_FRAGMENT_SEP) if texts else []
 
 
+@pass_environment
+def excerpt(
+    env,
+    content,
+    length: int = 255,
+    killwords: bool = False,
+    end: str = "...",
+    leeway: "int | None" = None,
+) -> str:
+    """Plain-text excerpt of an article or page for cards: its `excerpt`
+    metadata, else its summary with the tags stripped, cut like Jinja's
+    truncate filter with the same arguments. Memoized per content object, so
+    a post that every listing page shows is stripped and cut once per site."""
+    key = (length, killwords, end, leeway)
+    try:
+        cached = _EXCERPTS.setdefault(content, {})
+    except TypeError:
+        cached = {}
+    if key not in cached:
+        text = (
+            getattr(content, "excerpt", None)
+            or Markup(str(content.summary)).striptags()
+        )
+        cached[key] = do_truncate(env, text, length, killwords, end, leeway)
+    return cached[key]
+
+
+@functools.lru_cache(maxsize=_FILTER_CACHE_SIZE)
 def domain(url: str) -> str:
     """Bare registrable host of a URL: 'https://x.com/foo' -> 'x.com'.
     Used to build favicon avatars for blogmark/link posts."""
-    from urllib.parse import urlparse
-
     s = str(url or "").strip()
     if not s:
         return ""
     if "://" not in s:
         s = "http://" + s
     host = (urlparse(s).netloc or "").split("@")[-1].split(":")[0].lower()
-    return re.sub(r"^www\.", "", host)
+    return _WWW_RE.sub("", host)
 
 
+@functools.lru_cache(maxsize=_FILTER_CACHE_SIZE)
 def seedint(value: str) -> int:
     """Stable 32-bit int from a string (deterministic across builds).
     Used to derive a per-post hue/variant for generated cover art."""
@@ -124,3 +244,14 @@ def seedint(value: str) -> int:
     for ch in str(value or ""):
         h = ((h ^ ord(ch)) * 16777619) & 0xFFFFFFFF
     return h
+
+
+@pass_context
+def asset(context, name: str) -> str:
+    """Site-relative path of a theme static file under its fingerprinted name:
+    'css/theme.css' -> 'theme/css/theme.3f2a1c9e.css'. Names come from the
+    ASSET_MANIFEST that plugins/assets.py builds; unknown names (or a build
+    without the plugin) fall back to the plain file."""
+    manifest = context.get("ASSET_MANIFEST") or {}
+    static_dir = context.get("THEME_STATIC_DIR", "theme")
+    return f"{static_dir}/{manifest.get(name, name)}"
@@ -0,0 +1,417 @@
+#
+# assets.py -- content-addressed names for the theme's static files
+#
+# Every file under the theme's THEME_STATIC_PATHS is also written under a name
+# carrying a digest of its bytes (css/theme.css -> css/theme.3f2a1c9e.css),
+# so an unchanged file keeps its URL across deploys and can be cached forever,
+# while a changed one gets a new URL the moment the HTML pointing at it ships.
+#
+# Stylesheets are rewritten before they are hashed: their url(...) references
+# to other theme files point at the fingerprinted names, so a new font also
+# gives the stylesheet that loads it a new name.
+#
+# ASSET_BUNDLES concatenates several static files into one (css/site.css from
+# tokens, theme, pygments and palette), so a page makes one request where it
+# made four. With ASSET_MINIFY the fingerprinted stylesheets and scripts are
+# also minified; the plain-name copies stay as written.
+#
+# With FONT_SUBSET the theme's fonts are published subset to the characters
+# the site uses (plugins/fonts.py). That is only known once the content is
+# read, so those fingerprints, and the stylesheets loading the fonts, settle
+# in all_generators_finalized, before anything is rendered.
+#
+# The manifest is built once per build, on initialized, and again in
+# all_generators_finalized only if subset fonts replace files in it (or in
+# finalized, for a re-render that skipped both). The fingerprinted files
+# themselves are in ASSET_OUTPUTS in the generators' context, for
+# plugins/critical_css.py.
+#
+# The mapping is published three ways:
+#   - ASSET_MANIFEST in the template context, read by the `asset` filter
+#     (jinja_filters.asset): {{ SITEURL }}/{{ "css/theme.css" | asset }}
+#   - THEME_STATIC_DIR/manifest.json in the output, for other tools
+#   - the originals are still copied by Pelican under their plain names, for
+#     URLs that can't change (and for HTML cached from before a deploy)
+#
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+
+from pelican.plugins import signals
+
+from plugins import fonts
+
+logger = logging.getLogger(__name__)
+
+# Hex digits of the sha256 kept in a fingerprinted name.
+FINGERPRINT_LENGTH = 8
+
+MANIFEST_NAME = "manifest.json"
+
+# Per site OUTPUT_PATH: (manifest, outputs) of the build under way.
+_sites = {}
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+# Strings, comments, whitespace runs, punctuation that needs no space around
+# it, and everything else. Strings come first so nothing inside one is touched.
+_CSS_TOKEN_RE = re.compile(
+    r"""("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')"""
+    r"|(/\*.*?(?:\*/|$))"
+    r"|(\s+)"
+    r"|([{};,>])"
+    r"""|([^"'/\s{};,>]+|/)""",
+    re.S,
+)
+_CSS_TIGHT = frozenset("{};,>")
+
+
+def fingerprint(name, data):
+    """css/theme.css + bytes -> css/theme.<digest>.css"""
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+    root, ext = posixpath.splitext(name)
+    return f"{root}.{digest}{ext}"
+
+
+def _static_files(theme, static_paths):
+    """{logical name: source path} of the theme's static files, named the way
+    Pelican lays them out under THEME_STATIC_DIR."""
+    files = {}
+    for static_path in static_paths:
+        source = os.path.join(theme, static_path)
+        if os.path.isfile(source):
+            files[os.path.basename(source)] = source
+            continue
+        for root, _, names in os.walk(source, followlinks=True):
+            for name in names:
+                path = os.path.join(root, name)
+                logical = os.path.relpath(path, source).replace(os.sep, "/")
+                files[logical] = path
+    return files
+
+
+def rewrite_css(name, text, manifest, directory=None):
+    """Point a stylesheet's url(...)s at the fingerprinted names in manifest.
+
+    Args:
+        name: The stylesheet's logical name; its urls are relative to it.
+        text: The stylesheet.
+        manifest: {logical name: fingerprinted name}.
+        directory: Where the rewritten stylesheet is served from, if not next
+            to name (a bundle elsewhere in the theme).
+    """
+    source_dir = posixpath.dirname(name)
+    if directory is None:
+        directory = source_dir
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(("data:", "#", "/")) or "://" in url:
+            return match.group(0)
+        path, sep, suffix = url.partition("?")
+        if not sep:
+            path, sep, suffix = url.partition("#")
+        target = posixpath.normpath(posixpath.join(source_dir, path))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], directory or ".")
+        return f"url({quote}{relative}{sep}{suffix}{quote})"
+
+    return CSS_URL_RE.sub(replace, text)
+
+
+def _tighten_declaration(out, start):
+    """Drop the space around the colon of the declaration in out[start:]."""
+    for i in range(start, len(out)):
+        token = out[i]
+        if token[0] in "\"'":
+            return
+        if ":" not in token:
+            continue
+        if token.endswith(":") and out[i + 1 : i + 2] == [" "]:
+            del out[i + 1]
+        if token.startswith(":") and i > start and out[i - 1] == " ":
+            del out[i - 1]
+        return
+
+
+def minify_css(text):
+    """Drop comments and the whitespace CSS doesn't need.
+
+    Conservative: spaces go only around { } ; , > and after the colon of a
+    declaration, never around + - or ~ (calc(), sibling combinators) and never
+    inside strings. A selector's colons keep their spaces ("a :hover" is not
+    "a:hover").
+    """
+    out = []
+    # Where the current declaration or prelude starts in out.
+    start = 0
+    space = False
+    for match in _CSS_TOKEN_RE.finditer(text):
+        string, comment, blank, punct, other = match.groups()
+        if comment is not None or blank is not None:
+            space = True
+            continue
+        space, pending = False, space
+        if punct is not None:
+            if punct in ";}":
+                _tighten_declaration(out, start)
+                if out and out[-1] == ";":
+                    out.pop()
+            out.append(punct)
+            if punct != ",":
+                start = len(out)
+            continue
+        if pending and out and out[-1] not in _CSS_TIGHT:
+            out.append(" ")
+        out.append(string if string is not None else other)
+    return "".join(out)
+
+
+def minify_js(text):
+    """Drop comment lines, indentation and blank lines from a script.
+
+    Deliberately shallow: tokens are never joined across lines (automatic
+    semicolon insertion keeps working) and a script with template literals or
+    line continuations, whose line breaks may be inside a string, is returned
+    as is. A comment that shares a line with code stays.
+    """
+    if "`" in text or re.search(r"\\\n", text):
+        return text
+    lines = []
+    in_comment = False
+    for line in text.splitlines():
+        line = line.strip()
+        if in_comment:
+            end = line.find("*/")
+            if end < 0:
+                continue
+            in_comment, line = False, line[end + 2 :].strip()
+        if line.startswith("//"):
+            continue
+        if line.startswith("/*"):
+            end = line.find("*/", 2)
+            if end < 0:
+                in_comment = True
+                continue
+            line = line[end + 2 :].strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def _minify(name, data):
+    if name.endswith(".css"):
+        return minify_css(data.decode("utf-8")).encode("utf-8")
+    if name.endswith(".js"):
+        return minify_js(data.decode("utf-8")).encode("utf-8")
+    return data
+
+
+def _bundle(name, members, files, manifest):
+    """The concatenated bytes of bundle name, or None if a member is missing."""
+    parts = []
+    for member in members:
+        if member not in files:
+            logger.debug("Assets: %s not built, %s is missing", name, member)
+            return None
+        with open(files[member], "rb") as f:
+            text = f.read().decode("utf-8")
+        if name.endswith(".css"):
+            text = rewrite_css(member, text, manifest, posixpath.dirname(name))
+        elif name.endswith(".js") and not text.rstrip().endswith(";"):
+            text = text.rstrip() + ";"
+        parts.append(text.rstrip() + "\n")
+    return "".join(parts).encode("utf-8")
+
+
+def build_manifest(theme, static_paths, bundles=None, minify=False, replaced=None):
+    """Fingerprint a theme's static files and build its bundles.
+
+    Args:
+        theme: The theme directory.
+        static_paths: The theme's THEME_STATIC_PATHS.
+        bundles: {bundle name: [logical names]}, concatenated in that order.
+        minify: Minify the fingerprinted .css and .js files.
+        replaced: {logical name: bytes} published in place of those files
+            (subset fonts).
+
+    Returns:
+        tuple: ({logical name: fingerprinted name}, {fingerprinted name:
+            (source path, rewritten bytes or None to copy the source)}).
+    """
+    files = _static_files(theme, static_paths)
+    manifest, outputs = {}, {}
+    # Stylesheets last, so the files they reference already have names.
+    for logical in sorted(files, key=lambda n: (n.endswith(".css"), n)):
+        source = files[logical]
+        with open(source, "rb") as f:
+            data = f.read()
+        rewritten = None
+        if replaced and logical in replaced:
+            data = rewritten = replaced[logical]
+        if logical.endswith(".css"):
+            text = data.decode("utf-8")
+            new_text = rewrite_css(logical, text, manifest)
+            if new_text != text:
+                data = rewritten = new_text.encode("utf-8")
+        if minify and logical.endswith((".css", ".js")):
+            data = rewritten = _minify(logical, data)
+        hashed = fingerprint(logical, data)
+        manifest[logical] = hashed
+        outputs[hashed] = (source, rewritten)
+
+    for name, members in (bundles or {}).items():
+        data = _bundle(name, members, files, manifest)
+        if data is None:
+            continue
+        if minify:
+            data = _minify(name, data)
+        hashed = fingerprint(name, data)
+        manifest[name] = hashed
+        outputs[hashed] = (None, data)
+    return manifest, outputs
+
+
+def _write_file(path, source, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if data is None:
+        with open(source, "rb") as f:
+            data = f.read()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_outputs(static_dir, manifest, outputs):
+    """Write the fingerprinted files and manifest.json into static_dir.
+
+    A fingerprinted file that already exists has the right contents by
+    construction and is left alone. Fingerprinted files from the previous
+    manifest that are no longer referenced are removed. Without outputs (a
+    theme with no static files) nothing is written, not even the manifest.
+    """
+    if not outputs:
+        return 0
+    manifest_path = os.path.join(static_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = set(json.load(f).values())
+    except (OSError, ValueError):
+        previous = set()
+
+    written = 0
+    for hashed, (source, data) in outputs.items():
+        path = os.path.join(static_dir, *hashed.split("/"))
+        if not os.path.exists(path):
+            _write_file(path, source, data)
+            written += 1
+
+    for hashed in previous - set(outputs):
+        try:
+            os.remove(os.path.join(static_dir, *hashed.split("/")))
+        except OSError:
+            pass
+
+    _write_file(
+        manifest_path, None, json.dumps(manifest, indent=1, sort_keys=True).encode()
+    )
+    return written
+
+
+def theme_manifest(settings, theme):
+    return build_manifest(
+        theme,
+        settings["THEME_STATIC_PATHS"],
+        settings.get("ASSET_BUNDLES"),
+        settings.get("ASSET_MINIFY", False),
+        fonts.site_subsets.get(settings["OUTPUT_PATH"]),
+    )
+
+
+def subset_fonts(generators):
+    """{logical name: subset} of the theme fonts, for the site's text."""
+    generator = generators[0]
+    settings = generator.settings
+    files = _static_files(generator.theme, settings["THEME_STATIC_PATHS"])
+    scripts = [path for name, path in sorted(files.items()) if name.endswith(".js")]
+    chars = fonts.site_characters(generators, scripts)
+    faces = fonts.font_faces(
+        {name: path for name, path in files.items() if name.endswith(".css")}
+    )
+
+    subsets, subset_count, before, after = {}, 0, 0, 0
+    for logical, path in sorted(files.items()):
+        if not logical.endswith(fonts.FONT_EXTENSIONS):
+            continue
+        face_chars = fonts.face_characters(chars, path, faces.get(logical))
+        data, ran = fonts.cached_subset(settings["FONT_SUBSET_CACHE"], path, face_chars)
+        subsets[logical] = data
+        subset_count += ran
+        before += os.path.getsize(path)
+        after += len(data)
+    if subsets:
+        logger.info(
+            "Assets: %d fonts subset to the %d characters the site uses "
+            "(%d subset now), %d -> %d bytes",
+            len(subsets),
+            len(chars),
+            subset_count,
+            before,
+            after,
+        )
+    return subsets
+
+
+def initialized(pelican):
+    # In settings (not only the context) so that anything keyed on the
+    # settings, like the incremental manifest, notices changed assets.
+    output_path = pelican.settings["OUTPUT_PATH"]
+    fonts.site_subsets.pop(output_path, None)
+    _sites[output_path] = theme_manifest(pelican.settings, pelican.theme)
+    pelican.settings["ASSET_MANIFEST"] = _sites[output_path][0]
+
+
+def all_generators_finalized(generators):
+    if not generators:
+        return
+    generator = generators[0]
+    settings = generator.settings
+    output_path = settings["OUTPUT_PATH"]
+    subset = settings.get("FONT_SUBSET") and fonts.available()
+    if subset:
+        fonts.site_subsets[output_path] = subset_fonts(generators)
+    # Not built yet on a second run: autoreload re-runs the same Pelican
+    # instance without initialized.
+    if subset or output_path not in _sites:
+        _sites[output_path] = theme_manifest(settings, generator.theme)
+    manifest, outputs = _sites[output_path]
+    generator.context["ASSET_MANIFEST"] = manifest
+    generator.context["ASSET_OUTPUTS"] = outputs
+
+
+def finalized(pelican):
+    built = _sites.pop(pelican.settings["OUTPUT_PATH"], None)
+    if built is None:
+        # A re-render after a template edit (cli._rerender) writes the site
+        # again without reading it; fonts.site_subsets is still that build's.
+        built = theme_manifest(pelican.settings, pelican.theme)
+    manifest, outputs = built
+    static_dir = os.path.join(pelican.output_path, pelican.settings["THEME_STATIC_DIR"])
+    written = write_outputs(static_dir, manifest, outputs)
+    logger.debug(
+        "Assets: %d fingerprinted files, %d written to %s",
+        len(outputs),
+        written,
+        static_dir,
+    )
+
+
+def register():
+    signals.initialized.connect(initialized)
+    signals.all_generators_finalized.connect(all_generators_finalized)
+    signals.finalized.connect(finalized)
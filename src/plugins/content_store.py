@@ -0,0 +1,188 @@
+#
+# content_store.py -- parse each source once per process, whichever site reads it
+#
+# cli.py builds four Pelican instances over the same content directory, and
+# each one creates its own readers: the landing reads every blog post for its
+# teaser cards, then the blog reads them all again. This plugin puts one
+# process-wide store behind every article and page reader, keyed by reader
+# class and source path and validated by the file's stamp, so the second site
+# to ask for a file gets the first one's parse.
+#
+# Each site still filters the sources by its own ARTICLE_PATHS/EXCLUDES and
+# builds its own Content objects, because URLs and save paths differ per site.
+# The store only holds what reader.read() returns. Metadata objects that carry
+# a site's settings (tags, categories, authors) are re-bound to the settings of
+# the site asking.
+#
+# Sites built by cli.py --jobs run in separate processes with separate stores;
+# there the on-disk render cache (render_cache.py) does the sharing.
+#
+# With PREREAD_WORKERS set, each generator's sources that the store doesn't
+# hold yet are read on a process pool (preread.py) before the generator
+# starts, and put in the store in the order the generator will ask for them.
+#
+import logging
+import os
+
+from pelican.generators import ArticlesGenerator
+from pelican.plugins import signals
+from pelican.urlwrappers import URLWrapper
+from pelican.utils import file_suffix
+
+from plugins import preread
+
+logger = logging.getLogger(__name__)
+
+# Settings that readers consult while parsing. A site that differs in any of
+# them gets its own entries instead of another site's parse.
+READER_SETTINGS = (
+    "DOCUTILS_SETTINGS",
+    "FORMATTED_FIELDS",
+    "MARKDOWN",
+    "READERS",
+    "RENDER_CACHE_PATH",
+    "TYPOGRIFY",
+    "TYPOGRIFY_DASHES",
+    "TYPOGRIFY_IGNORE_TAGS",
+    "TYPOGRIFY_OMIT_FILTERS",
+)
+
+
+class ContentStore:
+    """Reader output per (reader class, source path), shared by every site."""
+
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.prereads = 0
+
+    @staticmethod
+    def _salt(settings):
+        return repr([(name, settings.get(name)) for name in READER_SETTINGS])
+
+    @staticmethod
+    def _stamp(source_path):
+        st = os.stat(source_path)
+        return st.st_mtime_ns, st.st_size
+
+    def _fresh(self, reader, source_path):
+        """The stored entry for source_path if it is still valid for reader."""
+        entry = self._entries.get((type(reader), os.path.realpath(source_path)))
+        if entry is not None and entry[0] == self._stamp(source_path):
+            if entry[1] == self._salt(reader.settings):
+                return entry
+        return None
+
+    def put(self, reader, source_path, content, metadata):
+        """Store what reader.read(source_path) returned."""
+        key = (type(reader), os.path.realpath(source_path))
+        stamp = self._stamp(source_path)
+        self._entries[key] = (stamp, self._salt(reader.settings), content, metadata)
+
+    def read(self, reader, read, source_path):
+        """Return read(source_path), or the stored result of an earlier read
+        of the same, unchanged file by the same kind of reader."""
+        entry = self._fresh(reader, source_path)
+        if entry is not None:
+            self.hits += 1
+            content, metadata = entry[2], entry[3]
+            return content, rebind(metadata, reader.settings)
+
+        self.misses += 1
+        content, metadata = read(source_path)
+        self.put(reader, source_path, content, metadata)
+        return content, rebind(metadata, reader.settings)
+
+    def preread(self, generator, source_paths, workers):
+        """Read the source_paths the store doesn't hold on workers processes
+        and store the results, in order."""
+        readers = generator.readers
+        todo = []
+        for source_path in source_paths:
+            reader = readers.readers.get(file_suffix(source_path))
+            if reader is None or self._fresh(reader, source_path) is not None:
+                continue
+            # Pelican's own content cache (--incremental) will skip the read.
+            if readers.get_cached_data(source_path, None) is not None:
+                continue
+            todo.append(source_path)
+        if len(todo) < preread.MIN_FILES:
+            return
+
+        settings = generator.settings
+        for source_path, result in preread.preread(
+            self._salt(settings), settings, todo, workers
+        ):
+            if result is None:
+                continue
+            content, metadata = result
+            reader = readers.readers[file_suffix(source_path)]
+            self.put(reader, source_path, content, preread.restore(metadata, settings))
+            self.prereads += 1
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _rebind_value(value, settings):
+    if isinstance(value, URLWrapper):
+        return type(value)(value.name, settings)
+    if isinstance(value, list):
+        return [_rebind_value(v, settings) for v in value]
+    return value
+
+
+def rebind(metadata, settings):
+    """A copy of reader metadata with tags, categories and authors bound to
+    settings. Lists are copied too, so no site can mutate another's."""
+    return {name: _rebind_value(value, settings) for name, value in metadata.items()}
+
+
+STORE = ContentStore()
+
+
+def _share_readers(generator):
+    if not generator.settings.get("CONTENT_STORE", True):
+        return
+
+    for reader in generator.readers.readers.values():
+        if getattr(reader, "_content_store_read", None) is not None:
+            continue
+        read = reader.read
+
+        def shared_read(source_path, reader=reader, read=read):
+            return STORE.read(reader, read, source_path)
+
+        reader._content_store_read = read
+        reader.read = shared_read
+
+    workers = generator.settings.get("PREREAD_WORKERS", 0)
+    if workers:
+        if isinstance(generator, ArticlesGenerator):
+            paths, excludes = "ARTICLE_PATHS", "ARTICLE_EXCLUDES"
+        else:
+            paths, excludes = "PAGE_PATHS", "PAGE_EXCLUDES"
+        source_paths = [
+            os.path.join(generator.path, f)
+            for f in generator.get_files(
+                generator.settings[paths], exclude=generator.settings[excludes]
+            )
+        ]
+        STORE.preread(generator, source_paths, workers)
+
+
+def log_stats(pelican):
+    logger.debug(
+        "Content store: %d hits, %d misses, %d read ahead",
+        STORE.hits,
+        STORE.misses,
+        STORE.prereads,
+    )
+
+
+def register():
+    signals.article_generator_init.connect(_share_readers)
+    signals.page_generator_init.connect(_share_readers)
+    signals.finalized.connect(log_stats)
+    signals.finalized.connect(preread.shutdown)
@@ -0,0 +1,382 @@
+#
+# critical_css.py -- inline the above-the-fold CSS, load the rest asynchronously
+#
+# A template marks where its first screen ends with FOLD_MARKER. For every
+# HTML page written with a marker, this plugin collects the tags, classes and
+# ids that appear before it (and within FIRST_SCREEN_BYTES of <body>: an
+# article's marker follows its whole body), keeps the rules of the
+# CRITICAL_CSS bundle whose selectors only need those, and inlines them in a
+# <style> in place of the bundle's <link rel="stylesheet">. The full bundle is
+# then fetched with rel=preload and applied on load (with a <noscript>
+# fallback), so first paint waits for no stylesheet request at all.
+#
+# Attribute selectors (the [data-theme] palettes), structural pseudo classes
+# and their arguments count as satisfied; selectors for interaction (:hover,
+# :focus, ...) don't, nothing is hovered at first paint. Of a selector list
+# only the selectors that match are kept. Custom properties no kept rule
+# reads, and @font-face rules for families no kept rule sets, are dropped;
+# other at-rule statements are kept, @media/@supports blocks are filtered
+# recursively, @keyframes wait for the full sheet. Pages that share a set of
+# tokens (every listing page, most articles) share one extraction.
+#
+# Pages without the marker, and themes without the bundle, are left alone.
+#
+import logging
+import posixpath
+import re
+import urllib.parse
+
+from pelican.plugins import signals
+
+from plugins import assets
+
+logger = logging.getLogger(__name__)
+
+FOLD_MARKER = "<!-- fold -->"
+
+# Markup after <body> that can be on the first screen, marker or not.
+FIRST_SCREEN_BYTES = 8192
+
+# Block at-rules whose contents are rules (filtered) rather than declarations.
+_GROUPING_RULES = ("@media", "@supports", "@layer", "@container")
+# At-rules with nothing a first paint needs.
+_DEFERRED_RULES = ("@keyframes", "@-webkit-keyframes", "@page")
+
+_TAG_RE = re.compile(r"<([a-zA-Z][\w-]*)")
+_ATTR_RE = re.compile(
+    r"""\s(class|id)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE
+)
+_SELECTOR_ATTR_RE = re.compile(r"\[[^\]]*\]")
+_SELECTOR_ARGS_RE = re.compile(r"\((?:[^()]|\([^()]*\))*\)")
+_SELECTOR_PART_RE = re.compile(r"(::?|[.#])?(-?[_a-zA-Z][\w-]*)")
+_INTERACTIVE_RE = re.compile(
+    r":(?:hover|active|focus|focus-visible|focus-within|visited|target)\b"
+)
+_VAR_RE = re.compile(r"var\(\s*(--[\w-]+)")
+
+# Per site OUTPUT_PATH: (bundle's fingerprinted name, CriticalCSS over it).
+_sites = {}
+
+
+def parse_rules(css):
+    """Split a stylesheet into [(prelude, body)].
+
+    body is the declaration text of a style rule, a nested list for grouping
+    at-rules (@media, ...) and None for statements (@import ...;).
+    """
+    rules, _ = _parse_block(css, 0)
+    return rules
+
+
+def _skip_string(css, pos):
+    quote = css[pos]
+    pos += 1
+    while pos < len(css) and css[pos] != quote:
+        pos += 2 if css[pos] == "\\" else 1
+    return pos + 1
+
+
+def _parse_block(css, pos):
+    rules = []
+    start = pos
+    while pos < len(css):
+        char = css[pos]
+        if char in "\"'":
+            pos = _skip_string(css, pos)
+        elif char == ";":
+            prelude = css[start:pos].strip()
+            if prelude:
+                rules.append((prelude, None))
+            pos = start = pos + 1
+        elif char == "}":
+            return rules, pos + 1
+        elif char == "{":
+            prelude = css[start:pos].strip()
+            if prelude.lower().startswith(_GROUPING_RULES):
+                body, pos = _parse_block(css, pos + 1)
+            else:
+                body_start, depth = pos + 1, 1
+                pos += 1
+                while pos < len(css) and depth:
+                    if css[pos] in "\"'":
+                        pos = _skip_string(css, pos)
+                        continue
+                    depth += {"{": 1, "}": -1}.get(css[pos], 0)
+                    pos += 1
+                body = css[body_start : pos - 1]
+            rules.append((prelude, body))
+            start = pos
+        else:
+            pos += 1
+    return rules, pos
+
+
+def serialize_rules(rules):
+    parts = []
+    for prelude, body in rules:
+        if body is None:
+            parts.append(f"{prelude};")
+        elif isinstance(body, list):
+            parts.append(f"{prelude}{{{serialize_rules(body)}}}")
+        else:
+            parts.append(f"{prelude}{{{body}}}")
+    return "".join(parts)
+
+
+def page_tokens(html):
+    """The tags, classes and ids in an HTML fragment, as a frozenset of
+    ("tag" | "." | "#", name) pairs."""
+    tokens = {("tag", tag.lower()) for tag in _TAG_RE.findall(html)}
+    for match in _ATTR_RE.finditer(html):
+        kind = "." if match.group(1).lower() == "class" else "#"
+        value = next(v for v in match.group(2, 3, 4) if v is not None)
+        tokens.update((kind, name) for name in value.split())
+    return frozenset(tokens)
+
+
+def selector_tokens(selector):
+    """What an element tree needs for selector to match anything."""
+    selector = _SELECTOR_ARGS_RE.sub("", _SELECTOR_ATTR_RE.sub("", selector))
+    needed = set()
+    for prefix, name in _SELECTOR_PART_RE.findall(selector):
+        if prefix in (".", "#"):
+            needed.add((prefix, name))
+        elif not prefix:
+            needed.add(("tag", name.lower()))
+    return needed
+
+
+def _split(text, separator):
+    """text split at separator outside parentheses, brackets and strings."""
+    parts, depth, start, pos = [], 0, 0, 0
+    while pos < len(text):
+        char = text[pos]
+        if char in "\"'":
+            pos = _skip_string(text, pos)
+            continue
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == separator and not depth:
+            parts.append(text[start:pos])
+            start = pos + 1
+        pos += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _split_selectors(prelude):
+    return _split(prelude, ",")
+
+
+def _declarations(body):
+    """[(property, value)] of a declaration block."""
+    declarations = []
+    for declaration in _split(body, ";"):
+        name, colon, value = declaration.partition(":")
+        if colon:
+            declarations.append((name.strip(), value.strip()))
+    return declarations
+
+
+def _matching_rules(rules, tokens):
+    kept = []
+    for prelude, body in rules:
+        if prelude.startswith("@"):
+            if prelude.lower().startswith(_DEFERRED_RULES):
+                continue
+            if isinstance(body, list):
+                body = _matching_rules(body, tokens)
+                if not body:
+                    continue
+            kept.append((prelude, body))
+            continue
+        selectors = [
+            s
+            for s in _split_selectors(prelude)
+            if not _INTERACTIVE_RE.search(s) and selector_tokens(s) <= tokens
+        ]
+        if selectors:
+            kept.append((",".join(selectors), body))
+    return kept
+
+
+def _style_rules(rules):
+    for prelude, body in rules:
+        if isinstance(body, list):
+            yield from _style_rules(body)
+        elif body is not None and not prelude.lower().startswith("@font-face"):
+            yield prelude, body
+
+
+def _used(rules):
+    """(custom properties read, font values set) by the style rules, with
+    custom properties resolved through the ones the rules define."""
+    defined, read, fonts = {}, set(), []
+    for _, body in _style_rules(rules):
+        for name, value in _declarations(body):
+            if name.startswith("--"):
+                defined.setdefault(name, []).append(value)
+            else:
+                read.update(_VAR_RE.findall(value))
+                if name.lower() in ("font", "font-family"):
+                    fonts.append(value)
+    pending = list(read)
+    while pending:
+        for value in defined.get(pending.pop(), ()):
+            for name in _VAR_RE.findall(value):
+                if name not in read:
+                    read.add(name)
+                    pending.append(name)
+    for name in read:
+        fonts.extend(defined.get(name, ()))
+    return read, " ".join(fonts).lower()
+
+
+def _face_family(body):
+    for name, value in _declarations(body):
+        if name.lower() == "font-family":
+            return value.strip("\"' ").lower()
+    return None
+
+
+def _prune(rules, read, fonts):
+    """rules without unread custom properties and unused @font-face rules."""
+    kept = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            body = _prune(body, read, fonts)
+            if not body:
+                continue
+        elif prelude.lower().startswith("@font-face"):
+            family = _face_family(body or "")
+            if family and family not in fonts:
+                continue
+        elif body is not None and "--" in body:
+            declarations = [
+                f"{name}:{value}"
+                for name, value in _declarations(body)
+                if not name.startswith("--") or name in read
+            ]
+            if not declarations:
+                continue
+            body = ";".join(declarations)
+        kept.append((prelude, body))
+    return kept
+
+
+def critical_rules(rules, tokens):
+    """The rules that can apply to a page with tokens above the fold."""
+    kept = _matching_rules(rules, tokens)
+    return _prune(kept, *_used(kept))
+
+
+class CriticalCSS:
+    """Critical CSS extraction over one stylesheet, memoized by page tokens."""
+
+    def __init__(self, css):
+        self.rules = parse_rules(css)
+        self._memo = {}
+
+    def extract(self, tokens):
+        css = self._memo.get(tokens)
+        if css is None:
+            css = self._memo[tokens] = serialize_rules(
+                critical_rules(self.rules, tokens)
+            )
+        return css
+
+
+def _absolute_urls(css, base):
+    """Resolve the stylesheet-relative url(...)s in css against base, the
+    directory the stylesheet is served from."""
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(("data:", "#", "/")) or "://" in url:
+            return match.group(0)
+        if "://" in base:
+            url = urllib.parse.urljoin(base + "/", url)
+        else:
+            url = posixpath.normpath(posixpath.join(base, url))
+        return f"url({quote}{url}{quote})"
+
+    return assets.CSS_URL_RE.sub(replace, css)
+
+
+def inline_critical(html, hashed, extractor):
+    """html with the critical part of the stylesheet hashed inlined, or None
+    if the page has no fold marker or doesn't link the stylesheet."""
+    fold = html.find(FOLD_MARKER)
+    if fold < 0:
+        return None
+    link = re.search(
+        r"""<link\b[^>]*\brel=["']?stylesheet["']?[^>]*"""
+        r"""\bhref=["']([^"']*%s)["'][^>]*>""" % re.escape(hashed),
+        html,
+    )
+    if link is None:
+        return None
+
+    href = link.group(1)
+    body = html.find("<body")
+    if body >= 0:
+        fold = min(fold, body + FIRST_SCREEN_BYTES)
+    css = extractor.extract(page_tokens(html[:fold]))
+    css = _absolute_urls(css, posixpath.dirname(href))
+    if "</style" in css.lower():
+        return None
+    replacement = (
+        f"<style>{css}</style>\n"
+        f'    <link rel="preload" as="style" href="{href}"'
+        f" onload=\"this.onload=null;this.rel='stylesheet'\">\n"
+        f'    <noscript><link rel="stylesheet" href="{href}"></noscript>'
+    )
+    html = html[: link.start()] + replacement + html[link.end() :]
+    return html.replace(FOLD_MARKER, "", 1)
+
+
+def all_generators_finalized(generators):
+    if not generators:
+        return
+    generator = generators[0]
+    settings = generator.settings
+    output_path = settings["OUTPUT_PATH"]
+    _sites.pop(output_path, None)
+    bundle = settings.get("CRITICAL_CSS")
+    if not bundle:
+        return
+
+    # Built by plugins/assets.py, whose all_generators_finalized runs first.
+    manifest = generator.context.get("ASSET_MANIFEST") or {}
+    outputs = generator.context.get("ASSET_OUTPUTS") or {}
+    hashed = manifest.get(bundle)
+    if hashed is None:
+        logger.debug("Critical CSS: %s is not in this theme's assets", bundle)
+        return
+    source, data = outputs[hashed]
+    if data is None:
+        with open(source, "rb") as f:
+            data = f.read()
+    _sites[output_path] = (hashed, CriticalCSS(data.decode("utf-8")))
+
+
+def content_written(path, context=None, **kwargs):
+    if context is None or not path.endswith(".html"):
+        return
+    site = _sites.get(context.get("OUTPUT_PATH"))
+    if site is None:
+        return
+
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+    html = inline_critical(html, *site)
+    if html is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def register():
+    signals.all_generators_finalized.connect(all_generators_finalized)
+    signals.content_written.connect(content_written)
@@ -0,0 +1,30 @@
+#
+# derived_fields.py -- per-article values the templates would otherwise recompute
+#
+# The zed listings show every blogmark's source and via domains and every
+# card's generated cover, on every index, tag and landing page it appears on.
+# Instead of running the domain/seedint filters for each of those renders,
+# each article and page gets them as attributes once it is read:
+#
+#   link_domain   domain(article.link), "" without a Link:
+#   via_domain    domain(article.via), "" without a Via:
+#   cover_seed    seedint(article.slug or article.title), seeding the cover art
+#
+# The templates fall back to the filters when an attribute is missing, so the
+# theme still renders without this plugin.
+#
+from pelican.plugins import signals
+
+import jinja_filters
+
+
+def derive_fields(content):
+    content.link_domain = jinja_filters.domain(getattr(content, "link", ""))
+    content.via_domain = jinja_filters.domain(getattr(content, "via", ""))
+    content.cover_seed = jinja_filters.seedint(
+        getattr(content, "slug", None) or getattr(content, "title", "")
+    )
+
+
+def register():
+    signals.content_object_init.connect(derive_fields)
@@ -0,0 +1,236 @@
+#
+# fonts.py -- theme fonts subset to the characters a site actually uses
+#
+# The theme ships whole font families, most of whose glyphs (Cyrillic, Greek,
+# box drawing, ...) no page ever shows. plugins/assets.py publishes each
+# font's subset instead, under the subset's own fingerprint, so stylesheets'
+# @font-face src urls and the `asset` filter's preloads point at it.
+#
+# The characters come from everything a page can be rendered from: the text
+# and metadata of every article and page the site read, its templates, its
+# settings (SITENAME, menus, ...) and the theme's scripts, plus KEEP_ALWAYS
+# for text that is formatted at build time (dates, counts) or in the browser.
+# This is done before any page is rendered, so the fingerprints are known to
+# the templates; a font-family is not matched to the elements it styles.
+# Each @font-face keeps the characters of the site it can show: those in its
+# unicode-range, if the theme's stylesheets give one, that the font has a
+# glyph for.
+#
+# Subsets are cached by a digest of the font and its face's characters, so a
+# build whose text didn't gain a character doesn't run the subsetter at all,
+# and one that did only subsets the faces the new characters fall in.
+#
+import hashlib
+import html
+import io
+import json
+import os
+import posixpath
+import re
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    subset = None
+
+# Bump when the subsetter options change; every font is then subset again.
+SUBSET_VERSION = 2
+
+FONT_EXTENSIONS = (".woff2", ".woff", ".ttf", ".otf")
+
+_FONT_FACE_RE = re.compile(r"@font-face\s*{([^}]*)}", re.I)
+_SRC_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+_UNICODE_RANGE_RE = re.compile(r"unicode-range\s*:\s*([^;}]*)", re.I)
+
+# Printable ASCII and the typography Markdown and the templates produce.
+KEEP_ALWAYS = "".join(map(chr, range(0x20, 0x7F))) + "\u00a0©·–—‘’“”•…←→"
+
+# Per site OUTPUT_PATH: {logical font name: subset bytes}, for
+# assets.theme_manifest(). Kept here because Pelican loads assets under a bare
+# module name, while critical_css imports it as plugins.assets: two modules,
+# but this one is only ever plugins.fonts.
+site_subsets = {}
+
+# Content lists of the article and page generators.
+_CONTENT_LISTS = (
+    "articles",
+    "translations",
+    "hidden_articles",
+    "hidden_translations",
+    "drafts",
+    "drafts_translations",
+    "pages",
+    "hidden_pages",
+    "draft_pages",
+    "draft_translations",
+)
+
+
+def available():
+    return subset is not None
+
+
+def _strings(value):
+    """Every string in a settings or metadata value, recursively."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.items():
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            yield from _strings(item)
+    elif hasattr(value, "name") and isinstance(value.name, str):
+        # Pelican's Tag, Category and Author.
+        yield value.name
+
+
+def site_characters(generators, static_files=()):
+    """The characters the pages of the site built by generators can contain.
+
+    Args:
+        generators: The site's generators, after reading.
+        static_files: Paths of theme scripts whose strings end up on pages.
+
+    Returns:
+        frozenset: Characters, entities decoded.
+    """
+    chars = set(KEEP_ALWAYS)
+
+    def add(text):
+        chars.update(html.unescape(text))
+
+    generator = generators[0]
+    for text in _strings(generator.settings):
+        add(text)
+    env = generator.env
+    for name in env.list_templates():
+        source, _, _ = env.loader.get_source(env, name)
+        add(source)
+    for path in static_files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            add(f.read())
+
+    for generator in generators:
+        for name in _CONTENT_LISTS:
+            for content in getattr(generator, name, None) or ():
+                add(content._content or "")
+                for text in _strings(content.metadata):
+                    add(text)
+    return frozenset(chars)
+
+
+def parse_unicode_range(value):
+    """[(first, last)] code points of a unicode-range descriptor value,
+    e.g. "U+0000-00FF, U+0131, U+4??"."""
+    ranges = []
+    for token in value.split(","):
+        token = token.strip().upper()
+        if not token.startswith("U+"):
+            continue
+        first, _, last = token[2:].partition("-")
+        try:
+            if "?" in first:
+                ranges.append(
+                    (int(first.replace("?", "0"), 16), int(first.replace("?", "F"), 16))
+                )
+            else:
+                ranges.append((int(first, 16), int(last or first, 16)))
+        except ValueError:
+            continue
+    return ranges
+
+
+def font_faces(stylesheets):
+    """The unicode-range of each font the @font-face rules in stylesheets load.
+
+    Args:
+        stylesheets: {logical name: source path} of the theme's stylesheets.
+
+    Returns:
+        dict: {logical font name: [(first, last)], or None for every code
+            point}. A font several faces load gets the union of their ranges.
+    """
+    faces = {}
+    for name, path in sorted(stylesheets.items()):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        for face in _FONT_FACE_RE.finditer(text):
+            match = _UNICODE_RANGE_RE.search(face.group(1))
+            ranges = parse_unicode_range(match.group(1)) if match else None
+            for url in _SRC_URL_RE.finditer(face.group(1)):
+                target = posixpath.normpath(
+                    posixpath.join(posixpath.dirname(name), url.group(2).strip())
+                )
+                if ranges is None or faces.get(target, []) is None:
+                    faces[target] = None
+                else:
+                    faces[target] = faces.get(target, []) + ranges
+    return faces
+
+
+def face_characters(chars, source_path, ranges=None):
+    """The chars that the font at source_path, loaded for ranges, can show.
+
+    Returns:
+        frozenset: chars within ranges (None for all) with a glyph in the font.
+    """
+    cmap = TTFont(source_path, lazy=True).getBestCmap()
+    return frozenset(
+        c
+        for c in chars
+        if ord(c) in cmap
+        and (ranges is None or any(lo <= ord(c) <= hi for lo, hi in ranges))
+    )
+
+
+def subset_digest(data, chars):
+    params = json.dumps([SUBSET_VERSION, "".join(sorted(chars))]).encode()
+    return hashlib.sha256(params + b"\0" + data).hexdigest()
+
+
+def subset_font(data, chars):
+    """data (a font file) with only the glyphs for chars, in the same format.
+
+    Layout features and variation axes are kept, so kerning, ligatures and
+    weight ranges behave as they did with the whole font.
+    """
+    # Keep head.modified as it was, so the same characters always give the
+    # same bytes (and the same fingerprinted URL), cache or no cache.
+    font = TTFont(io.BytesIO(data), recalcTimestamp=False)
+    options = subset.Options()
+    options.layout_features = ["*"]
+    options.notdef_outline = True
+    options.flavor = font.flavor
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes={ord(c) for c in chars})
+    subsetter.subset(font)
+    out = io.BytesIO()
+    font.save(out)
+    return out.getvalue()
+
+
+def cached_subset(cache_dir, source_path, chars):
+    """subset_font() of the file at source_path, through cache_dir.
+
+    Returns:
+        tuple: (subset bytes, whether the subsetter had to run).
+    """
+    with open(source_path, "rb") as f:
+        data = f.read()
+    digest = subset_digest(data, chars)
+    ext = os.path.splitext(source_path)[1]
+    path = os.path.join(cache_dir, digest[:2], digest + ext)
+    try:
+        with open(path, "rb") as f:
+            return f.read(), False
+    except FileNotFoundError:
+        pass
+    data = subset_font(data, chars)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return data, True
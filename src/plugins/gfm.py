@@ -20,17 +20,34 @@
 #
 # gfm.py -- GitHub-Flavored Markdown reader for Pelican
 #
-import html
+# The one reader for Markdown files. The front-matter delimiter picks the
+# metadata parser: a +++ block is TOML if it parses as TOML (plugins/
+# toml_metadata.py) and "Key: value" lines otherwise, like a --- block. Either
+# way the file is read once and its body rendered and highlighted once.
+#
+# Large sources are memory-mapped: the front matter is found on the mapped
+# bytes and the body is fed to cmark straight from the mapping, so a
+# multi-megabyte transcript is never held as a Python str. That goes through
+# cmarkgfm's private cffi bindings (hence the pinned version in pyproject.toml);
+# everything else uses its public github_flavored_markdown_to_html().
+#
+import codecs
+import hashlib
 import logging
+import mmap
+import os
+import pathlib
 import re
 
 import pelican.plugins.signals
 import pelican.readers
-import pelican.utils
 import pygments
 
+from plugins import highlight, render_cache, toml_metadata
+
 try:
     import cmarkgfm
+    import cmarkgfm.cmark
     from cmarkgfm.cmark import Options as cmarkgfm_options
 except ImportError:
     cmarkgfm = None
@@ -39,75 +56,56 @@ except ImportError:
 DUPLICATES_DEFINITIONS_ALLOWED = pelican.readers.DUPLICATES_DEFINITIONS_ALLOWED
 logger = logging.getLogger(__name__)
 
+# Rendered output depends on this module's code as much as on the source, so
+# its digest (and plugins.highlight's) is part of every render cache key: editing
+# the reader or the highlighter invalidates the cache without anyone remembering
+# to bump a version.
+_MODULE_DIGEST = hashlib.sha256(pathlib.Path(__file__).read_bytes()).hexdigest()
+
 
 FRONTMATTER_RE = re.compile(
-    r"^(?:\s*\n)*"  # preceeding blank lines
-    r"(?:\+\+\+|---)\s*\n"  # +++ OR ---
-    r"(?P<metadata>.*?)"  # capture everything here (non-greedy)
-    r"^(?:\+\+\+|---|\.\.\.)\s*\n"  # +++ OR --- OR ...
-    r"(?P<content>.*)",  # capture everything here
+    rb"(?:\s*\n)*"  # preceeding blank lines (match() anchors at the start)
+    rb"(?P<delimiter>\+\+\+|---)\s*\n"  # +++ OR ---
+    rb"(?P<metadata>.*?)"  # capture everything here (non-greedy)
+    rb"^(?:\+\+\+|---|\.\.\.)\s*\n",  # +++ OR --- OR ...; the body follows
     re.DOTALL | re.MULTILINE,
 )
 
+# A "Key: value" front-matter line.
+_KEY_VALUE_RE = re.compile(r"\s*[A-Za-z][\w -]*:")
 
-# NOTE: the builtin MarkdownReader should be disabled to ensure it is not used!
-# You can do this by not installing the markdown module.
-
-pelican.readers.MarkdownReader.enabled = bool(cmarkgfm)
-
-# Make code fences with `python` as the language default to highlighting as
-# Python 3.
-_LANG_ALIASES = {
-    "python": "python3",
-}
-
+# The GitHub extensions github_flavored_markdown_to_html() enables.
+GFM_EXTENSIONS = ("table", "autolink", "tagfilter", "strikethrough", "tasklist")
 
-def _highlight(html_content):
-    """Syntax-highlights HTML-rendered Markdown.
+# Sources at least this big are memory-mapped instead of read into memory.
+MMAP_MIN_BYTES = 1 << 20
 
-    Plucks sections to highlight that conform the the GitHub fenced code info
-    string as defined at https://github.github.com/gfm/#info-string.
+# The body is checked to be UTF-8 this many bytes at a time.
+_UTF8_CHECK_CHUNK = 1 << 20
 
-    This is a big hack, and it's not very good. Should probably use real XML
-    parsing instead.
 
-    Args:
-        html (str): The rendered HTML.
+def open_source(f):
+    """The bytes of the open binary file f: an mmap.mmap (read-only; the caller
+    closes it) for files of MMAP_MIN_BYTES or more, bytes otherwise."""
+    size = os.fstat(f.fileno()).st_size
+    if size < MMAP_MIN_BYTES:
+        return f.read()
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    Returns:
-        str: The HTML with Pygments syntax highlighting applied to all code
-            blocks.
-    """
-
-    formatter = pygments.formatters.HtmlFormatter(nowrap=True)
-
-    code_expr = re.compile(
-        r'<pre lang="(?P<lang>.+?)"><code>(?P<code>.+?)' r"</code></pre>",
-        re.DOTALL,
-    )
-
-    def replacer(match):
-        try:
-            lang = match.group("lang")
-            lang = _LANG_ALIASES.get(lang, lang)
-            lexer = pygments.lexers.get_lexer_by_name(lang)
-        except ValueError:
-            lexer = pygments.lexers.TextLexer()
 
-        code = match.group("code")
+def _check_utf8(source, start):
+    """Raise UnicodeDecodeError, as decoding would, if source[start:] isn't
+    UTF-8, without decoding it all at once."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for pos in range(start, len(source), _UTF8_CHECK_CHUNK):
+        decoder.decode(source[pos : pos + _UTF8_CHECK_CHUNK])
+    decoder.decode(b"", final=True)
 
-        # Decode html entities in the code. cmark tries to be helpful and
-        # translate '"' to '&quot;', but it confuses pygments. Pygments will
-        # escape any html entities when re-writing the code, and we run
-        # everything through bleach after.
-        code = html.unescape(code)
 
-        highlighted = pygments.highlight(code, lexer, formatter)
-
-        return "<div class='highlight'><pre>{}</pre></div>".format(highlighted)
+# NOTE: the builtin MarkdownReader should be disabled to ensure it is not used!
+# You can do this by not installing the markdown module.
 
-    result = code_expr.sub(replacer, html_content)
-    return result
+pelican.readers.MarkdownReader.enabled = bool(cmarkgfm)
 
 
 class GFMReader(pelican.readers.MarkdownReader):
@@ -127,10 +125,65 @@ class GFMReader(pelican.readers.MarkdownReader):
             options=cmarkgfm_options.CMARK_OPT_UNSAFE,
         )
 
+    def _convert_source(self, source, start):
+        """_convert() for the UTF-8 bytes source[start:]. A memory-mapped
+        source is read by cmark in place rather than from an encoded copy of
+        a str, with the options and extensions _convert() uses."""
+        if not isinstance(source, mmap.mmap):
+            return self._convert(source[start:].decode("utf-8"))
+
+        _check_utf8(source, start)
+        cmark = cmarkgfm.cmark
+        options = (
+            cmarkgfm_options.CMARK_OPT_UNSAFE
+            | cmarkgfm_options.CMARK_OPT_GITHUB_PRE_LANG
+        )
+        cmark.core_extensions_ensure_registered()
+        parser = cmark.parser_new(options=options)
+        try:
+            for name in GFM_EXTENSIONS:
+                cmark.parser_attach_syntax_extension(
+                    parser, cmark.find_syntax_extension(name)
+                )
+            with cmark._cmark.ffi.from_buffer(source) as buffer:
+                cmark._cmark.lib.cmark_parser_feed(
+                    parser, buffer + start, len(source) - start
+                )
+            root = cmark.parser_finish(parser)
+            if cmark._cmark.lib.cmark_node_get_type(root) == (
+                cmark._cmark.lib.CMARK_NODE_NONE
+            ):
+                raise ValueError("Error parsing markdown!")
+            return cmark.render_html(
+                root,
+                options=options,
+                extensions=cmark.parser_get_syntax_extensions(parser),
+            )
+        finally:
+            cmark.parser_free(parser)
+
+    def _cache_salt(self):
+        """Everything besides the source bytes that shapes read()'s output."""
+        return (
+            type(self).__name__,
+            _MODULE_DIGEST,
+            highlight.MODULE_DIGEST,
+            toml_metadata.MODULE_DIGEST,
+            cmarkgfm_options.CMARK_OPT_UNSAFE,
+            getattr(cmarkgfm, "__version__", None),
+            pygments.__version__,
+        )
+
     def _parse_metadata(self, metadata):
         """Return the dict containing document metadata"""
-        formatted_fields = self.settings["FORMATTED_FIELDS"]
+        return self._process_metadata(self._split_metadata(metadata))
+
+    def _split_metadata(self, metadata):
+        """Split a front-matter block into raw {name: [value]} strings.
 
+        This is the part of metadata parsing that is safe to cache: it does not
+        depend on settings, and it round-trips through JSON.
+        """
         meta = {}
         for line in metadata.splitlines():
             if not line.strip():
@@ -143,6 +196,11 @@ class GFMReader(pelican.readers.MarkdownReader):
                 )
                 continue
             meta[name.strip()] = [value.strip()]
+        return meta
+
+    def _process_metadata(self, meta):
+        """Turn raw {name: [value]} strings into Pelican metadata objects."""
+        formatted_fields = self.settings["FORMATTED_FIELDS"]
 
         output = {}
         for name, value in meta.items():
@@ -168,24 +226,94 @@ class GFMReader(pelican.readers.MarkdownReader):
                 output[name] = self.process_metadata(name, value[0])
         return output
 
+    def read_metadata(self, source_path):
+        """Read only the metadata of a Markdown file.
+
+        For callers that want titles, dates and tags rather than HTML: the
+        front matter is found and parsed as read() would, but the body is
+        never decoded or rendered.
+        """
+        self._source_path = source_path
+        with open(source_path, "rb") as f:
+            data = open_source(f)
+        try:
+            meta, _ = self._front_matter(data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        return self._process_metadata(meta)
+
     def read(self, source_path):
         "Read metadata and content then render into HTML."
 
         # read metadata and markdown content
         self._source_path = source_path
-        with pelican.utils.pelican_open(source_path) as text:
-            match = FRONTMATTER_RE.match(text)
-            if match:
-                metadata = self._parse_metadata(match.group("metadata"))
-                content = match.group("content")
+        with open(source_path, "rb") as f:
+            data = open_source(f)
+        try:
+            cache = render_cache.get_cache(self.settings)
+            key = cache.key(data, *self._cache_salt()) if cache else None
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                content, meta = cached["content"], cached["metadata"]
             else:
-                metadata = {}
-                content = text
-            content = self._convert(content)
-            content = _highlight(content)
+                content, meta = self._render(data)
+                if cache:
+                    cache.put(key, {"content": content, "metadata": meta})
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
 
         assert content, "Did not expect content to be empty"
-        return content, metadata
+        return content, self._process_metadata(meta)
+
+    def _front_matter(self, source):
+        """(raw metadata, offset of the body) of source bytes.
+
+        Only the front matter is decoded.
+        """
+        start = len(codecs.BOM_UTF8) if source[:3] == codecs.BOM_UTF8 else 0
+        match = FRONTMATTER_RE.match(source, start)
+        if not match:
+            return {}, start
+        header = match.group("metadata").decode("utf-8")
+        meta = None
+        if match.group("delimiter") == b"+++":
+            try:
+                meta = toml_metadata.raw_toml_metadata(header)
+            except ValueError as e:
+                # Most +++ headers are "Key: value" lines, which aren't TOML
+                # and aren't meant to be; anything else was meant as TOML.
+                if not all(
+                    _KEY_VALUE_RE.match(line)
+                    for line in header.splitlines()
+                    if line.strip()
+                ):
+                    logger.warning(
+                        "Could not parse the +++ front matter of %s as TOML "
+                        '(%s); reading it as "Key: value" lines instead',
+                        self._source_path,
+                        e,
+                    )
+        if meta is None:
+            meta = self._split_metadata(header)
+        return meta, match.end()
+
+    def _render(self, source):
+        """Render source bytes to (highlighted HTML, raw metadata).
+
+        Only the front matter is decoded here; _convert_source() takes the body.
+        """
+        meta, start = self._front_matter(source)
+        content = self._convert_source(source, start)
+        content = highlight.highlight_html(
+            content,
+            workers=self.settings.get("HIGHLIGHT_WORKERS", 0),
+            min_blocks=self.settings.get(
+                "HIGHLIGHT_PARALLEL_MIN_BLOCKS", highlight.PARALLEL_MIN_BLOCKS
+            ),
+        )
+        return content, meta
 
     def disabled_message(self) -> str:
         return (
@@ -201,3 +329,4 @@ def add_readers(readers):
 
 def register():
     pelican.plugins.signals.readers_init.connect(add_readers)
+    pelican.plugins.signals.finalized.connect(render_cache.evict_caches)
@@ -0,0 +1,142 @@
+#
+# gists.py -- GitHub gists embedded as highlighted HTML from a local cache
+#
+# GitHub's embed is a <script> that blocks rendering while it fetches a
+# third-party script, which then document.write()s the gist. Instead, the
+# files of every gist the content embeds are kept in GIST_CACHE (committed,
+# one directory per gist id) and the gist directive (rst_gist.py) inlines
+# them highlighted by plugins.highlight, like any fenced block. A gist that
+# isn't in the cache falls back to the script.
+#
+# cli.py --fetch-gists downloads what the cache lacks; builds never touch
+# the network.
+#
+import hashlib
+import html
+import logging
+import os
+import pathlib
+import re
+import urllib.parse
+import urllib.request
+
+import pygments.lexers
+import pygments.util
+
+from plugins import highlight
+
+logger = logging.getLogger(__name__)
+
+# `.. gist:: GIST_ID FILENAME` in a reStructuredText source.
+GIST_RE = re.compile(r"^\s*\.\.\s+gist::\s+(\S+)\s+(\S+)\s*$", re.MULTILINE)
+
+RAW_URL = "https://gist.github.com/{gist_id}/raw/{filename}"
+
+SCRIPT_EMBED = """
+        <script src="https://gist.github.com/%s.js?file=%s">
+        </script>
+        """
+
+_SAFE_NAME_RE = re.compile(r"^[\w][\w.-]*$")
+
+
+def cache_path(cache_dir, gist_id, filename):
+    """Where a gist file lives in the cache, or None if either name could
+    step outside it."""
+    if not (_SAFE_NAME_RE.match(gist_id) and _SAFE_NAME_RE.match(filename)):
+        return None
+    return os.path.join(cache_dir, gist_id, filename)
+
+
+def cache_version(cache_dir):
+    """Digest of every file in cache_dir, for render cache keys: fetching a
+    gist changes the HTML of the posts that embed it."""
+    h = hashlib.sha256()
+    root = pathlib.Path(cache_dir) if cache_dir else None
+    if root is None or not root.is_dir():
+        return h.hexdigest()
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        h.update(path.relative_to(root).as_posix().encode("utf-8") + b"\0")
+        h.update(hashlib.sha256(path.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def _lang_for(filename, code):
+    try:
+        return pygments.lexers.get_lexer_for_filename(filename, code).aliases[0]
+    except (pygments.util.ClassNotFound, IndexError):
+        return "text"
+
+
+def render(gist_id, filename, code):
+    """A gist file as a highlighted block captioned with a link to the gist."""
+    block = highlight.highlight_block(_lang_for(filename, code), html.escape(code))
+    url = "https://gist.github.com/{}".format(urllib.parse.quote(gist_id))
+    return (
+        '<figure class="gist">{}<figcaption><a href="{}">{}</a></figcaption>'
+        "</figure>".format(block, html.escape(url), html.escape(filename))
+    )
+
+
+def embed_html(cache_dir, gist_id, filename):
+    """The HTML a gist directive stands for: the cached file rendered, or
+    GitHub's script embed if the cache doesn't have it."""
+    path = cache_path(cache_dir, gist_id, filename) if cache_dir else None
+    if path is not None and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            return render(gist_id, filename, f.read())
+    logger.info(
+        "Gist %s/%s is not in GIST_CACHE, embedding GitHub's script "
+        "(fetch it with cli.py --fetch-gists)",
+        gist_id,
+        filename,
+    )
+    return SCRIPT_EMBED % (gist_id, filename)
+
+
+def fetch(cache_dir, gist_id, filename, urlopen=urllib.request.urlopen):
+    """Download one gist file into the cache."""
+    path = cache_path(cache_dir, gist_id, filename)
+    if path is None:
+        raise ValueError(f"Unsafe gist id or filename: {gist_id} {filename}")
+    url = RAW_URL.format(
+        gist_id=urllib.parse.quote(gist_id), filename=urllib.parse.quote(filename)
+    )
+    with urlopen(url, timeout=30) as response:
+        data = response.read()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def embedded_gists(content_dir):
+    """Sorted (gist id, filename) of every gist the .rst sources embed."""
+    found = set()
+    for path in pathlib.Path(content_dir).rglob("*.rst"):
+        found.update(GIST_RE.findall(path.read_text(encoding="utf-8")))
+    return sorted(found)
+
+
+def fetch_missing(content_dir, cache_dir, urlopen=urllib.request.urlopen):
+    """Fetch the embedded gists the cache lacks.
+
+    Returns:
+        tuple: (fetched, already cached) counts.
+    """
+    fetched = cached = 0
+    for gist_id, filename in embedded_gists(content_dir):
+        path = cache_path(cache_dir, gist_id, filename)
+        if path is None:
+            logger.warning("Skipping gist %s/%s: unsafe name", gist_id, filename)
+            continue
+        if os.path.isfile(path):
+            cached += 1
+            continue
+        try:
+            fetch(cache_dir, gist_id, filename, urlopen)
+        except OSError as e:
+            logger.warning("Could not fetch gist %s/%s: %s", gist_id, filename, e)
+            continue
+        logger.info("Fetched gist %s/%s", gist_id, filename)
+        fetched += 1
+    return fetched, cached
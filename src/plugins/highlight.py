@@ -0,0 +1,175 @@
+#
+# highlight.py -- Pygments highlighting for cmark's fenced code blocks
+#
+# Lives outside gfm.py so it is importable as plugins.highlight from worker
+# processes: Pelican loads gfm under a bare module name that a spawned child
+# cannot re-import, and the parallel path below pickles highlight_block by
+# reference.
+#
+import concurrent.futures
+import functools
+import hashlib
+import html
+import pathlib
+
+import pygments
+import pygments.formatters
+import pygments.lexers
+import pygments.util
+
+# Digest of this module, folded into render cache keys (see gfm.GFMReader).
+MODULE_DIGEST = hashlib.sha256(pathlib.Path(__file__).read_bytes()).hexdigest()
+
+# Make code fences with `python` as the language default to highlighting as
+# Python 3.
+LANG_ALIASES = {
+    "python": "python3",
+}
+
+# Below this many blocks a document is highlighted inline even when a pool is
+# configured; shipping a handful of blocks to another process costs more than
+# highlighting them.
+PARALLEL_MIN_BLOCKS = 8
+
+# cmark renders a fenced block with an info string as exactly
+#   <pre lang="LANG"><code>ESCAPED CODE</code></pre>
+# Inside the block '<' and '"' are always escaped, so the first '"' after the
+# opener ends the language and the first "</code></pre>" after it ends the code.
+_PRE_OPEN = '<pre lang="'
+_PRE_CODE = '"><code>'
+_CODE_CLOSE = "</code></pre>"
+
+# One formatter for every block of every document; HtmlFormatter keeps no
+# per-call state when nowrap=True.
+_FORMATTER = pygments.formatters.HtmlFormatter(nowrap=True)
+_TEXT_LEXER = pygments.lexers.TextLexer()
+
+_pool = None
+_pool_workers = 0
+
+
+def normalize_lang(lang):
+    """Canonical registry key for a fence's language: 'Python ' -> 'python3'."""
+    lang = lang.strip().lower()
+    return LANG_ALIASES.get(lang, lang)
+
+
+@functools.lru_cache(maxsize=None)
+def _lexer_for(name):
+    try:
+        return pygments.lexers.get_lexer_by_name(name)
+    except pygments.util.ClassNotFound:
+        return _TEXT_LEXER
+
+
+def get_lexer(lang):
+    """The shared lexer for a fence language, falling back to TextLexer.
+
+    pygments.lexers.get_lexer_by_name walks the plugin entry points and every
+    lexer's alias list on each call; a post with forty ``cpp`` blocks paid
+    for that forty times. Lexers hold no per-document state, so one instance
+    per language is reused for the life of the process.
+    """
+    return _lexer_for(normalize_lang(lang))
+
+
+def highlight_block(lang, code):
+    """Highlight one block's escaped code as a <div class='highlight'>."""
+    # Decode html entities in the code. cmark tries to be helpful and
+    # translate '"' to '&quot;', but it confuses pygments. Pygments will
+    # escape any html entities when re-writing the code, and we run
+    # everything through bleach after.
+    code = html.unescape(code)
+
+    highlighted = pygments.highlight(code, get_lexer(lang), _FORMATTER)
+
+    return "<div class='highlight'><pre>{}</pre></div>".format(highlighted)
+
+
+def split_blocks(html_content):
+    """Split rendered HTML into literal text and fenced code blocks.
+
+    Plucks sections to highlight that conform the the GitHub fenced code info
+    string as defined at https://github.github.com/gfm/#info-string.
+
+    The document is walked once, front to back, so the cost is linear in its
+    size no matter how many blocks it has.
+
+    Returns:
+        list: str pieces to copy through, interleaved with (lang, code) tuples
+            for each non-empty block, in document order.
+    """
+    parts = []
+    pos = 0
+    find = html_content.find
+    while (start := find(_PRE_OPEN, pos)) != -1:
+        lang_start = start + len(_PRE_OPEN)
+        lang_end = find('"', lang_start)
+        if lang_end == -1:
+            break
+        if not html_content.startswith(_PRE_CODE, lang_end):
+            # Not cmark's shape (e.g. a raw HTML <pre lang="..." ...>); copy the
+            # opener through and keep scanning after it.
+            parts.append(html_content[pos:lang_start])
+            pos = lang_start
+            continue
+
+        code_start = lang_end + len(_PRE_CODE)
+        code_end = find(_CODE_CLOSE, code_start)
+        if code_end == -1:
+            break
+
+        if code_end == code_start:
+            # An empty fence has nothing to highlight.
+            parts.append(html_content[pos : code_end + len(_CODE_CLOSE)])
+        else:
+            parts.append(html_content[pos:start])
+            parts.append(
+                (html_content[lang_start:lang_end], html_content[code_start:code_end])
+            )
+        pos = code_end + len(_CODE_CLOSE)
+
+    parts.append(html_content[pos:])
+    return parts
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def highlight_html(html_content, workers=0, min_blocks=PARALLEL_MIN_BLOCKS):
+    """Syntax-highlights HTML-rendered Markdown.
+
+    Args:
+        html_content (str): The rendered HTML.
+        workers (int): Size of the process pool to highlight on; 0 highlights
+            inline. Only documents with at least min_blocks blocks use it.
+            Highlighting is pure-Python and CPU bound, so a thread pool would
+            only add contention.
+        min_blocks (int): Block count at which the pool becomes worth it.
+
+    Returns:
+        str: The HTML with Pygments syntax highlighting applied to all code
+            blocks.
+    """
+    parts = split_blocks(html_content)
+    blocks = [p for p in parts if isinstance(p, tuple)]
+    if not blocks:
+        return html_content
+
+    if workers and len(blocks) >= min_blocks:
+        langs, codes = zip(*blocks)
+        chunksize = max(1, len(blocks) // (workers * 4))
+        highlighted = iter(
+            _get_pool(workers).map(highlight_block, langs, codes, chunksize=chunksize)
+        )
+    else:
+        highlighted = (highlight_block(lang, code) for lang, code in blocks)
+
+    return "".join(p if isinstance(p, str) else next(highlighted) for p in parts)
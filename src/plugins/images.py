@@ -0,0 +1,146 @@
+#
+# images.py -- resized WebP/AVIF variants of content images, cached by hash
+#
+# Lives outside responsive_images.py so the encoder is importable as
+# plugins.images from worker processes (see highlight.py for why).
+#
+# Variants are encoded into a cache directory keyed by a digest of the source
+# bytes and the encoder parameters:
+#
+#   CACHE/ab/ab12.../size.json      {"width": 2400, "height": 1600}
+#   CACHE/ab/ab12.../960.webp
+#
+# so an image that didn't change is never decoded again, let alone
+# re-encoded, whichever site or build asks for it.
+#
+import concurrent.futures
+import hashlib
+import json
+import os
+
+try:
+    import PIL.features
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Bump when the encoding changes; every image then gets new variants.
+ENCODER_VERSION = 1
+
+# Pillow save() arguments per output format.
+FORMATS = {
+    "avif": {"quality": 55, "speed": 6},
+    "webp": {"quality": 78, "method": 6},
+}
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# Sources worth resizing; GIFs may be animated and SVGs don't need it.
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def available():
+    return Image is not None
+
+
+def supported_formats(formats):
+    """The formats in formats that this Pillow can write."""
+    if Image is None:
+        return []
+    return [f for f in formats if f in FORMATS and PIL.features.check(f)]
+
+
+def image_digest(data):
+    params = json.dumps([ENCODER_VERSION, FORMATS], sort_keys=True).encode()
+    return hashlib.sha256(params + b"\0" + data).hexdigest()
+
+
+class CachedImage:
+    """One source image's entry in the variant cache."""
+
+    def __init__(self, cache_dir, source_path):
+        with open(source_path, "rb") as f:
+            self.digest = image_digest(f.read())
+        self.source_path = source_path
+        self.directory = os.path.join(cache_dir, self.digest[:2], self.digest)
+        self._size = None
+
+    @property
+    def size(self):
+        """(width, height) as displayed, i.e. after EXIF rotation."""
+        if self._size is None:
+            path = os.path.join(self.directory, "size.json")
+            try:
+                with open(path, encoding="utf-8") as f:
+                    size = json.load(f)
+                self._size = size["width"], size["height"]
+            except (OSError, ValueError, KeyError):
+                with Image.open(self.source_path) as image:
+                    self._size = ImageOps.exif_transpose(image).size
+                os.makedirs(self.directory, exist_ok=True)
+                _write_atomic(
+                    path,
+                    json.dumps(
+                        {"width": self._size[0], "height": self._size[1]}
+                    ).encode(),
+                )
+        return self._size
+
+    def widths(self, widths):
+        """The configured widths narrower than the image, plus its own."""
+        width = self.size[0]
+        return sorted({w for w in widths if w < width} | {width})
+
+    def variant_path(self, width, fmt):
+        return os.path.join(self.directory, f"{width}.{fmt}")
+
+    def variant_name(self, width, fmt):
+        """The published file name: mycommandcenter-960.ab12cd34.webp."""
+        stem = os.path.splitext(os.path.basename(self.source_path))[0]
+        return f"{stem}-{width}.{self.digest[:8]}.{fmt}"
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def encode_variant(source_path, dest, width, fmt):
+    """Resize source_path to width (keeping its aspect) and save it as fmt."""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        if image.width != width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        image.save(tmp, format=fmt.upper(), **FORMATS[fmt])
+    os.replace(tmp, dest)
+    return dest
+
+
+def encode_missing(jobs, workers=1):
+    """Encode the (source, dest, width, format) jobs whose dest doesn't exist.
+
+    Args:
+        jobs: Variants wanted.
+        workers: Processes to encode on; 1 encodes in this process. Encoding
+            is CPU bound, so threads would not help.
+
+    Returns:
+        int: The number of variants encoded.
+    """
+    missing = [job for job in jobs if not os.path.exists(job[1])]
+    for _, dest, _, _ in missing:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if workers > 1 and len(missing) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(encode_variant, *zip(*missing)))
+    else:
+        for job in missing:
+            encode_variant(*job)
+    return len(missing)
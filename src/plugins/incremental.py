@@ -0,0 +1,434 @@
+#
+# incremental.py -- only rewrite the pages whose inputs changed
+#
+# With INCREMENTAL enabled, every file the writer emits is recorded in a
+# manifest in the site's OUTPUT_PATH together with what it was built from:
+#
+#   - the source files behind it (an article or page's own source, or every
+#     article in a feed), and the images in them that
+#     plugins/responsive_images.py made variants of (image_sources),
+#   - the template it was rendered with, plus every template that one
+#     extends/includes/imports,
+#   - for listings (index, tags, archives, feeds): the summaries of the
+#     articles listed,
+#   - the site's structure: every article and page's URL and metadata,
+#   - and a site key covering the settings and the plugin/filter code.
+#
+# Those inputs are folded into a signature per output. On the next build an
+# output whose signature is unchanged, and whose files are still on disk, is
+# not rendered again. Outputs that disappeared from the site (a deleted post,
+# a removed tag) are deleted.
+#
+# Reading is kept incremental by Pelican's own reader cache, which cli.py
+# turns on (hash-checked) alongside INCREMENTAL.
+#
+import hashlib
+import inspect
+import json
+import logging
+import os
+import posixpath
+
+import jinja2.meta
+from pelican.plugins import signals
+from pelican.writers import Writer
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Settings that change how a build runs, not what it produces.
+_VOLATILE_SETTINGS = {
+    "CACHE_CONTENT",
+    "CACHE_PATH",
+    "CHECK_MODIFIED_METHOD",
+    "CONTENT_CACHING_LAYER",
+    "DEBUG",
+    "DELETE_OUTPUT_DIRECTORY",
+    "HIGHLIGHT_PARALLEL_MIN_BLOCKS",
+    "HIGHLIGHT_WORKERS",
+    "INCREMENTAL",
+    "LOAD_CONTENT_CACHE",
+    "RENDER_CACHE_MAX_BYTES",
+    "RENDER_CACHE_PATH",
+    "STATIC_CHECK_IF_MODIFIED",
+}
+
+# Build state per OUTPUT_PATH; several sites can be built in one process.
+_builds = {}
+
+
+def _digest(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _stable(obj):
+    """A repr that is identical across processes (no memory addresses)."""
+    if isinstance(obj, dict):
+        return "{%s}" % ", ".join(
+            f"{_stable(k)}: {_stable(v)}" for k, v in sorted(obj.items(), key=str)
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        items = sorted(obj, key=str) if isinstance(obj, (set, frozenset)) else obj
+        return "[%s]" % ", ".join(_stable(v) for v in items)
+    if callable(obj):
+        return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', obj)}"
+    return repr(obj)
+
+
+def _file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _sources(content):
+    """content's source file and the files its output is made from."""
+    return [content.source_path, *getattr(content, "image_sources", ())]
+
+
+def _code_digest(settings):
+    """Digest of the code that shapes output besides Pelican itself: the
+    plugins and the modules defining the Jinja filters/globals."""
+    paths = set()
+    for plugin_path in settings.get("PLUGIN_PATHS", []):
+        for root, _, files in os.walk(plugin_path):
+            paths.update(os.path.join(root, f) for f in files if f.endswith(".py"))
+    for table in ("JINJA_FILTERS", "JINJA_GLOBALS"):
+        for value in (settings.get(table) or {}).values():
+            try:
+                paths.add(inspect.getsourcefile(value))
+            except TypeError:
+                continue
+    return _digest(*(f"{p}={_file_digest(p)}" for p in sorted(filter(None, paths))))
+
+
+class _Build:
+    """Bookkeeping for one site's incremental build."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.output_path = settings["OUTPUT_PATH"]
+        self.content_path = settings["PATH"]
+        self.manifest_path = os.path.join(
+            self.output_path, settings["INCREMENTAL_MANIFEST"]
+        )
+        self.site_key = _digest(
+            _stable({k: v for k, v in settings.items() if k not in _VOLATILE_SETTINGS}),
+            _code_digest(settings),
+        )
+        self.previous = self._load_manifest()
+        self.outputs = {}
+        self.structure_digest = ""
+        self._summaries = {}
+        self._written_files = set()
+        self._source_digests = {}
+        self._template_digests = {}
+        self._writing = None
+        self.written = self.skipped = 0
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    @property
+    def site_key_changed(self):
+        return self.previous is None or self.previous["site_key"] != self.site_key
+
+    def source_digest(self, path):
+        digest = self._source_digests.get(path)
+        if digest is None:
+            digest = self._source_digests[path] = _file_digest(path)
+        return digest
+
+    def relpath(self, path):
+        return os.path.relpath(path, self.content_path).replace(os.sep, "/")
+
+    def template_digest(self, template):
+        """Digest of a template and everything it pulls in, transitively."""
+        name = template.name
+        if name not in self._template_digests:
+            env = template.environment
+            seen, pending, parts = set(), [name], []
+            while pending:
+                current = pending.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                try:
+                    source, _, _ = env.loader.get_source(env, current)
+                except jinja2.TemplateNotFound:
+                    parts.append(f"{current}=missing")
+                    continue
+                parts.append(f"{current}={_digest(source)}")
+                pending.extend(
+                    ref
+                    for ref in jinja2.meta.find_referenced_templates(env.parse(source))
+                    if ref
+                )
+            self._template_digests[name] = _digest(*sorted(parts))
+        return self._template_digests[name]
+
+    def set_listing(self, generators):
+        """Fingerprint every article and page the site read.
+
+        A listing shows the site's structure (titles, dates, URLs, tags...)
+        plus the summaries of the articles it lists. So the structure digest
+        covers every piece of content, and summaries are looked up per listing.
+        Since a {filename} link in any page may point at a URL that moved, the
+        structure digest is part of every output's signature. So are the
+        theme's asset names, which can depend on the content (fonts subset to
+        the site's characters by plugins/assets.py).
+        """
+        entries = [_stable(generators[0].context.get("ASSET_MANIFEST"))]
+        for generator in generators:
+            for attr in (
+                "articles",
+                "translations",
+                "hidden_articles",
+                "hidden_translations",
+                "drafts",
+                "drafts_translations",
+                "pages",
+                "hidden_pages",
+                "draft_pages",
+            ):
+                for content in getattr(generator, attr, ()):
+                    source = self.relpath(content.source_path)
+                    entries.append(
+                        _digest(source, content.url, _stable(content.metadata))
+                    )
+                    self._summaries[content.source_path] = _digest(
+                        getattr(content, "summary", "")
+                    )
+        self.structure_digest = _digest(*sorted(entries))
+
+    def signature(self, template, sources, listed):
+        """Digest of everything an output was built from.
+
+        Args:
+            template: The Jinja template, or None for feeds.
+            sources: Source paths whose full text the output contains.
+            listed: Content objects the output lists, or None if it is not a
+                listing.
+        """
+        parts = [
+            self.site_key,
+            self.structure_digest,
+            self.template_digest(template) if template is not None else "",
+        ]
+        parts.extend(f"{s}={self.source_digest(s)}" for s in sorted(sources))
+        if listed is not None:
+            parts.extend(
+                sorted(
+                    self._summaries.get(c.source_path, c.source_path) for c in listed
+                )
+            )
+        return _digest(*parts)
+
+    def is_fresh(self, key, signature):
+        if self.previous is None:
+            return False
+        entry = self.previous["outputs"].get(key)
+        if entry is None or entry["signature"] != signature:
+            return False
+        # Two outputs can share a file (a page with save_as: index.html
+        # overrides the index template); if the other one was just rewritten,
+        # this one has to be written again to win.
+        if any(f in self._written_files for f in entry["files"]):
+            return False
+        return all(
+            os.path.exists(os.path.join(self.output_path, f)) for f in entry["files"]
+        )
+
+    def keep(self, key):
+        self.outputs[key] = self.previous["outputs"][key]
+        self.skipped += 1
+
+    def begin(self, key, signature, template, sources, listed):
+        self._writing = self.outputs[key] = {
+            "signature": signature,
+            "template": template.name if template is not None else None,
+            "sources": sorted(self.relpath(s) for s in sources),
+            "listing": listed is not None,
+            "files": [],
+        }
+        self.written += 1
+
+    def end(self):
+        self._writing = None
+
+    def record_file(self, path):
+        if self._writing is not None:
+            name = os.path.relpath(path, self.output_path).replace(os.sep, "/")
+            self._writing["files"].append(name)
+            self._written_files.add(name)
+
+    def remove_stale(self):
+        """Delete files of outputs the site no longer produces."""
+        if self.previous is None:
+            return
+        current = {f for entry in self.outputs.values() for f in entry["files"]}
+        for key, entry in self.previous["outputs"].items():
+            if key in self.outputs:
+                continue
+            for f in entry["files"]:
+                if f in current:
+                    continue
+                path = os.path.join(self.output_path, f)
+                try:
+                    os.remove(path)
+                    logger.info("Removing stale %s", path)
+                except FileNotFoundError:
+                    continue
+                self._remove_empty_parents(f)
+
+    def _remove_empty_parents(self, name):
+        """Remove the directories above output file name (a path relative to
+        output_path) that it leaves empty, as a clean build wouldn't have them."""
+        parent = posixpath.dirname(name)
+        while parent:
+            try:
+                os.rmdir(os.path.join(self.output_path, parent))
+            except OSError:
+                return
+            parent = posixpath.dirname(parent)
+
+    def save(self):
+        os.makedirs(self.output_path, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "site_key": self.site_key,
+                    "outputs": self.outputs,
+                },
+                f,
+                indent=1,
+                sort_keys=True,
+            )
+        os.replace(tmp, self.manifest_path)
+
+
+class IncrementalWriter(Writer):
+    """Writer that skips outputs whose recorded inputs are all unchanged."""
+
+    def _build(self):
+        return _builds.get(self.output_path)
+
+    def write_file(self, name, template, context, *args, **kwargs):
+        build = self._build()
+        if build is None or not name:
+            return super().write_file(name, template, context, *args, **kwargs)
+
+        own = kwargs.get("article") or kwargs.get("page")
+        if own is not None:
+            sources, listed = _sources(own), None
+        else:
+            sources = []
+            listed = kwargs.get("articles")
+            if listed is None:
+                listed = context.get("articles", [])
+        return self._write(
+            build,
+            f"{template.name}:{name}",
+            template,
+            sources,
+            listed,
+            lambda: super(IncrementalWriter, self).write_file(
+                name, template, context, *args, **kwargs
+            ),
+        )
+
+    def write_feed(self, elements, context, path=None, *args, **kwargs):
+        build = self._build()
+        if build is None or not path:
+            return super().write_feed(elements, context, path, *args, **kwargs)
+
+        # Feeds carry each item's content, not just its summary.
+        items = elements[: self.settings["FEED_MAX_ITEMS"]]
+        return self._write(
+            build,
+            f"feed:{path}",
+            None,
+            [s for e in items for s in _sources(e)],
+            items,
+            lambda: super(IncrementalWriter, self).write_feed(
+                elements, context, path, *args, **kwargs
+            ),
+        )
+
+    def _write(self, build, key, template, sources, listed, write):
+        signature = build.signature(template, sources, listed)
+        if build.is_fresh(key, signature):
+            build.keep(key)
+            return None
+
+        build.begin(key, signature, template, sources, listed)
+        try:
+            return write()
+        finally:
+            build.end()
+
+
+def initialized(pelican):
+    settings = pelican.settings
+    if not settings.get("INCREMENTAL"):
+        return
+
+    build = _builds[settings["OUTPUT_PATH"]] = _Build(settings)
+    if build.site_key_changed:
+        # Cached reader output may carry objects built with the old settings.
+        settings["LOAD_CONTENT_CACHE"] = False
+        logger.info("Incremental: settings or code changed, rebuilding everything")
+
+
+def all_generators_finalized(generators):
+    if generators:
+        build = _builds.get(generators[0].output_path)
+        if build is not None:
+            build.set_listing(generators)
+
+
+def get_writer(pelican):
+    if pelican.settings.get("INCREMENTAL"):
+        return IncrementalWriter
+    return None
+
+
+def content_written(path, context=None, **kwargs):
+    for build in _builds.values():
+        build.record_file(path)
+
+
+def finalized(pelican):
+    build = _builds.pop(pelican.settings["OUTPUT_PATH"], None)
+    if build is None:
+        return
+    build.remove_stale()
+    build.save()
+    logger.info(
+        "Incremental: wrote %d outputs, %d unchanged", build.written, build.skipped
+    )
+
+
+def register():
+    signals.initialized.connect(initialized)
+    signals.all_generators_finalized.connect(all_generators_finalized)
+    signals.get_writer.connect(get_writer)
+    signals.content_written.connect(content_written)
+    signals.feed_written.connect(content_written)
+    signals.finalized.connect(finalized)
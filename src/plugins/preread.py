@@ -0,0 +1,141 @@
+#
+# preread.py -- read a site's sources on a process pool before Pelican does
+#
+# Pelican's generators read their sources one at a time, and each read is
+# CPU-bound work in cmark, docutils and Pygments. content_store.py hands the
+# files a generator is about to read to preread() first, which reads them in
+# batches on PREREAD_WORKERS processes and yields the results in the order
+# the files were given, to be put in the content store. The generator's own
+# reads then come out of the store.
+#
+# Each worker process registers the site's PLUGINS and builds its own Readers
+# from the site's settings, so a file is read by the same reader, with the
+# same directives and render cache, as it would have been in the site build.
+# Reader metadata crosses the process boundary without the settings that
+# tags, categories and authors carry; restore() binds them to the asking
+# site's settings again. A file whose read fails yields None and is left to
+# the generator, which reads it again and reports the error as usual.
+#
+# Lives outside content_store.py so read_batch is importable as
+# plugins.preread from worker processes (see highlight.py).
+#
+import collections
+import concurrent.futures
+import logging
+
+from pelican.plugins._utils import load_plugins
+from pelican.readers import Readers
+from pelican.urlwrappers import URLWrapper
+from pelican.utils import file_suffix
+
+logger = logging.getLogger(__name__)
+
+# Below this many files a generator reads them itself; starting workers and
+# shipping results back costs more than it saves.
+MIN_FILES = 16
+
+# A tag, category or author without its settings.
+Wrapped = collections.namedtuple("Wrapped", "cls name")
+
+_pool = None
+_pool_workers = 0
+
+# Per worker process: Readers per reader settings salt.
+_readers = {}
+_plugins_registered = False
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown(*args, **kwargs):
+    """Stop the worker processes, if any. Connected to Pelican's finalized."""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = None
+    _pool_workers = 0
+
+
+def _portable(value):
+    if isinstance(value, URLWrapper):
+        return Wrapped(type(value), value.name)
+    if isinstance(value, list):
+        return [_portable(v) for v in value]
+    return value
+
+
+def _restored(value, settings):
+    if isinstance(value, Wrapped):
+        return value.cls(value.name, settings)
+    if isinstance(value, list):
+        return [_restored(v, settings) for v in value]
+    return value
+
+
+def restore(metadata, settings):
+    """Reader metadata from read_batch() with its tags, categories and
+    authors bound to settings."""
+    return {name: _restored(value, settings) for name, value in metadata.items()}
+
+
+def _readers_for(salt, settings):
+    global _plugins_registered
+    readers = _readers.get(salt)
+    if readers is None:
+        if not _plugins_registered:
+            # Connects gfm's readers and registers rst_gist's directive, as
+            # Pelican.init_plugins does for the site. In a forked worker the
+            # plugins are registered already and this connects nothing new.
+            for plugin in load_plugins(settings):
+                plugin.register()
+            _plugins_registered = True
+        readers = _readers[salt] = Readers(settings)
+    return readers
+
+
+def read_batch(salt, settings, source_paths):
+    """[(content, metadata) or None] for source_paths, read with the Readers
+    of settings. Runs in a worker process."""
+    readers = _readers_for(salt, settings).readers
+    results = []
+    for source_path in source_paths:
+        try:
+            content, metadata = readers[file_suffix(source_path)].read(source_path)
+        except Exception:
+            results.append(None)
+            continue
+        results.append((content, {name: _portable(v) for name, v in metadata.items()}))
+    return results
+
+
+def preread(salt, settings, source_paths, workers):
+    """Read source_paths on a pool of workers processes.
+
+    Args:
+        salt (str): Identifies the reader settings; workers build one Readers
+            per salt.
+        settings (dict): The site's settings.
+        source_paths (list): Absolute paths, each with a reader in settings.
+        workers (int): Pool size.
+
+    Yields:
+        tuple: (source_path, (content, metadata) or None), in the order of
+            source_paths.
+    """
+    chunksize = max(1, len(source_paths) // (workers * 4))
+    batches = [
+        source_paths[i : i + chunksize] for i in range(0, len(source_paths), chunksize)
+    ]
+    results = _get_pool(workers).map(
+        read_batch, [salt] * len(batches), [settings] * len(batches), batches
+    )
+    for batch, batch_results in zip(batches, results):
+        yield from zip(batch, batch_results)
@@ -0,0 +1,144 @@
+#
+# render_cache.py -- on-disk, content-addressed cache for reader output
+#
+# Readers render the same sources over and over: the landing and the blog
+# both read content/blog, and CI rebuilds every post on every push. This
+# cache maps a digest of (source bytes, reader salt) to the reader's output,
+# so an unchanged post costs one hash and one file read.
+#
+# Entries are small JSON files fanned out by the first two hex digits of the
+# key. Writes go through a temp file and os.replace so concurrent site builds
+# (cli.py --jobs) never observe a torn entry. A hit bumps the entry's mtime,
+# which makes mtime the recency order used for LRU eviction.
+#
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Bump when the entry layout changes; old entries then simply stop matching.
+CACHE_FORMAT = 1
+
+_caches = {}
+
+
+class RenderCache:
+    """Content-hash keyed store of rendered reader output.
+
+    Args:
+        path (str): Directory holding the entries; created on first write.
+        max_bytes (int): Size budget enforced by evict(); 0 disables it.
+    """
+
+    def __init__(self, path, max_bytes=0):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data: bytes, *salt) -> str:
+        """Digest of the source bytes plus everything that shapes the output
+        (reader options, library versions, ...)."""
+        h = hashlib.sha256()
+        h.update(repr((CACHE_FORMAT,) + salt).encode("utf-8"))
+        h.update(b"\0")
+        h.update(data)
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the stored value for key, or None on a miss."""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under key."""
+        entry = self._entry_path(key)
+        directory = os.path.dirname(entry)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.warning("Could not write render cache entry %s: %s", entry, e)
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits max_bytes."""
+        if not self.max_bytes or not os.path.isdir(self.path):
+            return
+
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                entry = os.path.join(root, name)
+                try:
+                    st = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        logger.debug("Evicted %d render cache entries from %s", removed, self.path)
+
+
+def get_cache(settings):
+    """The RenderCache configured by RENDER_CACHE_PATH, or None if disabled.
+
+    Caches are shared per path, so every reader (and every site built in this
+    process) uses the same instance and the same hit/miss counters.
+    """
+    path = settings.get("RENDER_CACHE_PATH")
+    if not path:
+        return None
+
+    path = os.path.abspath(path)
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _caches[path] = RenderCache(
+            path, settings.get("RENDER_CACHE_MAX_BYTES", 0)
+        )
+    return cache
+
+
+def evict_caches(*args, **kwargs):
+    """Signal handler: enforce the size budget of every cache used so far."""
+    for cache in _caches.values():
+        logger.debug(
+            "Render cache %s: %d hits, %d misses", cache.path, cache.hits, cache.misses
+        )
+        cache.evict()
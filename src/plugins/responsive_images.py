@@ -0,0 +1,260 @@
+#
+# responsive_images.py -- srcset, sizes and intrinsic dimensions for content images
+#
+# Every <img> in an article or page that points at a local PNG/JPEG/WebP is
+# wrapped in a <picture> with one <source> per RESPONSIVE_IMAGE_FORMATS, each
+# listing the image at RESPONSIVE_IMAGE_WIDTHS (and its own width) in a srcset
+# with RESPONSIVE_IMAGE_SIZES. The <img> keeps its src as the fallback and
+# gains width/height, so the browser reserves the space before it loads:
+#
+#   <picture>
+#     <source type="image/avif" srcset=".../x-480.ab12cd34.avif 480w, ..." sizes="...">
+#     <source type="image/webp" srcset="..." sizes="...">
+#     <img src="/media/images/x.png" width="2400" height="1600" alt="">
+#   </picture>
+#
+# Sources are found under the content PATH: {static}/{filename} links resolve
+# the way Pelican resolves them, other URLs (absolute, site-relative or
+# relative to the page) are looked up at the same path under PATH, which is
+# where the landing's STATIC_PATHS (media/, extra/) publish from.
+#
+# The <img>s are rewritten as each article or page is created
+# (content_object_init), before Pelican renders or memoizes anything from its
+# content. The images found are recorded on it as image_sources, which
+# plugins/incremental.py counts among its sources.
+#
+# Variants are encoded once per source digest into RESPONSIVE_IMAGE_CACHE
+# (plugins/images.py), on a process pool of RESPONSIVE_IMAGE_WORKERS, once
+# the site's content is read, and copied into each site's
+# RESPONSIVE_IMAGE_DIR when it is written.
+#
+import html
+import logging
+import os
+import posixpath
+import re
+import shutil
+import urllib.parse
+
+from pelican.plugins import signals
+
+from plugins import images
+
+logger = logging.getLogger(__name__)
+
+_IMG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_PICTURE_RE = re.compile(r"<picture\b.*?</picture>", re.IGNORECASE | re.DOTALL)
+
+# Per site OUTPUT_PATH: the _Rewriter of the build under way, or None if
+# the site has responsive images off.
+_rewriters = {}
+
+# Per site OUTPUT_PATH: {published name: cached variant path}.
+_outputs = {}
+
+
+def _attributes(tag):
+    attrs = {}
+    for match in _ATTR_RE.finditer(tag[len("<img") :].rstrip("/>")):
+        value = next((v for v in match.group(2, 3, 4) if v is not None), None)
+        attrs[match.group(1).lower()] = value
+    return attrs
+
+
+def _source_path(src, content, settings):
+    """The file under PATH an <img src> refers to, or None."""
+    # cmark percent-encodes the braces of {static}.
+    url = urllib.parse.unquote(html.unescape(src)).split("#")[0].split("?")[0]
+    path = settings["PATH"]
+    for marker in ("{static}", "|static|", "{filename}", "|filename|", "{attach}"):
+        if url.startswith(marker):
+            url = url[len(marker) :]
+            if url.startswith("/"):
+                candidate = os.path.join(path, url.lstrip("/"))
+            else:
+                candidate = os.path.join(os.path.dirname(content.source_path), url)
+            return candidate if os.path.isfile(candidate) else None
+
+    for prefix in (settings.get("OVERRIDDEN_SITEURL"), settings.get("SITEURL")):
+        if prefix and "://" in prefix and url.startswith(prefix + "/"):
+            url = url[len(prefix) :]
+            break
+    if "://" in url or url.startswith(("data:", "//")):
+        return None
+    if not url.startswith("/"):
+        # Relative to the page, which lives at OUTPUT_SUBDIR/<url> in the tree.
+        page_dir = posixpath.dirname(
+            posixpath.join(settings.get("OUTPUT_SUBDIR") or "", content.url or "")
+        )
+        url = posixpath.join("/", page_dir, url)
+    url = posixpath.normpath(url).lstrip("/")
+    if url.startswith("../"):
+        return None
+    candidate = os.path.join(path, *url.split("/"))
+    return candidate if os.path.isfile(candidate) else None
+
+
+def _variant_url(name, content, settings):
+    target = posixpath.join(settings["RESPONSIVE_IMAGE_DIR"], name)
+    if settings.get("RELATIVE_URLS"):
+        page_dir = posixpath.dirname(content.save_as or content.url or "")
+        return posixpath.relpath(target, page_dir or ".")
+    return f"{settings['SITEURL']}/{target}"
+
+
+class _Rewriter:
+    """Rewrites the <img> tags of one site's content."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.widths = settings["RESPONSIVE_IMAGE_WIDTHS"]
+        self.formats = images.supported_formats(settings["RESPONSIVE_IMAGE_FORMATS"])
+        self.cache_dir = settings["RESPONSIVE_IMAGE_CACHE"]
+        self._images = {}
+        # (source, dest, width, format) for images.encode_missing
+        self.jobs = {}
+        # published name -> cached variant
+        self.outputs = {}
+
+    def image(self, source_path):
+        if source_path not in self._images:
+            self._images[source_path] = images.CachedImage(self.cache_dir, source_path)
+        return self._images[source_path]
+
+    def rewrite_tag(self, tag, content, found=None):
+        attrs = _attributes(tag)
+        src = attrs.get("src")
+        if not src or "srcset" in attrs:
+            return tag
+        source_path = _source_path(src, content, self.settings)
+        if source_path is None or not source_path.lower().endswith(
+            images.SOURCE_EXTENSIONS
+        ):
+            return tag
+        if found is not None:
+            found.append(source_path)
+
+        image = self.image(source_path)
+        width, height = image.size
+        sizes = html.escape(self.settings["RESPONSIVE_IMAGE_SIZES"])
+        sources = []
+        for fmt in self.formats:
+            candidates = []
+            for w in image.widths(self.widths):
+                name = image.variant_name(w, fmt)
+                cached = image.variant_path(w, fmt)
+                self.jobs[cached] = (source_path, cached, w, fmt)
+                self.outputs[name] = cached
+                url = _variant_url(name, content, self.settings)
+                candidates.append(f"{html.escape(url)} {w}w")
+            sources.append(
+                f'<source type="{images.MIME_TYPES[fmt]}" '
+                f'srcset="{", ".join(candidates)}" sizes="{sizes}">'
+            )
+
+        if "width" not in attrs and "height" not in attrs:
+            tag = f'{tag[:-1].rstrip("/").rstrip()} width="{width}" height="{height}">'
+        return f"<picture>{''.join(sources)}{tag}</picture>"
+
+    def rewrite(self, content_html, content, found=None):
+        """content_html with its local <img>s made responsive.
+
+        Args:
+            found: A list to append the source path of each rewritten image to.
+        """
+        # <img>s someone already wrapped in a <picture> are left alone.
+        pieces, pos = [], 0
+        for picture in _PICTURE_RE.finditer(content_html):
+            pieces.append(
+                self._rewrite_imgs(content_html[pos : picture.start()], content, found)
+            )
+            pieces.append(picture.group(0))
+            pos = picture.end()
+        pieces.append(self._rewrite_imgs(content_html[pos:], content, found))
+        return "".join(pieces)
+
+    def _rewrite_imgs(self, fragment, content, found):
+        return _IMG_RE.sub(
+            lambda m: self.rewrite_tag(m.group(0), content, found), fragment
+        )
+
+
+def _rewriter_for(settings):
+    output_path = settings["OUTPUT_PATH"]
+    if output_path in _rewriters:
+        return _rewriters[output_path]
+    rewriter = None
+    if settings.get("RESPONSIVE_IMAGE_WIDTHS") and images.available():
+        rewriter = _Rewriter(settings)
+        if not rewriter.formats:
+            logger.warning(
+                "Responsive images: Pillow can write none of %s",
+                settings["RESPONSIVE_IMAGE_FORMATS"],
+            )
+            rewriter = None
+    _rewriters[output_path] = rewriter
+    return rewriter
+
+
+def rewrite_images(content):
+    # Only articles and pages this site writes (the landing reads the blog's
+    # posts for its cards without publishing them; static files have no
+    # content).
+    html_content = getattr(content, "_content", None)
+    if not isinstance(html_content, str) or "<img" not in html_content:
+        return
+    if not content.save_as:
+        return
+    rewriter = _rewriter_for(content.settings)
+    if rewriter is None:
+        return
+    found = []
+    content._content = rewriter.rewrite(html_content, content, found)
+    # Images already in a <picture> aren't found again; keep what the first
+    # pass recorded.
+    found.extend(getattr(content, "image_sources", ()))
+    content.image_sources = sorted(set(found))
+
+
+def encode_variants(generators):
+    if not generators:
+        return
+    settings = generators[0].settings
+    _outputs.pop(settings["OUTPUT_PATH"], None)
+    # The next build (autoreload) starts a new rewriter.
+    rewriter = _rewriters.pop(settings["OUTPUT_PATH"], None)
+    if rewriter is None:
+        return
+
+    encoded = images.encode_missing(
+        list(rewriter.jobs.values()), settings.get("RESPONSIVE_IMAGE_WORKERS", 1)
+    )
+    if rewriter.jobs:
+        logger.info(
+            "Responsive images: %d variants, %d encoded",
+            len(rewriter.jobs),
+            encoded,
+        )
+    _outputs[settings["OUTPUT_PATH"]] = rewriter.outputs
+
+
+def write_variants(pelican):
+    outputs = _outputs.pop(pelican.settings["OUTPUT_PATH"], None)
+    if not outputs:
+        return
+    directory = os.path.join(
+        pelican.output_path, *pelican.settings["RESPONSIVE_IMAGE_DIR"].split("/")
+    )
+    os.makedirs(directory, exist_ok=True)
+    for name, cached in outputs.items():
+        # Names carry the source digest, so an existing file is up to date.
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            shutil.copyfile(cached, path)
+
+
+def register():
+    signals.content_object_init.connect(rewrite_images)
+    signals.all_generators_finalized.connect(encode_variants)
+    signals.finalized.connect(write_variants)
@@ -0,0 +1,135 @@
+#
+# rst_cache.py -- reStructuredText reader backed by the render cache
+#
+# The .rst posts are the oldest content and never change, but docutils is
+# the slowest reader there is and parsed every one of them on every build.
+# CachedRstReader keeps Pelican's RstReader output in render_cache.py, keyed
+# by the source bytes and by registry_version(): the directives and roles
+# Pelican and the plugins (rst_gist's gist) register, and the code behind
+# them. Editing a post, a directive or this module invalidates its entries.
+# A directive whose output depends on more than its code (the gist cache)
+# says so with a cache_version() that is folded into the key too. The
+# version is worked out once per Readers (each generator of a build makes
+# one), not on every read.
+#
+# What is cached is the rendered body and the docinfo fields as docutils
+# gives them, before Pelican's metadata processors: those depend on each
+# site's settings and run on every read, hit or miss.
+#
+# Sources that pull in other files (include, :file: options) are keyed by
+# their own bytes only, so they bypass the cache.
+#
+import functools
+import hashlib
+import pathlib
+import sys
+
+import docutils
+import pelican
+import pelican.readers
+from docutils.parsers.rst import directives, roles
+from pelican.plugins import signals
+
+from plugins import render_cache
+
+# Digest of this module, folded into render cache keys.
+_MODULE_DIGEST = hashlib.sha256(pathlib.Path(__file__).read_bytes()).hexdigest()
+
+_UNCACHEABLE = (b".. include::", b":file:")
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(module_name):
+    path = getattr(sys.modules.get(module_name), "__file__", None)
+    if not path:
+        return None
+    return hashlib.sha256(pathlib.Path(path).read_bytes()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def registry_version():
+    """Digest of the directives and roles registered on top of docutils' own.
+
+    docutils' built-ins are covered by its version; the ones Pelican and the
+    plugins register are identified by name, qualified name and a digest of
+    the module that defines them, plus their cache_version() if they have one.
+    Memoized; add_reader() clears it for every new Readers.
+    """
+    h = hashlib.sha256()
+    for kind, registry in (
+        ("directive", directives._directives),
+        ("role", roles._roles),
+    ):
+        for name, obj in sorted(registry.items()):
+            module = getattr(obj, "__module__", "")
+            if module.startswith("docutils."):
+                continue
+            qualname = getattr(obj, "__qualname__", repr(obj))
+            h.update(repr((kind, name, module, qualname)).encode("utf-8"))
+            h.update((_source_digest(module) or "").encode("ascii"))
+            cache_version = getattr(obj, "cache_version", None)
+            if callable(cache_version):
+                h.update(repr(cache_version()).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _unprocessed(name, value):
+    return value
+
+
+class CachedRstReader(pelican.readers.RstReader):
+    """RstReader whose output is kept in the render cache."""
+
+    def _cache_salt(self):
+        """Everything besides the source bytes that shapes the raw output."""
+        return (
+            type(self).__name__,
+            _MODULE_DIGEST,
+            registry_version(),
+            docutils.__version__,
+            pelican.__version__,
+            self._language_code,
+            repr(self.settings.get("DOCUTILS_SETTINGS")),
+            sorted(self.settings["FORMATTED_FIELDS"]),
+        )
+
+    def _read_raw(self, source_path):
+        """RstReader.read() with the docinfo fields left unprocessed."""
+        # RstReader._parse_metadata runs every field through
+        # self.process_metadata; shadow it on the instance for this read.
+        self.process_metadata = _unprocessed
+        try:
+            return super().read(source_path)
+        finally:
+            del self.process_metadata
+
+    def read(self, source_path):
+        cache = render_cache.get_cache(self.settings)
+        if cache is None:
+            return super().read(source_path)
+        with open(source_path, "rb") as f:
+            data = f.read()
+        if any(marker in data for marker in _UNCACHEABLE):
+            return super().read(source_path)
+
+        key = cache.key(data, *self._cache_salt())
+        cached = cache.get(key)
+        if cached is None:
+            content, metadata = self._read_raw(source_path)
+            cached = {"content": content, "metadata": metadata}
+            cache.put(key, cached)
+        return cached["content"], {
+            name: self.process_metadata(name, value)
+            for name, value in cached["metadata"].items()
+        }
+
+
+def add_reader(readers):
+    # A new build, or another site: directives or the gist cache may differ.
+    registry_version.cache_clear()
+    for ext in CachedRstReader.file_extensions:
+        readers.reader_classes[ext] = CachedRstReader
+
+
+def register():
+    signals.readers_init.connect(add_reader)
@@ -2,9 +2,15 @@
 Copied from: https://github.com/fjavieralba/rst_gist
 Original Author: F. Javier Alba
 
+Changed to inline gists from GIST_CACHE, highlighted, instead of GitHub's
+script embed (see plugins/gists.py); the script is only used for gists that
+aren't cached.
 """
 from docutils.parsers.rst import directives, Directive
 from docutils import nodes
+from pelican.plugins import signals
+
+from plugins import gists
 
 class Gist(Directive):
     """
@@ -23,17 +29,29 @@ class Gist(Directive):
     final_argument_whitespace = False
     has_content = False
 
+    # GIST_CACHE of the site being read; set by configure().
+    cache_dir = ""
+
+    @classmethod
+    def cache_version(cls):
+        """Folded into render cache keys by plugins/rst_cache.py."""
+        return gists.cache_version(cls.cache_dir)
+
     def run(self):
         gist_id = self.arguments[0].strip()
         filename = self.arguments[1].strip()
 
-        embed_html_code = """
-        <script src="https://gist.github.com/%s.js?file=%s">
-        </script>
-        """ % (gist_id, filename)
+        embed_html_code = gists.embed_html(self.cache_dir, gist_id, filename)
 
         return [ nodes.raw('', embed_html_code, format='html') ]
 
 
+def configure(readers):
+    # readers_init rather than initialized, so that the worker processes of
+    # plugins/preread.py, which only build Readers, see the setting too.
+    Gist.cache_dir = readers.settings.get('GIST_CACHE', '')
+
+
 def register():
     directives.register_directive('gist', Gist)
+    signals.readers_init.connect(configure)
@@ -0,0 +1,204 @@
+#
+# precompress.py -- Brotli and gzip variants of the built site (cli.py --precompress)
+#
+# After the sites are built, every compressible file under the output root
+# gets index.html.br and index.html.gz siblings, compressed once at maximum
+# quality instead of at the edge on every cache fill. A variant is only kept if
+# it is smaller than the original.
+#
+# PRECOMPRESS_MANIFEST in the output root records, per file, the digest the
+# variants were made from and which variants exist:
+#
+#   {"format": 1, "levels": {...},
+#    "files": {"blog/index.html": {"sha256": "...", "size": 18211,
+#                                  "encodings": {"br": 3320, "gzip": 4102}}}}
+#
+# A deploy step uploads path + ENCODINGS[encoding] as path with that
+# Content-Encoding. The next run only recompresses files whose digest changed,
+# and removes the variants of files that are gone.
+#
+# Brotli needs the brotli package; without it only gzip variants are written.
+#
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+PRECOMPRESS_MANIFEST = "precompressed.json"
+
+# Content-Encoding -> suffix of the variant file.
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+LEVELS = {"br": 11, "gzip": 9}
+
+COMPRESSIBLE = frozenset(
+    (
+        ".html",
+        ".css",
+        ".js",
+        ".mjs",
+        ".json",
+        ".xml",
+        ".txt",
+        ".svg",
+        ".map",
+        ".ico",
+        ".webmanifest",
+    )
+)
+
+# Below this, the response headers outweigh anything compression saves.
+MIN_SIZE = 256
+
+
+def available_encodings():
+    return [name for name in ENCODINGS if name != "br" or brotli is not None]
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=LEVELS["br"])
+    # mtime=0 so an unchanged file compresses to the same bytes every time.
+    return gzip.compress(data, compresslevel=LEVELS["gzip"], mtime=0)
+
+
+def _write(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def compress_file(root, name, previous, encodings):
+    """Write the variants of root/name unless previous already describes them.
+
+    Args:
+        root: The output root.
+        name: The file, relative to root with "/" separators.
+        previous: The file's entry from the last manifest, or None.
+        encodings: The encodings to produce.
+
+    Returns:
+        tuple: (the file's manifest entry, whether anything was compressed).
+    """
+    path = os.path.join(root, *name.split("/"))
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if (
+        previous is not None
+        and previous["sha256"] == digest
+        and all(os.path.exists(path + ENCODINGS[e]) for e in previous["encodings"])
+    ):
+        return previous, False
+
+    sizes = {}
+    for encoding in encodings:
+        variant = path + ENCODINGS[encoding]
+        compressed = _compress(data, encoding)
+        if len(compressed) < len(data):
+            _write(variant, compressed)
+            sizes[encoding] = len(compressed)
+        else:
+            _remove(variant)
+    return {"sha256": digest, "size": len(data), "encodings": sizes}, True
+
+
+def compressible_files(root):
+    """Output files worth compressing, relative to root with "/" separators."""
+    names = []
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            # Dotfiles are build bookkeeping (.incremental.json, ...).
+            if filename.startswith(".") or filename == PRECOMPRESS_MANIFEST:
+                continue
+            if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE:
+                continue
+            path = os.path.join(directory, filename)
+            if os.path.getsize(path) < MIN_SIZE:
+                continue
+            names.append(os.path.relpath(path, root).replace(os.sep, "/"))
+    return sorted(names)
+
+
+def _load_manifest(path, levels):
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("format") != MANIFEST_FORMAT or manifest.get("levels") != levels:
+        return {}
+    return manifest.get("files", {})
+
+
+def precompress(root, jobs=1):
+    """Bring the compressed variants under root up to date.
+
+    Args:
+        root: The output root.
+        jobs: Worker processes; 1 compresses in this process.
+
+    Returns:
+        tuple: (files compressed, files unchanged).
+    """
+    encodings = available_encodings()
+    if brotli is None:
+        logger.warning("Precompress: brotli is not installed, writing gzip only")
+    levels = {e: LEVELS[e] for e in encodings}
+    manifest_path = os.path.join(root, PRECOMPRESS_MANIFEST)
+    previous = _load_manifest(manifest_path, levels)
+
+    names = compressible_files(root)
+    args = [(root, name, previous.get(name), encodings) for name in names]
+    if jobs > 1 and len(args) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(
+                pool.map(
+                    compress_file,
+                    *zip(*args),
+                    chunksize=max(1, len(args) // (jobs * 4)),
+                )
+            )
+    else:
+        results = [compress_file(*a) for a in args]
+
+    files = {}
+    compressed = 0
+    for name, (entry, changed) in zip(names, results):
+        files[name] = entry
+        compressed += changed
+
+    # Variants of files that were deleted (or shrank below MIN_SIZE).
+    for name in previous.keys() - files.keys():
+        path = os.path.join(root, *name.split("/"))
+        for suffix in ENCODINGS.values():
+            _remove(path + suffix)
+
+    os.makedirs(root, exist_ok=True)
+    _write(
+        manifest_path,
+        json.dumps(
+            {"format": MANIFEST_FORMAT, "levels": levels, "files": files},
+            indent=1,
+            sort_keys=True,
+        ).encode("utf-8"),
+    )
+    return compressed, len(names) - compressed
@@ -0,0 +1,14 @@
+"""Fixture standing in for gist 848183 in tests/test_gists.py."""
+import time
+
+from nose.plugins import Plugin
+
+
+class TimeTests(Plugin):
+    name = "timetests"
+
+    def startTest(self, test):
+        self._started = time.time()
+
+    def stopTest(self, test):
+        print("%s: %.3fs" % (test, time.time() - self._started))
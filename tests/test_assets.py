@@ -0,0 +1,29 @@
+"""plugins/assets.py."""
+
+import json
+
+from plugins import assets
+
+
+def test_write_outputs_writes_files_and_drops_stale_ones(tmp_path):
+    theme = tmp_path / "theme"
+    (theme / "static" / "css").mkdir(parents=True)
+    (theme / "static" / "css" / "a.css").write_text("a{color:red}")
+    static_dir = tmp_path / "out" / "theme"
+
+    manifest, outputs = assets.build_manifest(str(theme), ["static"])
+    assert assets.write_outputs(str(static_dir), manifest, outputs) == 1
+    old = manifest["css/a.css"]
+
+    (theme / "static" / "css" / "a.css").write_text("a{color:blue}")
+    manifest, outputs = assets.build_manifest(str(theme), ["static"])
+    assert assets.write_outputs(str(static_dir), manifest, outputs) == 1
+    assert not (static_dir / old).exists()
+    assert (static_dir / manifest["css/a.css"]).read_text() == "a{color:blue}"
+    assert json.loads((static_dir / assets.MANIFEST_NAME).read_text()) == manifest
+
+
+def test_write_outputs_without_static_files_writes_nothing(tmp_path):
+    static_dir = tmp_path / "out" / "theme"
+    assert assets.write_outputs(str(static_dir), {}, {}) == 0
+    assert not static_dir.exists()
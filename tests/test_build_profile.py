@@ -0,0 +1,30 @@
+"""build_profile.py."""
+
+import time
+
+import blinker
+
+import build_profile
+
+
+def _slow_receiver(sender):
+    time.sleep(0.01)
+    return sender
+
+
+def test_signal_receivers_are_charged_to_their_module():
+    signal = blinker.Signal()
+    signal.connect(_slow_receiver)
+    profiler = build_profile.Profiler()
+    profiler.install()
+    try:
+        with profiler.site("site"):
+            [(_, result)] = signal.send("sender")
+    finally:
+        profiler.uninstall()
+
+    assert result == "sender"
+    phases = profiler.report()["sites"]["site"]["phases"]
+    assert phases[f"plugin:{__name__}"]["calls"] == 1
+    assert phases[f"plugin:{__name__}"]["seconds"] >= 0.01
+    assert phases["other"]["seconds"] < 0.01
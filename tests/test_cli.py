@@ -0,0 +1,88 @@
+"""cli.py: building sites, and re-rendering them in autoreload."""
+
+import json
+import pathlib
+
+import pelican
+import pytest
+
+import cli
+
+
+def _args(tmp_path, *extra):
+    cache = tmp_path / "cache"
+    return cli.parse_arguments(
+        [
+            "-q",
+            "-o",
+            str(tmp_path / "out"),
+            "-e",
+            "FONT_SUBSET=false",
+            f'RENDER_CACHE_PATH="{cache / "render"}"',
+            f'RESPONSIVE_IMAGE_CACHE="{cache / "images"}"',
+            *extra,
+        ]
+    )
+
+
+@pytest.fixture
+def built_til(tmp_path):
+    """The TIL site built into tmp_path/out/til: (instance, its generators)."""
+    instance, _ = cli.get_instance(_args(tmp_path), cli.TILSettings)
+    generators = []
+    remember = generators.extend
+    pelican.signals.all_generators_finalized.connect(remember)
+    try:
+        instance.run()
+    finally:
+        pelican.signals.all_generators_finalized.disconnect(remember)
+    return instance, generators
+
+
+def test_rerender_writes_the_site_and_its_assets_again(built_til):
+    instance, generators = built_til
+    output = pathlib.Path(instance.output_path)
+    theme = output / instance.settings["THEME_STATIC_DIR"]
+    manifest = json.loads((theme / "manifest.json").read_text())
+    (output / "index.html").write_text("stale")
+    for hashed in manifest.values():
+        (theme / hashed).unlink()
+
+    cli._rerender(instance, generators)
+
+    assert "Today I Learned" in (output / "index.html").read_text()
+    assert json.loads((theme / "manifest.json").read_text()) == manifest
+    assert all((theme / hashed).exists() for hashed in manifest.values())
+
+
+def test_affected_sites_tells_template_edits_from_the_rest(tmp_path):
+    til = cli.PelicanInstance(*cli.get_instance(_args(tmp_path), cli.TILSettings))
+    theme = pathlib.Path(til.instance.theme)
+    content = pathlib.Path(til.settings["PATH"])
+
+    def affected(path):
+        return cli._affected_sites({str(path)}, [til])
+
+    assert affected(theme / "templates" / "base.html") == {0: True}
+    assert affected(theme / "static" / "css" / "theme.css") == {0: False}
+    assert affected(content / "til" / "makefiles-spacing-and-you.md") == {0: False}
+    assert affected(content / "blog" / "a-post.md") == {}
+    # Anything that needs a full build wins over a template edit.
+    assert cli._affected_sites(
+        {str(theme / "templates" / "base.html"), str(content / "til" / "new.md")},
+        [til],
+    ) == {0: False}
+
+
+def test_build_parallel_cleans_the_output_once_and_builds_every_site(tmp_path):
+    stale = tmp_path / "out" / "til" / "stale.html"
+    stale.parent.mkdir(parents=True)
+    stale.write_text("stale")
+    args = _args(tmp_path, "--delete-output-directory")
+
+    results = cli.build_parallel(args, [cli.TILSettings, cli.WellKnownSettings], 2)
+
+    assert [(r.site, r.exitcode) for r in results] == [("til", 0), (".well-known", 0)]
+    assert not stale.exists()
+    assert (tmp_path / "out" / "til" / "index.html").exists()
+    assert any((tmp_path / "out" / ".well-known").iterdir())
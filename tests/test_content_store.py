@@ -0,0 +1,58 @@
+"""plugins/content_store.py."""
+
+import os
+
+from plugins import content_store
+
+
+class _Reader:
+    def __init__(self, **settings):
+        self.settings = settings
+        self.reads = 0
+
+    def read(self, source_path):
+        self.reads += 1
+        with open(source_path, encoding="utf-8") as f:
+            return f.read(), {"title": "T"}
+
+
+def _read(store, reader, path):
+    return store.read(reader, reader.read, str(path))
+
+
+def test_sources_are_read_again_when_they_change(tmp_path):
+    store = content_store.ContentStore()
+    reader = _Reader()
+    path = tmp_path / "post.md"
+    path.write_text("one")
+
+    assert _read(store, reader, path) == ("one", {"title": "T"})
+    assert _read(store, _Reader(), path) == ("one", {"title": "T"})
+    assert (reader.reads, store.hits) == (1, 1)
+
+    # Same size, new mtime.
+    path.write_text("two")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert _read(store, reader, path)[0] == "two"
+
+    # New size, mtime put back.
+    mtime = path.stat().st_mtime_ns
+    path.write_text("three")
+    os.utime(path, ns=(mtime, mtime))
+    assert _read(store, reader, path)[0] == "three"
+    assert reader.reads == 3
+
+
+def test_sites_with_other_reader_settings_do_not_share(tmp_path):
+    store = content_store.ContentStore()
+    path = tmp_path / "post.md"
+    path.write_text("text")
+    plain, typogrified = _Reader(TYPOGRIFY=False), _Reader(TYPOGRIFY=True)
+
+    _read(store, plain, path)
+    _read(store, typogrified, path)
+    # Settings readers don't consult are not part of the key.
+    _read(store, _Reader(TYPOGRIFY=True, SITEURL="/other"), path)
+
+    assert (plain.reads, typogrified.reads, store.hits) == (1, 1, 1)
@@ -0,0 +1,84 @@
+"""plugins/critical_css.py against the zed theme's site.css bundle."""
+
+import pathlib
+
+import pytest
+
+from plugins import assets, critical_css
+
+THEME = pathlib.Path(__file__).parent.parent / "src" / "themes" / "zed"
+BUNDLE = [
+    "css/tokens.css",
+    "css/theme.css",
+    "css/pygments.css",
+    "css/palette.css",
+]
+
+# The zed article layout: site header, article header, then a long body
+# with code well below the first screen.
+ARTICLE = """<html><head><link rel="stylesheet" href="/theme/css/{hashed}"></head>
+<body><div class="wrapper"><header class="site-header"><div class="container">
+<a class="brand" href="/"><img class="avatar" src="/a.png"></a>
+<nav class="nav"><a href="/blog/">Blog</a><a class="ext" href="/x">X</a></nav>
+<button class="theme-toggle"><svg class="icon-sun"></svg></button>
+</div></header>
+<article class="article"><div class="container">
+<header class="article-header"><div class="post-date">October 18, 2026</div>
+<h1>A post</h1></header>
+<div class="article-body">
+{paragraphs}
+<div class="highlight"><pre><span class="k">def</span> <span class="nf">f</span>
+</pre></div>
+</div>
+<!-- fold -->
+</div></article></div></body></html>
+"""
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    manifest, outputs = assets.build_manifest(
+        str(THEME), ["static"], {"css/site.css": BUNDLE}, minify=True
+    )
+    hashed = manifest["css/site.css"]
+    return hashed, outputs[hashed][1].decode("utf-8")
+
+
+def _inlined(html):
+    return html[html.index("<style>") + len("<style>") : html.index("</style>")]
+
+
+def test_article_inlines_only_its_first_screen(bundle):
+    hashed, css = bundle
+    paragraphs = "<p>Text.</p>\n" * (critical_css.FIRST_SCREEN_BYTES // 10)
+    page = ARTICLE.format(hashed=hashed, paragraphs=paragraphs)
+    inlined = _inlined(
+        critical_css.inline_critical(page, hashed, critical_css.CriticalCSS(css))
+    )
+
+    assert ".article-header h1{" in inlined
+    assert ".article-body p" in inlined
+    # Below the first screen, or never on it.
+    assert ".highlight .k" not in inlined
+    assert ":hover" not in inlined
+    assert len(inlined) < 8 * 1024
+    assert len(inlined) < len(css) / 3
+
+
+def test_unread_custom_properties_and_unused_faces_are_dropped():
+    extractor = critical_css.CriticalCSS(
+        "@font-face{font-family:body;src:url(b.woff2)}"
+        "@font-face{font-family:code;src:url(c.woff2)}"
+        ":root{--font:body,serif;--mono:code;--fg:#111;--bg:#fff;--unused:1px}"
+        "p,pre{color:var(--fg);font-family:var(--font)}"
+        "pre{font-family:var(--mono);background:var(--bg)}"
+        "a:hover,a{color:red}"
+    )
+    tokens = frozenset({("tag", "p"), ("tag", "a")})
+
+    assert extractor.extract(tokens) == (
+        "@font-face{font-family:body;src:url(b.woff2)}"
+        ":root{--font:body,serif;--fg:#111}"
+        "p{color:var(--fg);font-family:var(--font)}"
+        "a{color:red}"
+    )
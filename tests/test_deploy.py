@@ -0,0 +1,211 @@
+"""deploy.py against the directory backend, and S3Backend against a stub client."""
+
+import gzip
+import json
+
+import deploy
+import precompress
+
+
+def _site(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+
+SITE = {
+    "index.html": "<html>" + "home " * 200 + "</html>",
+    "blog/index.html": "<html>" + "blog " * 200 + "</html>",
+    "blog/theme/css/theme.3f2a1c9e.css": "body{color:red}" * 40,
+    "feeds/all.atom.xml": "<feed/>",
+    ".well-known/security.txt": "Contact: mailto:x@example.com\n",
+    ".incremental.json": "{}",
+}
+
+
+def _deploy(output, target, **kwargs):
+    backend = deploy.DirectoryBackend(str(target))
+    return deploy.deploy(str(output), backend, jobs=4, **kwargs), backend
+
+
+def test_first_deploy_uploads_everything_with_headers(tmp_path):
+    output, target = tmp_path / "out", tmp_path / "bucket"
+    _site(output, SITE)
+    plan, backend = _deploy(output, target)
+
+    assert len(plan.added) == 5
+    assert not (target / ".incremental.json").exists()
+    assert (target / ".well-known" / "security.txt").exists()
+    assert backend.headers("index.html") == {
+        "content_type": "text/html; charset=utf-8",
+        "cache_control": "no-cache",
+    }
+    immutable = backend.headers("blog/theme/css/theme.3f2a1c9e.css")
+    assert immutable["cache_control"] == "public, max-age=31536000, immutable"
+    assert backend.headers("feeds/all.atom.xml")["cache_control"] == (
+        "public, max-age=86400"
+    )
+
+
+def test_unchanged_deploy_only_reads_the_manifest(tmp_path):
+    output, target = tmp_path / "out", tmp_path / "bucket"
+    _site(output, SITE)
+    _deploy(output, target)
+    plan, backend = _deploy(output, target)
+
+    assert plan.upload == [] and plan.delete == []
+    assert plan.unchanged == 5
+    assert backend.requests == 1
+
+
+def test_deploy_sends_only_the_difference(tmp_path):
+    output, target = tmp_path / "out", tmp_path / "bucket"
+    _site(output, SITE)
+    _deploy(output, target)
+
+    (output / "blog" / "index.html").write_text("<html>new</html>")
+    (output / "feeds" / "all.atom.xml").unlink()
+    plan, backend = _deploy(output, target)
+
+    assert [u.key for u in plan.upload] == ["blog/index.html"]
+    assert plan.delete == ["feeds/all.atom.xml"]
+    # manifest read, one upload, one delete batch, manifest write
+    assert backend.requests == 4
+    assert (target / "blog" / "index.html").read_text() == "<html>new</html>"
+    assert not (target / "feeds" / "all.atom.xml").exists()
+
+
+def test_first_deploy_leaves_unknown_objects_alone(tmp_path):
+    output, target = tmp_path / "out", tmp_path / "bucket"
+    _site(output, SITE)
+    _site(target, {"old/index.html": "stale"})
+    plan, _ = _deploy(output, target)
+
+    assert plan.delete == []
+    assert (target / "old" / "index.html").exists()
+
+
+def test_first_deploy_with_prune_deletes_objects_left_in_the_target(tmp_path):
+    output, target = tmp_path / "out", tmp_path / "bucket"
+    _site(output, SITE)
+    _site(target, {"old/index.html": "stale"})
+    plan, _ = _deploy(output, target, prune=True)
+
+    assert plan.delete == ["old/index.html"]
+    assert not (target / "old" / "index.html").exists()
+
+
+def test_precompressed_files_are_uploaded_gzip_encoded(tmp_path):
+    output, target = tmp_path / "out", tmp_path / "bucket"
+    _site(output, SITE)
+    precompress.precompress(str(output))
+    plan, backend = _deploy(output, target)
+
+    assert not any(u.key.endswith((".gz", ".br")) for u in plan.upload)
+    assert precompress.PRECOMPRESS_MANIFEST not in {u.key for u in plan.upload}
+    assert backend.headers("index.html")["content_encoding"] == "gzip"
+    body = (target / "index.html").read_bytes()
+    assert gzip.decompress(body).decode() == SITE["index.html"]
+    # Too small to be worth compressing.
+    assert "content_encoding" not in backend.headers("feeds/all.atom.xml")
+
+    manifest = json.loads((target / deploy.MANIFEST_KEY).read_text())
+    assert manifest["objects"]["index.html"]["content_encoding"] == "gzip"
+
+
+class _Paginator:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def paginate(self, **kwargs):
+        self.calls.append(kwargs)
+        return iter(self.pages)
+
+
+class _S3Client:
+    """Records the boto3 S3 calls S3Backend makes."""
+
+    def __init__(self, pages=()):
+        self.paginator = _Paginator(list(pages))
+        self.puts = []
+        self.deletes = []
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        return self.paginator
+
+    def put_object(self, **kwargs):
+        self.puts.append(kwargs)
+
+    def delete_objects(self, **kwargs):
+        self.deletes.append(kwargs)
+
+
+def test_s3_list_keys_follows_the_paginator():
+    client = _S3Client(
+        [
+            {"Contents": [{"Key": "site/a.html"}, {"Key": "site/b/c.css"}]},
+            {"Contents": [{"Key": "site/d.xml"}]},
+            {},
+        ]
+    )
+    backend = deploy.S3Backend("bucket", "/site/", client=client)
+
+    assert backend.list_keys() == ["a.html", "b/c.css", "d.xml"]
+    assert client.paginator.calls == [{"Bucket": "bucket", "Prefix": "site/"}]
+    assert backend.requests == 3
+
+
+def test_s3_put_sends_the_manifest_headers():
+    client = _S3Client()
+    backend = deploy.S3Backend("bucket", "site", client=client)
+    backend.put(
+        "index.html",
+        b"body",
+        {
+            "sha256": "0" * 64,
+            "content_type": "text/html; charset=utf-8",
+            "cache_control": "no-cache",
+            "content_encoding": "gzip",
+        },
+    )
+    backend.put(
+        deploy.MANIFEST_KEY,
+        b"{}",
+        {"content_type": "application/json", "cache_control": None},
+        public=False,
+    )
+
+    assert client.puts == [
+        {
+            "Bucket": "bucket",
+            "Key": "site/index.html",
+            "Body": b"body",
+            "ContentType": "text/html; charset=utf-8",
+            "CacheControl": "no-cache",
+            "ContentEncoding": "gzip",
+            "ACL": "public-read",
+        },
+        {
+            "Bucket": "bucket",
+            "Key": "site/" + deploy.MANIFEST_KEY,
+            "Body": b"{}",
+            "ContentType": "application/json",
+        },
+    ]
+
+
+def test_s3_delete_is_batched(monkeypatch):
+    monkeypatch.setattr(deploy, "DELETE_BATCH", 2)
+    client = _S3Client()
+    backend = deploy.S3Backend("bucket", client=client)
+    backend.delete(["a", "b", "c"])
+
+    assert [
+        [o["Key"] for o in call["Delete"]["Objects"]] for call in client.deletes
+    ] == [["a", "b"], ["c"]]
+    assert all(call["Bucket"] == "bucket" for call in client.deletes)
+    assert all(call["Delete"]["Quiet"] for call in client.deletes)
+    assert backend.requests == 2
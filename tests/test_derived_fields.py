@@ -0,0 +1,28 @@
+"""plugins/derived_fields.py."""
+
+import types
+
+import jinja_filters
+from plugins import derived_fields
+
+
+def test_blogmark_fields():
+    post = types.SimpleNamespace(
+        slug="a-link",
+        title="A link",
+        link="https://www.example.com/post",
+        via="http://news.ycombinator.com:443/item?id=1",
+    )
+    derived_fields.derive_fields(post)
+
+    assert post.link_domain == "example.com"
+    assert post.via_domain == "news.ycombinator.com"
+    assert post.cover_seed == jinja_filters.seedint("a-link")
+
+
+def test_plain_post_fields():
+    post = types.SimpleNamespace(slug=None, title="Untitled")
+    derived_fields.derive_fields(post)
+
+    assert post.link_domain == post.via_domain == ""
+    assert post.cover_seed == jinja_filters.seedint("Untitled")
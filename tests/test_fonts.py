@@ -0,0 +1,74 @@
+"""plugins/fonts.py and the subset fonts plugins/assets.py publishes."""
+
+import io
+import pathlib
+
+import pytest
+
+from plugins import assets, fonts
+
+pytest.importorskip("fontTools")
+from fontTools.ttLib import TTFont  # noqa: E402
+
+THEME = pathlib.Path(__file__).parent.parent / "src" / "themes" / "zed"
+FONT = THEME / "static" / "fonts" / "writer-regular.woff2"
+
+
+def test_subset_keeps_only_the_characters_asked_for(tmp_path):
+    data, ran = fonts.cached_subset(str(tmp_path), str(FONT), set("Hello, wörld"))
+    font = TTFont(io.BytesIO(data))
+
+    assert ran
+    assert font.flavor == "woff2"
+    assert set(font.getBestCmap()) == {ord(c) for c in "Hello, wörld"}
+    assert len(data) < FONT.stat().st_size / 4
+    assert fonts.cached_subset(str(tmp_path), str(FONT), set("Hello, wörld")) == (
+        data,
+        False,
+    )
+
+
+def test_stylesheets_load_the_subset_fonts(tmp_path):
+    subset, _ = fonts.cached_subset(str(tmp_path), str(FONT), set("abc"))
+    manifest, outputs = assets.build_manifest(
+        str(THEME),
+        ["static"],
+        replaced={"fonts/writer-regular.woff2": subset},
+    )
+
+    hashed = manifest["fonts/writer-regular.woff2"]
+    assert hashed == assets.fingerprint("fonts/writer-regular.woff2", subset)
+    assert outputs[hashed][1] == subset
+    tokens = outputs[manifest["css/tokens.css"]][1].decode()
+    assert f'url("../{hashed}")' in tokens
+
+
+def test_subset_keeps_the_source_timestamp():
+    data = fonts.subset_font(FONT.read_bytes(), set("abc"))
+    modified = TTFont(io.BytesIO(data))["head"].modified
+    assert modified == TTFont(str(FONT))["head"].modified
+
+
+def test_font_faces_read_each_fonts_unicode_range():
+    faces = fonts.font_faces({"css/tokens.css": str(THEME / "static/css/tokens.css")})
+
+    assert faces["fonts/writer-regular.woff2"] is None
+    assert (0x0000, 0x00FF) in faces["fonts/bricolage-latin.woff2"]
+    assert (0x0100, 0x02BA) in faces["fonts/bricolage-latin-ext.woff2"]
+    assert fonts.parse_unicode_range("U+4??, u+20AC, bogus") == [
+        (0x400, 0x4FF),
+        (0x20AC, 0x20AC),
+    ]
+
+
+def test_a_face_is_keyed_only_on_characters_it_can_show():
+    faces = fonts.font_faces({"css/tokens.css": str(THEME / "static/css/tokens.css")})
+    latin = str(THEME / "static/fonts/bricolage-latin.woff2")
+    ranges = faces["fonts/bricolage-latin.woff2"]
+    chars = set("Hello, wörld")
+
+    # Latin Extended (bricolage-latin-ext's range) and a glyph no face has.
+    more = chars | {"ő", "漢"}
+    assert fonts.face_characters(more, latin, ranges) == chars
+    assert fonts.face_characters(more, str(FONT)) >= chars | {"ő"}
+    assert "漢" not in fonts.face_characters(more, str(FONT))
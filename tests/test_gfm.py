@@ -0,0 +1,104 @@
+"""plugins/gfm.py."""
+
+import codecs
+import copy
+
+import pytest
+from pelican.settings import DEFAULT_CONFIG
+
+from plugins import gfm
+
+pytestmark = pytest.mark.skipif(gfm.cmarkgfm is None, reason="needs cmarkgfm")
+
+BODY = """# Heading
+
+| a | b |
+|---|---|
+| 1 | ~~2~~ |
+
+- [x] done, see https://example.com
+
+```python
+print("<hi>")
+```
+"""
+
+
+@pytest.fixture
+def reader():
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings["RENDER_CACHE_PATH"] = ""
+    return gfm.GFMReader(settings)
+
+
+@pytest.mark.parametrize("mmap_min_bytes", [0, gfm.MMAP_MIN_BYTES])
+def test_read_renders_the_body_as_cmark_would(
+    reader, tmp_path, monkeypatch, mmap_min_bytes
+):
+    monkeypatch.setattr(gfm, "MMAP_MIN_BYTES", mmap_min_bytes)
+    source = tmp_path / "post.md"
+    source.write_bytes(
+        codecs.BOM_UTF8 + f"\n+++\nTitle: Mapped\n+++\n{BODY}".encode("utf-8")
+    )
+
+    content, metadata = reader.read(str(source))
+    assert content == gfm.highlight.highlight_html(reader._convert(BODY))
+    assert metadata["title"] == "Mapped"
+
+
+def test_read_rejects_a_body_that_is_not_utf8(reader, tmp_path, monkeypatch):
+    monkeypatch.setattr(gfm, "MMAP_MIN_BYTES", 0)
+    monkeypatch.setattr(gfm, "_UTF8_CHECK_CHUNK", 4)
+    source = tmp_path / "post.md"
+    source.write_bytes(b"---\nTitle: x\n---\nsome text \xe2\x82")
+
+    with pytest.raises(UnicodeDecodeError):
+        reader.read(str(source))
+
+
+TOML_POST = """
+
++++
+title = "Front matter"
+date = 2026-10-18
+tags = ["python", "pelican"]
++++
+Body with a line of
+
++++
+
+that isn't a delimiter.
+"""
+
+
+def test_read_metadata_matches_read_and_skips_the_body(reader, tmp_path, monkeypatch):
+    source = tmp_path / "post.md"
+    # Blank lines before the opening +++ are allowed.
+    source.write_text(TOML_POST, encoding="utf-8")
+    content, metadata = reader.read(str(source))
+    assert "<p>that isn't a delimiter.</p>" in content
+
+    def no_render(*args):
+        raise AssertionError("rendered the body")
+
+    monkeypatch.setattr(gfm.GFMReader, "_convert_source", no_render)
+    assert reader.read_metadata(str(source)) == metadata
+    assert metadata["title"] == "Front matter"
+    assert [t.name for t in metadata["tags"]] == ["python", "pelican"]
+
+
+@pytest.mark.parametrize(
+    "header, warns",
+    [
+        ('title = "Unclosed\ndate = 2026-10-18\n', True),
+        ("Title: Key value\nDate: 2026-10-18\n", False),
+    ],
+)
+def test_malformed_toml_header_is_reported(reader, tmp_path, caplog, header, warns):
+    source = tmp_path / "post.md"
+    source.write_text(f"+++\n{header}+++\nBody.\n", encoding="utf-8")
+    reader.read(str(source))
+    warnings = [r for r in caplog.records if "as TOML" in r.getMessage()]
+    assert bool(warnings) == warns
+    if warns:
+        assert str(source) in warnings[0].getMessage()
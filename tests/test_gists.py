@@ -0,0 +1,72 @@
+"""plugins/gists.py and the gist directive in plugins/rst_gist.py."""
+
+import copy
+import io
+import pathlib
+
+import pelican.readers
+from pelican.settings import DEFAULT_CONFIG
+
+from plugins import gists, rst_gist
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures" / "gists"
+
+POST = """Timing tests
+############
+
+.. gist:: 848183 nose-timetests.py
+"""
+
+
+def test_cached_gist_is_inlined_highlighted():
+    embed = gists.embed_html(str(FIXTURES), "848183", "nose-timetests.py")
+    assert embed.startswith("<figure class=\"gist\"><div class='highlight'><pre>")
+    assert '<span class="k">class</span>' in embed
+    assert '<a href="https://gist.github.com/848183">nose-timetests.py</a>' in embed
+    assert "<script" not in embed
+
+
+def test_missing_gist_falls_back_to_the_script():
+    embed = gists.embed_html(str(FIXTURES), "1", "missing.py")
+    assert '<script src="https://gist.github.com/1.js?file=missing.py">' in embed
+
+
+def test_unsafe_names_stay_inside_the_cache():
+    assert gists.cache_path("cache", "..", "x.py") is None
+    assert gists.cache_path("cache", "1", "../x.py") is None
+    assert "<script" in gists.embed_html(str(FIXTURES), "848183", "../848183")
+
+
+def test_directive_reads_the_sites_gist_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(rst_gist.Gist, "cache_dir", "")
+    rst_gist.register()
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings["GIST_CACHE"] = str(FIXTURES)
+    source = tmp_path / "post.rst"
+    source.write_text(POST, encoding="utf-8")
+
+    readers = pelican.readers.Readers(settings)
+    content = readers.read_file(str(tmp_path), "post.rst").content
+    assert '<figure class="gist">' in content
+    assert "<script" not in content
+
+
+def test_fetch_missing_downloads_only_what_the_cache_lacks(tmp_path):
+    content = tmp_path / "content"
+    content.mkdir()
+    (content / "a.rst").write_text(POST + "\n.. gist:: 42 other.py\n")
+    cache = tmp_path / "gists"
+    requested = []
+
+    def urlopen(url, timeout):
+        requested.append(url)
+        return io.BytesIO(b"print('fetched')\n")
+
+    (cache / "848183").mkdir(parents=True)
+    (cache / "848183" / "nose-timetests.py").write_text("cached")
+    before = gists.cache_version(str(cache))
+
+    assert gists.fetch_missing(str(content), str(cache), urlopen) == (1, 1)
+    assert requested == ["https://gist.github.com/42/raw/other.py"]
+    assert (cache / "42" / "other.py").read_text() == "print('fetched')\n"
+    assert gists.cache_version(str(cache)) != before
@@ -0,0 +1,63 @@
+"""plugins/incremental.py: an --incremental rebuild against a clean build."""
+
+import pathlib
+import shutil
+
+import cli
+
+TIL = pathlib.Path(__file__).parent.parent / "src" / "content" / "til"
+POST = """---
+Title: A post alone in its month
+Date: 2001-01-01
+slug: {slug}
+---
+
+Text.
+"""
+
+
+def _build(tmp_path, content, output, *extra):
+    cache = tmp_path / "cache"
+    args = cli.parse_arguments(
+        [
+            "-q",
+            "-o",
+            str(output),
+            "-e",
+            "FONT_SUBSET=false",
+            f'PATH="{content}"',
+            f'CACHE_PATH="{cache / "pelican"}"',
+            f'RENDER_CACHE_PATH="{cache / "render"}"',
+            f'RESPONSIVE_IMAGE_CACHE="{cache / "images"}"',
+            *extra,
+        ]
+    )
+    instance, _ = cli.get_instance(args, cli.TILSettings)
+    instance.run()
+    return pathlib.Path(instance.output_path)
+
+
+def _tree(root):
+    return {
+        str(path.relative_to(root)): path.read_bytes() if path.is_file() else None
+        for path in sorted(root.rglob("*"))
+        if path.name != cli.PelicanSettings.INCREMENTAL_MANIFEST
+    }
+
+
+def test_rebuild_after_a_slug_change_matches_a_clean_build(tmp_path):
+    content = tmp_path / "content"
+    shutil.copytree(TIL, content / "til")
+    post = content / "til" / "alone.md"
+    post.write_text(POST.format(slug="old"))
+    built = _build(tmp_path, content, tmp_path / "incremental", "--incremental")
+    old = built / "2001" / "01" / "old"
+    assert (old / "index.html").exists()
+
+    post.write_text(POST.format(slug="new"))
+    built = _build(tmp_path, content, tmp_path / "incremental", "--incremental")
+    clean = _build(tmp_path, content, tmp_path / "clean")
+
+    assert (built / "2001" / "01" / "new" / "index.html").exists()
+    assert not old.exists()
+    assert _tree(built) == _tree(clean)
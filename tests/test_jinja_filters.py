@@ -0,0 +1,128 @@
+"""jinja_filters."""
+
+import jinja2
+import pytest
+from markupsafe import Markup
+
+import jinja_filters
+
+try:
+    import hypothesis
+    from hypothesis import strategies as st
+except ImportError:
+    hypothesis = None
+
+
+def _striptags_nl_reference(value, preserve_linebreaks=False):
+    """striptags_nl as it was, cutting one comment or tag per loop."""
+    if hasattr(value, "__html__"):
+        value = value.__html__()
+    while (start := value.find("<!--")) != -1:
+        if (end := value.find("-->", start)) == -1:
+            break
+        value = f"{value[:start]}{value[end + 3 :]}"
+    while (start := value.find("<")) != -1:
+        if (end := value.find(">", start)) == -1:
+            break
+        value = f"{value[:start]}{value[end + 1 :]}"
+    if preserve_linebreaks:
+        value = jinja_filters._COLLAPSE_SPACES_RE.sub(" ", value)
+    else:
+        value = " ".join(value.split())
+    return Markup(value).unescape()
+
+
+@pytest.mark.skipif(hypothesis is None, reason="needs hypothesis")
+def test_striptags_nl_matches_the_reference():
+    # Mostly the characters that make up comments, tags and entities, so that
+    # examples are full of near-misses like "<!-", "-->" and "<!-->".
+    htmlish = st.text(alphabet="<!->/ab \n\t&;amp", max_size=60) | st.text(max_size=30)
+
+    @hypothesis.given(st.lists(htmlish, max_size=6).map("".join), st.booleans())
+    @hypothesis.settings(max_examples=500, deadline=None)
+    def check(value, preserve_linebreaks):
+        assert jinja_filters.striptags_nl(
+            value, preserve_linebreaks
+        ) == _striptags_nl_reference(value, preserve_linebreaks)
+
+    check()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("<p>a <b>b</b></p>", "a b"),
+        ("a<!-- <p> -->b", "ab"),
+        ("a<!-->b", "ab"),
+        # The cut joins "<!" and "--" into a comment with no end.
+        ("<!<!-- x -->--b", "<!--b"),
+        ("<!<!-- x -->-- y -->b", "b"),
+        ("a < b", "a < b"),
+        ("a &amp; b", "a & b"),
+    ],
+)
+def test_striptags_nl(value, expected):
+    assert jinja_filters.striptags_nl(value) == expected
+
+
+def test_striptags_nl_preserves_linebreaks():
+    value = Markup("<p>one  two</p>\n\n<p>three</p>")
+    assert jinja_filters.striptags_nl(value, True) == "one two\n\nthree"
+
+
+def test_striptags_nl_long_input_prints_nothing(capsys):
+    value = "<p>x</p><!-- c -->" * 20000
+    assert jinja_filters.striptags_nl(value) == "x" * 20000
+    assert capsys.readouterr().out == ""
+
+
+def test_untagify_returns_the_stripped_text():
+    value = "  <p>One <b>two</b>   three</p>\n<!-- x -->\n<p>&lt;four&gt;</p>  "
+    assert jinja_filters.untagify(value) == "One two three <four>"
+    assert jinja_filters.untagify(value, True) == "One two three\n\n<four>"
+
+
+@pytest.mark.skipif(hypothesis is None, reason="needs hypothesis")
+def test_untagify_many_matches_untagify():
+    htmlish = st.text(alphabet="<!->/ab \n\t&;amp", max_size=60) | st.text(max_size=30)
+
+    @hypothesis.given(st.lists(htmlish | st.just("<p> a </p>\r\n\n\n"), max_size=8))
+    @hypothesis.settings(max_examples=500, deadline=None)
+    def check(values):
+        for preserve_linebreaks in (False, True):
+            assert jinja_filters.untagify_many(values, preserve_linebreaks) == [
+                jinja_filters.untagify(v, preserve_linebreaks) for v in values
+            ]
+
+    check()
+
+
+class _Post:
+    def __init__(self, summary, excerpt=None):
+        self._summary = summary
+        self.excerpt = excerpt
+        self.summary_reads = 0
+
+    @property
+    def summary(self):
+        self.summary_reads += 1
+        return self._summary
+
+
+def test_excerpt_strips_and_truncates_once_per_post():
+    env = jinja2.Environment()
+    post = _Post("<p>The <em>quick</em> brown fox jumps over the lazy dog</p>")
+
+    for _ in range(3):
+        assert jinja_filters.excerpt(env, post, 20) == "The quick brown..."
+    assert jinja_filters.excerpt(env, post) == (
+        "The quick brown fox jumps over the lazy dog"
+    )
+    assert post.summary_reads == 2
+
+
+def test_excerpt_prefers_the_excerpt_metadata():
+    env = jinja2.Environment()
+    post = _Post("<p>Summary</p>", excerpt="Hand-written & short")
+    assert jinja_filters.excerpt(env, post, 96) == "Hand-written & short"
+    assert post.summary_reads == 0
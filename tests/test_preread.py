@@ -0,0 +1,43 @@
+"""plugins/preread.py."""
+
+import copy
+
+from pelican.settings import DEFAULT_CONFIG
+from pelican.urlwrappers import Tag
+
+from plugins import preread
+
+POST = """{title}
+{underline}
+
+:date: 2026-10-18
+:tags: python, pelican
+
+Post number {n}.
+"""
+
+
+def test_preread_returns_results_in_order_with_rebound_tags(tmp_path):
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings["PLUGINS"] = []
+    paths = []
+    for n in range(7):
+        path = tmp_path / f"post-{n}.rst"
+        title = f"Post {n}"
+        path.write_text(POST.format(title=title, underline="#" * len(title), n=n))
+        paths.append(str(path))
+    paths.append(str(tmp_path / "missing.rst"))
+
+    try:
+        results = list(preread.preread("salt", settings, paths, workers=2))
+    finally:
+        preread.shutdown()
+
+    assert [path for path, _ in results] == paths
+    assert results[-1][1] is None
+    for n, (_, (content, metadata)) in enumerate(results[:-1]):
+        assert f"Post number {n}." in content
+        metadata = preread.restore(metadata, settings)
+        assert metadata["title"] == f"Post {n}"
+        assert metadata["tags"] == [Tag("python", settings), Tag("pelican", settings)]
+        assert metadata["tags"][0].settings is settings
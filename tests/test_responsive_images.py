@@ -0,0 +1,106 @@
+"""plugins/responsive_images.py and the variant cache in plugins/images.py."""
+
+import copy
+import datetime
+import types
+
+import pytest
+from pelican.contents import Article
+from pelican.settings import DEFAULT_CONFIG
+
+from plugins import images, incremental, responsive_images
+
+pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+
+def _settings(tmp_path, **overrides):
+    settings = {
+        "PATH": str(tmp_path / "content"),
+        "SITEURL": "/blog",
+        "OUTPUT_SUBDIR": "blog",
+        "RELATIVE_URLS": False,
+        "RESPONSIVE_IMAGE_WIDTHS": [480, 960],
+        "RESPONSIVE_IMAGE_FORMATS": ["webp"],
+        "RESPONSIVE_IMAGE_SIZES": "100vw",
+        "RESPONSIVE_IMAGE_DIR": "images/responsive",
+        "RESPONSIVE_IMAGE_CACHE": str(tmp_path / "cache"),
+    }
+    settings.update(overrides)
+    return settings
+
+
+@pytest.fixture
+def content_dir(tmp_path):
+    media = tmp_path / "content" / "media"
+    media.mkdir(parents=True)
+    Image.new("RGB", (1200, 800), "navy").save(media / "photo.png")
+    return tmp_path / "content"
+
+
+def _page(url="2026/10/post/"):
+    return types.SimpleNamespace(
+        url=url, save_as=url + "index.html", source_path="/nowhere/post.md"
+    )
+
+
+def test_img_gets_srcset_sizes_and_dimensions(tmp_path, content_dir):
+    rewriter = responsive_images._Rewriter(_settings(tmp_path))
+    html = rewriter.rewrite('<p><img src="/media/photo.png" alt="p" /></p>', _page())
+
+    assert html == (
+        '<p><picture><source type="image/webp" srcset="'
+        "/blog/images/responsive/photo-480.{d}.webp 480w, "
+        "/blog/images/responsive/photo-960.{d}.webp 960w, "
+        "/blog/images/responsive/photo-1200.{d}.webp 1200w"
+        '" sizes="100vw"><img src="/media/photo.png" alt="p" width="1200" '
+        'height="800"></picture></p>'
+    ).format(d=rewriter.image(str(content_dir / "media" / "photo.png")).digest[:8])
+
+
+def test_relative_and_static_links_resolve(tmp_path, content_dir):
+    rewriter = responsive_images._Rewriter(_settings(tmp_path))
+    for src in ("../../../../media/photo.png", "%7Bstatic%7D/media/photo.png"):
+        assert "<picture>" in rewriter.rewrite(f'<img src="{src}">', _page())
+    for src in ("https://example.com/photo.png", "/media/missing.png"):
+        assert rewriter.rewrite(f'<img src="{src}">', _page()) == f'<img src="{src}">'
+
+
+def test_variants_are_encoded_once(tmp_path, content_dir):
+    rewriter = responsive_images._Rewriter(_settings(tmp_path))
+    rewriter.rewrite('<img src="/media/photo.png">', _page())
+    jobs = list(rewriter.jobs.values())
+
+    assert images.encode_missing(jobs) == 3
+    assert images.encode_missing(jobs) == 0
+    with Image.open(jobs[0][1]) as variant:
+        assert variant.size == (480, 320)
+
+
+def test_articles_are_rewritten_when_created(tmp_path, content_dir):
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings.update(_settings(tmp_path, OUTPUT_PATH=str(tmp_path / "out")))
+    settings["INCREMENTAL_MANIFEST"] = ".incremental.json"
+    photo = str(content_dir / "media" / "photo.png")
+
+    def article():
+        post = Article(
+            '<p><img src="/media/photo.png"></p>',
+            {"title": "Post", "date": datetime.datetime(2026, 10, 18)},
+            settings=settings,
+            source_path=str(content_dir / "post.md"),
+        )
+        responsive_images.rewrite_images(post)
+        responsive_images.encode_variants([types.SimpleNamespace(settings=settings)])
+        return post
+
+    post = article()
+    assert "<picture>" in post.content
+    assert post.image_sources == [photo]
+    sources = incremental._sources(post)
+    signature = incremental._Build(settings).signature(None, sources, None)
+
+    # A replaced image gives the article a new signature under --incremental.
+    Image.new("RGB", (1200, 800), "red").save(photo)
+    sources = incremental._sources(article())
+    assert incremental._Build(settings).signature(None, sources, None) != signature
@@ -0,0 +1,69 @@
+"""plugins/rst_cache.py."""
+
+import copy
+
+import pelican.readers
+import pytest
+from docutils.parsers.rst import directives
+from pelican.settings import DEFAULT_CONFIG
+
+from plugins import render_cache, rst_cache, rst_gist
+
+POST = """An old post
+###########
+
+:date: 2010-01-02 10:00
+:tags: python, twisted
+:summary: Some *emphasis*.
+
+Text.
+
+.. gist:: 1234 example.py
+"""
+
+
+@pytest.fixture
+def settings(tmp_path):
+    rst_gist.register()
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings["RENDER_CACHE_PATH"] = str(tmp_path / "render")
+    yield settings
+    render_cache._caches.clear()
+
+
+def test_second_read_comes_from_the_cache(settings, tmp_path, monkeypatch):
+    source = tmp_path / "post.rst"
+    source.write_text(POST, encoding="utf-8")
+    expected = pelican.readers.RstReader(settings).read(str(source))
+
+    assert rst_cache.CachedRstReader(settings).read(str(source)) == expected
+
+    def no_docutils(self, source_path):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(rst_cache.CachedRstReader, "_read_raw", no_docutils)
+    content, metadata = rst_cache.CachedRstReader(settings).read(str(source))
+    assert (content, metadata) == expected
+    assert "gist.github.com/1234.js?file=example.py" in content
+    assert [t.name for t in metadata["tags"]] == ["python", "twisted"]
+    assert "Some <em>emphasis</em>." in metadata["summary"]
+
+
+def test_registry_version_follows_the_directives(settings, monkeypatch):
+    before = rst_cache.registry_version()
+    monkeypatch.setitem(directives._directives, "gist", rst_cache.CachedRstReader)
+    assert rst_cache.registry_version() == before
+
+    rst_cache.add_reader(pelican.readers.Readers(settings))
+    assert rst_cache.registry_version() != before
+
+
+def test_registry_version_is_worked_out_once_per_readers(settings, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        rst_gist.Gist, "cache_version", classmethod(lambda cls: calls.append(1))
+    )
+    rst_cache.add_reader(pelican.readers.Readers(settings))
+    for _ in range(3):
+        rst_cache.registry_version()
+    assert calls == [1]
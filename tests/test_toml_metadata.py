@@ -0,0 +1,22 @@
+"""plugins/toml_metadata.py."""
+
+import pytest
+
+from plugins import toml_metadata
+
+HEADER = 'title = "Front matter"\ndate = 2026-10-18\ntags = ["python", "pelican"]\n'
+
+
+@pytest.mark.skipif(toml_metadata.tomllib is None, reason="needs tomllib")
+def test_raw_toml_metadata():
+    assert toml_metadata.raw_toml_metadata(HEADER) == {
+        "title": ["Front matter"],
+        "date": ["2026-10-18"],
+        "tags": ["python, pelican"],
+    }
+    assert toml_metadata.raw_toml_metadata('author = ["a", "b"]') == {
+        "authors": ["a, b"]
+    }
+    # "Key: value" lines aren't TOML; the GFM reader parses those itself.
+    with pytest.raises(ValueError):
+        toml_metadata.raw_toml_metadata("Title: Front matter\n")